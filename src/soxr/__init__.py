@@ -7,15 +7,29 @@
 # High quality, one-dimensional sample-rate conversion library for Python.
 # Python-SoXR is a Python wrapper of libsoxr.
 
+import asyncio
+import math
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import nullcontext
+from fractions import Fraction
+from functools import partial
+from multiprocessing import resource_tracker, shared_memory
+
 import numpy as np
 from numpy.typing import ArrayLike
 
 from . import soxr_ext
-from .soxr_ext import QQ, LQ, MQ, HQ, VHQ
+from .soxr_ext import QQ, LQ, MQ, HQ, VHQ, RuntimeSpec
 from ._version import version as __version__
 
 
 __libsoxr_version__ = soxr_ext.libsoxr_version()
+__with_openmp__ = soxr_ext.with_openmp  # libsoxr is built with OpenMP
 
 # libsoxr locates memory per each channel.
 # Too much channels will cause memory error.
@@ -23,8 +37,22 @@ _CH_LIMIT = 65536
 
 _DTYPE_UNMATCH_ERR_STR = 'Input should be a `np.ndarray` with matching dtype for ResampleStream({}).'
 _CH_EXEED_ERR_STR = 'Channel num({}) out of limit. Should be in [1, %d]' % _CH_LIMIT
-_DTYPE_ERR_STR = 'Data type must be one of [float32, float64, int16, int32], not {}'
+_DTYPE_ERR_STR = 'Data type must be one of [float32, float64, int16, int32, int8, uint8, float16, int24], not {}'
 _QUALITY_ERR_STR = "Quality must be one of [QQ, LQ, MQ, HQ, VHQ]"
+_NUM_THREADS_ERR_STR = 'num_threads should be 0 or over'
+_OUT_DTYPE_ERR_STR = '`out` should be a writable `np.ndarray` with output dtype and same ndim with input.'
+_OUT_LEN_ERR_STR = '`out` is too small. It should have at least {} frames.'
+_LAYOUT_ERR_STR = "layout must be one of ['interleaved', 'planar']"
+_RUNTIME_SPEC_ERR_STR = 'runtime_spec should be a `RuntimeSpec` or None'
+_LENGTH_ERR_STR = 'length should be 0 or over'
+_IN_USE_ERR_STR = 'Resampler is in use by another thread'
+_PACKED_LENGTH_ERR_STR = '`length` is not supported for int8, uint8, float16 and int24 formats'
+
+_stats_hook = None  # see set_stats_hook()
+
+_STATE_VERSION = 1
+_CHECKPOINT_HISTORY = 8192  # input frames kept per max(1, in_rate / out_rate), covers filter of VHQ
+_CHECKPOINT_MAX_PERIOD = 1 << 20
 
 _QUALITY_ENUM_DICT = {
     VHQ: VHQ, 'vhq': VHQ, 'soxr_vhq': VHQ,
@@ -35,6 +63,77 @@ _QUALITY_ENUM_DICT = {
 }
 
 
+def _to_runtime_spec(spec):
+    if spec is None:
+        return RuntimeSpec()
+    if not isinstance(spec, RuntimeSpec):
+        raise TypeError(_RUNTIME_SPEC_ERR_STR)
+    return spec
+
+
+def _as_array(x, dtype=np.float32):
+    # `np.ndarray` of DLPack (e.g. PyTorch CPU tensor) or buffer protocol object, without copy.
+    # Other array-likes (e.g. list) are converted to `dtype`, or None if `dtype` is None.
+    if type(x) is np.ndarray:
+        return x
+    if isinstance(x, np.ndarray):
+        return x.view(np.ndarray)
+    if hasattr(x, '__dlpack__'):
+        return np.from_dlpack(x)
+    try:
+        return np.asarray(memoryview(x))
+    except TypeError:
+        return None if dtype is None else np.asarray(x, dtype=dtype)
+
+
+def _native_from_dlpack(x):
+    # `from_dlpack()` of array library of `x`, to return output in it. None for NumPy and others.
+    if isinstance(x, np.ndarray) or not hasattr(x, '__dlpack__'):
+        return None
+    if hasattr(x, '__array_namespace__'):
+        xp = x.__array_namespace__()
+    else:
+        xp = sys.modules.get(type(x).__module__.partition('.')[0])
+    return getattr(xp, 'from_dlpack', None)
+
+
+def _to_native(y, from_dlpack):
+    # Output `y` as array of input's library, via DLPack
+    if from_dlpack is None:
+        return y
+    try:
+        return from_dlpack(y)
+    except BufferError:  # read-only array (zero_copy) can't be exported
+        return from_dlpack(y.copy())
+
+
+def _num_frames(x):
+    # number of frames of stream input (array or list of planar channels)
+    if isinstance(x, list):
+        return len(x[0]) if x else 0
+    return x.shape[0]
+
+
+class _Owner:
+    # Ownership of Python side state of a stream. Raises instead of waiting, same as the extension.
+    __slots__ = ('_lock',)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        if not self._lock.acquire(blocking=False):
+            raise RuntimeError(_IN_USE_ERR_STR)
+
+    def __exit__(self, *exc_info):
+        self._lock.release()
+
+
+def _total_out_frames(in_frames, in_rate, out_rate):
+    # Output length of whole signal by libsoxr, as it rounds in_frames / io_ratio
+    return math.floor(in_frames / (in_rate / out_rate) + 0.5)
+
+
 def _quality_to_enum(q):
     if isinstance(q, str):
         q = q.lower()
@@ -45,15 +144,42 @@ def _quality_to_enum(q):
         raise ValueError(_QUALITY_ERR_STR)
 
 
-def _to_soxr_datatype(ntype):
+# Sample formats converted block by block in the extension. (not supported by libsoxr)
+_PACKED_FMT_DICT = {
+    np.dtype(np.int8): soxr_ext.PACKED_INT8,
+    np.dtype(np.uint8): soxr_ext.PACKED_UINT8,
+    np.dtype(np.float16): soxr_ext.PACKED_FLOAT16,
+}
+
+
+def _is_int24(dtype):
+    return isinstance(dtype, str) and dtype.lower() == 'int24'
+
+
+def _is_packed(dtype):
+    return _is_int24(dtype) or np.dtype(dtype) in _PACKED_FMT_DICT
+
+
+def _to_sample_format(dtype):
+    # (soxr datatype, packed format)
+    if _is_int24(dtype):
+        return soxr_ext.SOXR_FLOAT32_I, soxr_ext.PACKED_INT24
+
+    dtype = np.dtype(dtype)
+    if dtype in _PACKED_FMT_DICT:
+        return soxr_ext.SOXR_FLOAT32_I, _PACKED_FMT_DICT[dtype]
+    return _to_soxr_datatype(dtype), soxr_ext.PACKED_NONE
+
+
+def _to_soxr_datatype(ntype, split=False):
     if ntype == np.float32:
-        return soxr_ext.SOXR_FLOAT32_I
+        return soxr_ext.SOXR_FLOAT32_S if split else soxr_ext.SOXR_FLOAT32_I
     elif ntype == np.float64:
-        return soxr_ext.SOXR_FLOAT64_I
+        return soxr_ext.SOXR_FLOAT64_S if split else soxr_ext.SOXR_FLOAT64_I
     elif ntype == np.int32:
-        return soxr_ext.SOXR_INT32_I
+        return soxr_ext.SOXR_INT32_S if split else soxr_ext.SOXR_INT32_I
     elif ntype == np.int16:
-        return soxr_ext.SOXR_INT16_I
+        return soxr_ext.SOXR_INT16_S if split else soxr_ext.SOXR_INT16_I
     else:
         raise TypeError(_DTYPE_ERR_STR.format(ntype))
 
@@ -63,6 +189,12 @@ class ResampleStream:
 
         Use `ResampleStream` for real-time processing or very long signal.
 
+        A stream should be used by one thread at a time.
+        A call while another thread is in a method of the stream raises `RuntimeError`,
+        instead of corrupting its state. (e.g. free-threaded Python)
+        Except `delay()`, `num_clips()` and `max_out_frames()`, which return values as of the last call then.
+        Different streams can be used from different threads in parallel.
+
         Parameters
         ----------
         in_rate : float
@@ -80,33 +212,206 @@ class ResampleStream:
         vr : bool, optional
             (Experimental) Enable variable-rate resampling.
             The ratio of the given in_rate and out_rate must equate to the maximum I/O ratio that will be used.
+        num_threads : int, optional
+            Number of threads to process channels in parallel.
+            Channels are split into groups, each processed by its own resampler.
+            0 to use all CPU cores. (default: 1)
+            Output is same as `num_threads=1`, except dither noise of int16 output,
+            which depends on grouping of channels.
+        zero_copy : bool, optional
+            Return read-only output arrays sharing the internal buffer, instead of copies.
+            The buffer is reused only when no previous output references it.
+            Otherwise new buffer is allocated, so returned arrays remain valid. (default: False)
+        layout : str, optional
+            Memory layout of multi-channel I/O. (default: 'interleaved')
+            'interleaved': 2D array of [frame, channel] in C order.
+            'planar': Each channel is contiguous. Input can be a 2D array in Fortran order,
+            or a list of 1D arrays (one per channel). Output is a 2D array in Fortran order.
+            This avoids interleaving copies for planar (non-interleaved) audio pipelines.
+        in_dtype : type or str, optional
+            Data type of input. Defaults to `dtype`.
+        out_dtype : type or str, optional
+            Data type of output. Defaults to `in_dtype`.
+            Conversion is done by libsoxr while resampling. e.g. int16 input to float32 output.
+            Integer outputs are clipped. See `num_clips()`.
+        dither : bool, optional
+            Apply TPDF dither for int16 output. (default: True)
+        runtime_spec : RuntimeSpec, optional
+            libsoxr runtime resources (internal threads, DFT sizes, coefficient cache size).
+            See `RuntimeSpec`.
+        max_buffer_bytes : int, optional
+            Limit of internal output buffer size. Outputs larger than this are resampled
+            into newly allocated arrays, so one large chunk doesn't pin its memory.
+            (default: None, unlimited)
+        shrink_after : int, optional
+            Release internal buffers after this many consecutive calls
+            using less than 1/4 of them. (default: None, never)
+        shared_buffer : bool, optional
+            Use an output buffer shared by all streams on the calling thread,
+            instead of one per stream. Saves memory for many streams used from a few threads.
+            Can't be used with `zero_copy`. (default: False)
+        checkpoint : bool, optional
+            Keep recent input history, so `get_state()` can be taken in the middle of a stream.
+            Needs rational ratio of in_rate and out_rate. Can't be used with `vr`. (default: False)
     """
 
     def __init__(self,
                  in_rate: float, out_rate: float, num_channels: int,
-                 dtype='float32', quality='HQ', vr=False):
+                 dtype='float32', quality='HQ', vr=False, num_threads: int = 1, zero_copy=False,
+                 layout='interleaved', in_dtype=None, out_dtype=None, dither=True, runtime_spec=None,
+                 max_buffer_bytes: int = None, shrink_after: int = None, shared_buffer=False,
+                 checkpoint=False):
         if in_rate <= 0 or out_rate <= 0:
             raise ValueError('Sample rate should be over 0')
 
         if num_channels < 1 or _CH_LIMIT < num_channels:
             raise ValueError(_CH_EXEED_ERR_STR.format(num_channels))
 
-        self._type = np.dtype(dtype)
-        stype = _to_soxr_datatype(self._type)
+        if num_threads < 0:
+            raise ValueError(_NUM_THREADS_ERR_STR)
+
+        if layout not in ('interleaved', 'planar'):
+            raise ValueError(_LAYOUT_ERR_STR)
+
+        if (max_buffer_bytes is not None and max_buffer_bytes <= 0) or (shrink_after is not None and shrink_after <= 0):
+            raise ValueError('max_buffer_bytes and shrink_after should be positive or None')
+
+        if shared_buffer and zero_copy:
+            raise ValueError('shared_buffer can not be used with zero_copy')
+
+        if checkpoint and vr:
+            raise ValueError('checkpoint can not be used with vr')
+
+        self._planar = layout == 'planar'
+        self._type = np.dtype(dtype if in_dtype is None else in_dtype)
+        self._out_type = self._type if out_dtype is None else np.dtype(out_dtype)
+        itype = _to_soxr_datatype(self._type, self._planar)
+        otype = _to_soxr_datatype(self._out_type, self._planar)
 
         q = _quality_to_enum(quality)
 
-        self._csoxr = soxr_ext.CSoxr(in_rate, out_rate, num_channels, stype, q, vr)
-        self._process = getattr(self._csoxr, f'process_{self._type}')
+        self._csoxr = soxr_ext.CSoxr(in_rate, out_rate, num_channels, itype, otype, q, vr,
+                                     num_threads, zero_copy, dither, _to_runtime_spec(runtime_spec))
+        if max_buffer_bytes or shrink_after or shared_buffer:
+            self._csoxr.set_buffer_policy(max_buffer_bytes or 0, shrink_after or 0, shared_buffer)
+
+        if self._planar:
+            self._process = getattr(self._csoxr, f'process_split_{self._type}')
+            self._process_into = getattr(self._csoxr, f'process_split_into_{self._type}')
+        else:
+            self._process = getattr(self._csoxr, f'process_{self._type}')
+            self._process_into = getattr(self._csoxr, f'process_into_{self._type}')
+
+        if runtime_spec is not None:
+            runtime_spec = (runtime_spec.num_threads, runtime_spec.log2_min_dft_size,
+                            runtime_spec.log2_large_dft_size, runtime_spec.coef_size_kbytes)
+        self._config = dict(
+            in_rate=in_rate, out_rate=out_rate, num_channels=num_channels, dtype=str(np.dtype(dtype)),
+            quality=q, vr=vr, num_threads=num_threads, zero_copy=zero_copy, layout=layout,
+            in_dtype=self._type.str, out_dtype=self._out_type.str, dither=dither, runtime_spec=runtime_spec,
+            max_buffer_bytes=max_buffer_bytes, shrink_after=shrink_after, shared_buffer=shared_buffer,
+            checkpoint=checkpoint)
+
+        # Checkpoint bookkeeping. See get_state()
+        # Updated after native calls, so it's owned by a thread through a whole call.
+        self._owner = _Owner() if checkpoint else nullcontext()
+        self._fresh = True  # at start of a stream
+        self._in_frames = 0
+        self._out_frames = 0
+        self._skip = 0  # output frames to drop, already returned before restore
+        self._pending = None  # output frames to return first, produced while restoring
+        self._restored = False  # resumed by from_state(), until end of the stream
+        self._clips_base = 0
+        self._hist = None
+        if checkpoint:
+            ratio = Fraction(in_rate) / Fraction(out_rate)
+            if _CHECKPOINT_MAX_PERIOD < ratio.numerator or _CHECKPOINT_MAX_PERIOD < ratio.denominator:
+                raise ValueError('checkpoint needs rational ratio of in_rate and out_rate')
+            # History starts at multiple of (in, out) period. Even output offset keeps rounding of output length.
+            self._period = (2 * ratio.numerator, 2 * ratio.denominator)
+            hist_len = _CHECKPOINT_HISTORY * max(1, -(-ratio.numerator // ratio.denominator))
+            self._hist_len = hist_len
+            self._hist = np.zeros((hist_len + self._period[0], num_channels), self._type)
+
+    def _record(self, x, last):
+        # Keep input frames in ring buffer of history
+        if last:
+            self._in_frames = 0
+            self._out_frames = 0
+            return
+
+        if isinstance(x, list):
+            x = np.stack(x, axis=1)
+        cap = len(self._hist)
+        n = len(x)
+        pos = self._in_frames
+        self._in_frames += n
+        if cap < n:
+            pos += n - cap
+            x = x[n - cap:]
+            n = cap
+
+        idx = pos % cap
+        k = min(n, cap - idx)
+        self._hist[idx:idx+k] = x[:k]
+        self._hist[:n-k] = x[k:]
+
+    def _restored_output(self, y):
+        # Drop or prepend output frames around restored position
+        if self._skip:
+            n = min(self._skip, len(y))
+            y = y[n:]
+            self._skip -= n
+        if self._pending is not None:
+            y = np.concatenate([self._pending, y])
+            if self._planar:
+                y = np.asfortranarray(y)
+            self._pending = None
+        return y
+
+    def _flush_restored(self, x):
+        # Total output length of libsoxr is round(in_frames / io_ratio), which may differ by rounding
+        # for the replayed part. Flush with zero padding (same as libsoxr) and cut to length of the original.
+        in_rate, out_rate = self._config['in_rate'], self._config['out_rate']
+        out_len = _total_out_frames(self._in_frames + _num_frames(x), in_rate, out_rate)
+        pad = np.zeros((math.ceil(in_rate / out_rate) + 1, self._config['num_channels']), self._type,
+                       order='F' if self._planar else 'C')
+        y = np.concatenate([self._process(x, False), self._process(pad, True)])
+        y = self._restored_output(y)[:max(0, out_len - self._out_frames)]
+        self._restored = False
+        return np.asfortranarray(y) if self._planar else y
+
+    def _check_input(self, x):
+        if isinstance(x, (list, tuple)):
+            if not self._planar:
+                raise TypeError(_DTYPE_UNMATCH_ERR_STR.format(self._type))
+            x = [_as_array(x_ch, None) for x_ch in x]
+            for x_ch in x:
+                if x_ch is None or x_ch.dtype != self._type or x_ch.ndim != 1:
+                    raise TypeError(_DTYPE_UNMATCH_ERR_STR.format(self._type))
+            return x
+
+        x = _as_array(x, None)
+        if x is None or x.dtype != self._type:
+            raise TypeError(_DTYPE_UNMATCH_ERR_STR.format(self._type))
+
+        if x.ndim not in (1, 2):
+            raise ValueError('Input must be 1-D or 2-D array')
+
+        if self._planar and x.ndim == 2 and x.shape[0] > 1 and x.strides[0] != x.itemsize:
+            x = np.asfortranarray(x)
+        return x
 
     def resample_chunk(self, x: np.ndarray, last=False) -> np.ndarray:
         """ Resample chunk with streaming resampler
 
         Parameters
         ----------
-        x : np.ndarray
+        x : np.ndarray or list of np.ndarray
             Input array. Input can be mono(1D) or multi-channel(2D of [frame, channel]).
             dtype should match with constructor.
+            With `layout='planar'`, a list of 1D arrays (one per channel) is also accepted.
+            CPU arrays of DLPack (e.g. PyTorch tensor) or buffer protocol are also accepted without copy.
 
         last : bool, optional
             Set True at final chunk to flush last outputs.
@@ -116,19 +421,138 @@ class ResampleStream:
         -------
         np.ndarray
             Resampled data.
-            Output is np.ndarray with same ndim with input.
+            Output is np.ndarray with same ndim with input. (2D for list input)
+            Its dtype is `out_dtype`.
+            With `layout='planar'`, output is in Fortran order.
+            If `zero_copy` is set, output is read-only.
+            For DLPack input, output is an array of its library (e.g. PyTorch tensor).
 
         """
-        if type(x) != np.ndarray or x.dtype != self._type:
-            raise TypeError(_DTYPE_UNMATCH_ERR_STR.format(self._type))
+        from_dlpack = _native_from_dlpack(x[0] if isinstance(x, (list, tuple)) and x else x)
+        x = self._check_input(x)
+        hook = _stats_hook
+        if hook is not None:
+            t = time.perf_counter()
 
-        if x.ndim == 1:
-            y = self._process(x[:, np.newaxis], last)
-            return np.squeeze(y, axis=1)
-        elif x.ndim == 2:
-            return self._process(x, last)
-        else:
-            raise ValueError('Input must be 1-D or 2-D array')
+        x2 = x if isinstance(x, list) or x.ndim == 2 else x[:, np.newaxis]
+        with self._owner:
+            if last and self._restored:
+                y = self._flush_restored(x2)
+            else:
+                y = self._process(x2, last)
+                if self._skip or self._pending is not None:
+                    y = self._restored_output(y)
+            if self._hist is not None:
+                self._record(x2, last)
+                self._out_frames += len(y)
+            self._fresh = last
+        if x2 is not x:
+            y = np.squeeze(y, axis=1)
+
+        if hook is not None:
+            hook('stream', _num_frames(x), len(y), time.perf_counter() - t)
+        return _to_native(y, from_dlpack)
+
+    def resample_chunk_into(self, x: np.ndarray, out: np.ndarray, last=False) -> int:
+        """ Resample chunk into preallocated output array
+
+        Same as `resample_chunk()`, but writes output to `out` instead of allocating new array.
+
+        Parameters
+        ----------
+        x : np.ndarray or list of np.ndarray
+            Input array. Input can be mono(1D) or multi-channel(2D of [frame, channel]).
+            dtype should match with constructor.
+            With `layout='planar'`, a list of 1D arrays (one per channel) is also accepted.
+        out : np.ndarray
+            Output array. Should be C-contiguous, with `out_dtype` and same ndim with `x`.
+            With `layout='planar'`, each channel should be contiguous (e.g. Fortran order).
+            Should have at least `max_out_frames(len(x))` frames.
+        last : bool, optional
+            Set True at final chunk to flush last outputs.
+            It should be `True` only once at the end of a continuous sequence.
+
+        Returns
+        -------
+        int
+            Number of frames written to `out`.
+        """
+        x = self._check_input(x)
+        in_ndim = 2 if isinstance(x, list) else x.ndim
+        in_frames = _num_frames(x)
+
+        out = _as_array(out, None)
+        if (out is None or out.dtype != self._out_type
+                or out.ndim != in_ndim or not out.flags.writeable):
+            raise TypeError(_OUT_DTYPE_ERR_STR)
+
+        if self._planar:
+            if out.ndim == 2 and out.shape[0] > 1 and out.strides[0] != out.itemsize:
+                raise ValueError('`out` should have contiguous channels (Fortran order)')
+        elif not out.flags.c_contiguous:
+            raise ValueError('`out` should be C-contiguous')
+
+        min_frames = self.max_out_frames(in_frames)
+        if out.shape[0] < min_frames:
+            raise ValueError(_OUT_LEN_ERR_STR.format(min_frames))
+
+        hook = _stats_hook
+        if hook is not None:
+            t = time.perf_counter()
+
+        if in_ndim == 1:
+            x = x[:, np.newaxis]
+            out = out[:, np.newaxis]
+
+        with self._owner:
+            if last and self._restored:
+                y = self._flush_restored(x)
+                out_len = len(y)
+                out[:out_len] = y
+            else:
+                pending = 0
+                if self._pending is not None:
+                    pending = len(self._pending)
+                    out[:pending] = self._pending
+                    self._pending = None
+
+                out_len = self._process_into(x, out[pending:], last)
+                if self._skip:
+                    n = min(self._skip, out_len)
+                    out[pending:pending+out_len-n] = out[pending+n:pending+out_len]
+                    out_len -= n
+                    self._skip -= n
+                out_len += pending
+
+            if self._hist is not None:
+                self._record(x, last)
+                self._out_frames += out_len
+            self._fresh = last
+
+        if hook is not None:
+            hook('stream', in_frames, out_len, time.perf_counter() - t)
+        return out_len
+
+    def max_out_frames(self, in_frames: int) -> int:
+        """ Maximum number of output frames for next chunk
+
+        Parameters
+        ----------
+        in_frames : int
+            Number of input frames of the chunk.
+
+        Returns
+        -------
+        int
+            Maximum number of output frames `resample_chunk()` can return for the chunk,
+            including pending output flushed by `last=True`.
+        """
+        max_len = self._csoxr.max_out_len(in_frames)
+        if self._restored:
+            max_len += 1  # rounding of total length
+            if self._pending is not None:
+                max_len += len(self._pending)
+        return max_len
 
     def num_clips(self) -> int:
         """ Clip counter. (for int I/O)
@@ -138,7 +562,7 @@ class ResampleStream:
         int
             Count of clipped samples.
         """
-        return self._csoxr.num_clips()
+        return self._csoxr.num_clips() + self._clips_base
 
     def delay(self) -> float:
         """ Get current delay.
@@ -152,12 +576,143 @@ class ResampleStream:
         """
         return self._csoxr.delay()
 
+    def stats(self) -> dict:
+        """ Performance counters of this stream, since construction.
+
+        Returns
+        -------
+        dict
+            `calls` of resampling, `frames_in` and `frames_out` in total,
+            `native_seconds` spent in native code (w/o GIL),
+            `buffer_allocs` of internal output buffer and its `buffer_peak_bytes`,
+            `flush_iterations` of libsoxr to flush pending output.
+        """
+        return self._csoxr.stats()
+
+    def memory_usage(self) -> dict:
+        """ Bytes of internal buffers held by this stream.
+
+        libsoxr's own allocations (filter coefficients, DFT tables, ...) are not included,
+        as libsoxr doesn't report them.
+
+        Returns
+        -------
+        dict
+            `buffer_bytes` of output buffer, `scratch_bytes` of channel group buffers (`num_threads`),
+            `shared_bytes` of the calling thread's shared buffer (`shared_buffer`),
+            and `total_bytes` of them.
+        """
+        usage = self._csoxr.memory_usage()
+        usage['total_bytes'] = sum(usage.values())
+        return usage
+
+    def trim(self) -> None:
+        """ Release internal buffers, e.g. after an unusually large chunk.
+
+        They are reallocated to fit on next call. Outputs of `zero_copy` remain valid.
+        """
+        self._csoxr.trim()
+
     def clear(self) -> None:
         """ Reset resampler. Ready for fresh signal, same config.
 
         This can be used to save initialization time.
         """
-        self._csoxr.clear()
+        with self._owner:
+            self._csoxr.clear()
+            self._fresh = True
+            self._in_frames = 0
+            self._out_frames = 0
+            self._skip = 0
+            self._pending = None
+            self._restored = False
+            self._clips_base = 0
+
+    def get_state(self) -> dict:
+        """ Checkpoint of the stream, to resume processing later with `from_state()`.
+
+        libsoxr state can't be saved. Instead, the state holds config, position and recent input history
+        (about filter length), which is replayed on restore.
+        In the middle of a stream, this needs `checkpoint=True` at constructor.
+        Streams are also picklable with this.
+
+        Output of a restored stream matches the original within rounding error of libsoxr
+        (e.g. ~1e-6 for float32, more with `QQ`), except for dither noise of int16 output.
+        Output frame counts per chunk may differ, but total output length is the same.
+        `stats()` restart from the restore.
+
+        Returns
+        -------
+        dict
+            State of plain Python types and np.ndarray.
+        """
+        with self._owner:
+            if self._hist is None:
+                if not self._fresh:
+                    raise RuntimeError('get_state() in the middle of a stream needs checkpoint=True')
+                start = end = 0
+                history = np.empty((0, self._config['num_channels']), self._type)
+            else:
+                end = self._in_frames
+                step = self._period[0]
+                start = max(0, end - self._hist_len) // step * step
+                history = np.take(self._hist, np.arange(start, end) % len(self._hist), axis=0)
+
+            return {
+                'version': _STATE_VERSION,
+                'config': dict(self._config),
+                'in_frames': end,
+                'out_frames': self._out_frames,
+                'history': history,
+                'num_clips': self.num_clips(),
+            }
+
+    @classmethod
+    def from_state(cls, state: dict) -> 'ResampleStream':
+        """ Restore a stream from `get_state()`.
+
+        Parameters
+        ----------
+        state : dict
+            State returned by `get_state()`.
+
+        Returns
+        -------
+        ResampleStream
+            Stream continuing from the state.
+        """
+        if state.get('version') != _STATE_VERSION:
+            raise ValueError(f'Unsupported state version: {state.get("version")}')
+
+        config = dict(state['config'])
+        if config['runtime_spec'] is not None:
+            config['runtime_spec'] = RuntimeSpec(*config['runtime_spec'])
+        rs = cls(**config)
+
+        history = state['history']
+        in_frames = state['in_frames']
+        out_frames = state['out_frames']
+        start = in_frames - len(history)
+        if len(history):
+            if rs._hist is None or start % rs._period[0]:
+                raise ValueError('Invalid state')
+            # Replay history. Outputs before the position were already returned by the original.
+            y = rs._process(rs._check_input(history), False)
+            skip = out_frames - start // rs._period[0] * rs._period[1]
+            if skip < len(y):
+                rs._pending = np.array(y[skip:], order='A')
+            else:
+                rs._skip = skip - len(y)
+            rs._in_frames = start
+            rs._record(history, False)
+            rs._fresh = False
+            rs._restored = True
+        rs._out_frames = out_frames
+        rs._clips_base = state['num_clips'] - rs._csoxr.num_clips()
+        return rs
+
+    def __reduce__(self):
+        return (self.__class__.from_state, (self.get_state(),))
 
     def set_io_ratio(self, in_rate: float, out_rate: float, slew_len: int = 0) -> None:
         """ (Experimental) Set new sample-rate ratio for next processing.
@@ -179,56 +734,1592 @@ class ResampleStream:
         self._csoxr.set_io_ratio(in_rate / out_rate, slew_len)
 
 
-def resample(x: ArrayLike, in_rate: float, out_rate: float, quality='HQ') -> np.ndarray:
-    """ Resample signal
+class ResampleStreamBank:
+    """ Many independent streaming resamplers of same config
+
+    Processes chunks of all streams in one native call, releasing GIL once.
+    Use this instead of many `ResampleStream` with short chunks (e.g. 20 ms frames of VoIP calls),
+    where per-call overhead exceeds the resampling itself.
+
+    A bank should be used by one thread at a time. While `resample_chunks()` runs,
+    calls from another thread (e.g. `clear()`) raise `RuntimeError`, except `delay()` and `num_clips()`.
 
     Parameters
     ----------
-    x : array_like
-        Input array. Input can be mono(1D) or multi-channel(2D of [frame, channel]).
-        If input is not `np.ndarray`, it will be converted to `np.ndarray(dtype='float32')`.
-        Its dtype should be one of float32, float64, int16, int32.
+    num_streams : int
+        Number of streams.
     in_rate : float
         Input sample-rate.
     out_rate : float
         Output sample-rate.
+    num_channels : int
+        Number of channels of each stream.
+    dtype : type or str, optional
+        Data type of input.
+        Should be one of float32, float64, int16, int32.
     quality : int or str, optional
         Quality setting.
         One of `QQ`, `LQ`, `MQ`, `HQ`, `VHQ`.
-
-    Returns
-    -------
-    np.ndarray
-        Resampled data.
-        Output is `np.ndarray` with same ndim and dtype with input.
+    num_threads : int, optional
+        Number of threads to process streams in parallel.
+        0 to use all CPU cores. (default: 1)
+    out_dtype : type or str, optional
+        Data type of output. Defaults to `dtype`.
+    dither : bool, optional
+        Apply TPDF dither for int16 output. (default: True)
     """
-    if in_rate <= 0 or out_rate <= 0:
-        raise ValueError('Sample rate should be over 0')
 
-    if type(x) != np.ndarray:
-        x = np.asarray(x, dtype=np.float32)
+    def __init__(self, num_streams: int, in_rate: float, out_rate: float, num_channels: int,
+                 dtype='float32', quality='HQ', num_threads: int = 1, out_dtype=None, dither=True):
+        if in_rate <= 0 or out_rate <= 0:
+            raise ValueError('Sample rate should be over 0')
 
-    try:
-        if x.strides[0] == x.itemsize:  # split channel memory layout
-            divide_proc = getattr(soxr_ext, f'csoxr_split_ch_{x.dtype}')
+        if num_streams < 0:
+            raise ValueError('num_streams should be 0 or over')
+
+        if num_channels < 1 or _CH_LIMIT < num_channels:
+            raise ValueError(_CH_EXEED_ERR_STR.format(num_channels))
+
+        if num_threads < 0:
+            raise ValueError(_NUM_THREADS_ERR_STR)
+
+        self._type = np.dtype(dtype)
+        out_type = self._type if out_dtype is None else np.dtype(out_dtype)
+        itype = _to_soxr_datatype(self._type)
+        otype = _to_soxr_datatype(out_type)
+
+        q = _quality_to_enum(quality)
+
+        self._bank = soxr_ext.CSoxrBank(num_streams, in_rate, out_rate, num_channels, itype, otype, q, False,
+                                        num_threads, dither)
+        self._process = getattr(self._bank, f'process_{self._type}')
+        self._process_stacked = getattr(self._bank, f'process_stacked_{self._type}')
+
+    def __len__(self) -> int:
+        return len(self._bank)
+
+    def resample_chunks(self, xs, last=False, return_exceptions=False) -> list:
+        """ Resample a chunk of each stream
+
+        Parameters
+        ----------
+        xs : list of np.ndarray or np.ndarray
+            Chunk of each stream, in order of streams.
+            List of mono(1D) or multi-channel(2D of [frame, channel]) arrays of same ndim,
+            or 3D array of [stream, frame, channel].
+            dtype should match with constructor.
+        last : bool or list of bool, optional
+            Set True at final chunk of a stream. Can be set per stream.
+        return_exceptions : bool, optional
+            If True, failure of a stream is reported as an exception object in its place of the result list.
+            Otherwise the first failure is raised. Other streams have advanced regardless,
+            so the result list is attached to it as `results` attribute, not to lose their outputs.
+            (default: False)
+
+        Returns
+        -------
+        list of np.ndarray
+            Resampled chunk of each stream.
+        """
+        if isinstance(last, (bool, np.bool_)):
+            last = [bool(last)] * len(self._bank)
         else:
-            divide_proc = getattr(soxr_ext, f'csoxr_divide_proc_{x.dtype}')
-    except AttributeError:
-        raise TypeError(_DTYPE_ERR_STR.format(x.dtype))
+            last = [bool(v) for v in last]
 
-    q = _quality_to_enum(quality)
+        if isinstance(xs, np.ndarray) and xs.ndim == 3:
+            if xs.dtype != self._type:
+                raise TypeError(_DTYPE_UNMATCH_ERR_STR.format(self._type))
+            ys = self._process_stacked(xs, last)
+            mono = False
+        else:
+            xs = [_as_array(x, None) for x in xs]
+            for x in xs:
+                if x is None or x.dtype != self._type:
+                    raise TypeError(_DTYPE_UNMATCH_ERR_STR.format(self._type))
+            ndims = {x.ndim for x in xs}
+            if len(ndims) > 1 or not ndims <= {1, 2}:
+                raise ValueError('Chunks should be all 1-D or all 2-D arrays')
+            mono = ndims == {1}
+            ys = self._process([x[:, np.newaxis] for x in xs] if mono else xs, last)
+
+        for i, y in enumerate(ys):
+            if isinstance(y, str):
+                ys[i] = RuntimeError(y)
+            elif mono:
+                ys[i] = np.squeeze(y, axis=1)
+
+        if not return_exceptions:
+            for y in ys:
+                if isinstance(y, Exception):
+                    y.results = ys
+                    raise y
+        return ys
+
+    def num_clips(self, idx: int) -> int:
+        """ Clip counter of stream `idx`. (for int I/O)
+        """
+        return self._bank.stream(idx).num_clips()
+
+    def delay(self, idx: int) -> float:
+        """ Current delay of stream `idx`, in output samples.
+        """
+        return self._bank.stream(idx).delay()
+
+    def clear(self, idx: int = None) -> None:
+        """ Reset stream `idx`, or all streams if not given. Ready for fresh signal, same config.
+        """
+        if idx is not None:
+            self._bank.stream(idx).clear()
+            return
+
+        for i in range(len(self._bank)):
+            self._bank.stream(i).clear()
+
+
+class ResamplePuller:
+    """ Pull-mode streaming resampler
+
+    `read(n)` returns exactly `n` output frames, for fixed size output like audio device callbacks.
+    Input is supplied in either way:
+
+    - `input_fn`: Called with requested number of input frames whenever resampler needs input.
+      Should return an array of input frames (any length),
+      or `None` (or empty array) at the end of input.
+      Uses libsoxr's pull interface, so output is written directly without re-blocking.
+    - `write()`: Push input chunks. They are resampled into an internal FIFO,
+      which `read()` takes output from.
+
+    Output is interleaved. Mono(1D) for `num_channels=1`, otherwise 2D of [frame, channel].
+
+    A puller should be used by one thread at a time. A call while another thread is in a method
+    (e.g. `read()` waiting for `input_fn`) raises `RuntimeError`, instead of corrupting its state.
+    `input_fn` can't call `read()`, `read_into()` nor `clear()` of its puller.
+
+    Parameters
+    ----------
+    in_rate : float
+        Input sample-rate.
+    out_rate : float
+        Output sample-rate.
+    num_channels : int
+        Number of channels.
+    dtype : type or str, optional
+        Data type of input.
+        Should be one of float32, float64, int16, int32.
+    quality : int or str, optional
+        Quality setting.
+        One of `QQ`, `LQ`, `MQ`, `HQ`, `VHQ`.
+    input_fn : callable, optional
+        Input provider, `input_fn(n: int) -> np.ndarray or None`.
+        Input arrays should have `dtype`. `write()` is used instead if not given.
+    out_dtype : type or str, optional
+        Data type of output. Defaults to `dtype`.
+    dither : bool, optional
+        Apply TPDF dither for int16 output. (default: True)
+    """
+
+    def __init__(self, in_rate: float, out_rate: float, num_channels: int,
+                 dtype='float32', quality='HQ', input_fn=None, out_dtype=None, dither=True):
+        if in_rate <= 0 or out_rate <= 0:
+            raise ValueError('Sample rate should be over 0')
 
-    if x.ndim == 1:
-        y = divide_proc(in_rate, out_rate, x[:, np.newaxis], q)
-        return np.squeeze(y, axis=1)
-    elif x.ndim == 2:
-        num_channels = x.shape[1]
         if num_channels < 1 or _CH_LIMIT < num_channels:
             raise ValueError(_CH_EXEED_ERR_STR.format(num_channels))
 
-        return divide_proc(in_rate, out_rate, x, q)
-    else:
-        raise ValueError('Input must be 1-D or 2-D array')
+        self._type = np.dtype(dtype)
+        self._out_type = self._type if out_dtype is None else np.dtype(out_dtype)
+        itype = _to_soxr_datatype(self._type)
+        otype = _to_soxr_datatype(self._out_type)
+
+        q = _quality_to_enum(quality)
+
+        self._input_fn = input_fn
+        self._mono = num_channels == 1
+        self._cpuller = soxr_ext.CSoxrPuller(in_rate, out_rate, num_channels, itype, otype, q,
+                                             None if input_fn is None else self._pull, dither)
+        self._write = getattr(self._cpuller, f'write_{self._type}')
+
+    def _check_input(self, x):
+        x = _as_array(x, None)
+        if x is None or x.dtype != self._type:
+            raise TypeError(_DTYPE_UNMATCH_ERR_STR.format(self._type))
+
+        if x.ndim == 1:
+            return x[:, np.newaxis]
+        if x.ndim != 2:
+            raise ValueError('Input must be 1-D or 2-D array')
+        return np.ascontiguousarray(x)
+
+    def _pull(self, n):
+        x = self._input_fn(n)
+        if x is None:
+            return None
+        return self._check_input(x)
+
+    def write(self, x: np.ndarray, last=False) -> None:
+        """ Push input chunk. (without `input_fn`)
+
+        Parameters
+        ----------
+        x : np.ndarray
+            Input array. Mono(1D) or multi-channel(2D of [frame, channel]).
+            dtype should match with constructor.
+        last : bool, optional
+            Set True at final chunk to flush last outputs.
+        """
+        self._write(self._check_input(x), last)
+
+    def read(self, n: int) -> np.ndarray:
+        """ Read `n` output frames
+
+        Parameters
+        ----------
+        n : int
+            Number of frames to read.
+
+        Returns
+        -------
+        np.ndarray
+            Output of `n` frames. Fewer frames are returned only at the end of input,
+            or with `write()`, if less than `n` frames are `available()`.
+        """
+        y = self._cpuller.read(n)
+        return np.squeeze(y, axis=1) if self._mono else y
+
+    def read_into(self, out: np.ndarray) -> int:
+        """ Read output frames into preallocated array, as many as `len(out)`.
+
+        Parameters
+        ----------
+        out : np.ndarray
+            C-contiguous output array with `out_dtype`.
+            Mono(1D) or multi-channel(2D of [frame, channel]).
+
+        Returns
+        -------
+        int
+            Number of frames written to `out`.
+        """
+        if (type(out) != np.ndarray or out.dtype != self._out_type
+                or out.ndim not in (1, 2) or not out.flags.writeable):
+            raise TypeError(_OUT_DTYPE_ERR_STR)
+
+        if not out.flags.c_contiguous:
+            raise ValueError('`out` should be C-contiguous')
+
+        return self._cpuller.read_into(out[:, np.newaxis] if out.ndim == 1 else out)
+
+    def available(self) -> int:
+        """ Number of output frames ready to read, of pushed input.
+        """
+        return self._cpuller.available()
+
+    @property
+    def ended(self) -> bool:
+        """ True if all output was read.
+        """
+        return self._cpuller.ended
+
+    def num_clips(self) -> int:
+        """ Clip counter. (for int I/O)
+        """
+        return self._cpuller.num_clips()
+
+    def delay(self) -> float:
+        """ Current delay in output samples.
+        """
+        return self._cpuller.delay()
+
+    def clear(self) -> None:
+        """ Reset resampler. Ready for fresh signal, same config.
+        """
+        self._cpuller.clear()
+
+
+class ResampleRing:
+    """ Real-time safe streaming resampler
+
+    For real-time audio threads (e.g. PortAudio/JACK-style callbacks).
+    All buffers are allocated at construction, from maximum input chunk size.
+    `push()` resamples input into a single-producer/single-consumer ring buffer,
+    and `pull_into()` fills output from it. They don't allocate buffers nor take locks,
+    so one thread can push while another pulls.
+    A second thread pushing (or pulling) at the same time raises `RuntimeError`.
+
+    Output not fitting in the ring is dropped, and counted by `overruns()`.
+    Output not available when pulling is filled with zeros, and counted by `underruns()`.
+
+    Parameters
+    ----------
+    in_rate : float
+        Input sample-rate.
+    out_rate : float
+        Output sample-rate.
+    num_channels : int
+        Number of channels.
+    max_chunk : int
+        Maximum number of input frames of a `push()`.
+    dtype : type or str, optional
+        Data type of input.
+        Should be one of float32, float64, int16, int32.
+    quality : int or str, optional
+        Quality setting.
+        One of `QQ`, `LQ`, `MQ`, `HQ`, `VHQ`.
+    capacity : int, optional
+        Size of the ring in output frames. (default: 4 times output of `max_chunk`)
+    out_dtype : type or str, optional
+        Data type of output. Defaults to `dtype`.
+    dither : bool, optional
+        Apply TPDF dither for int16 output. (default: True)
+    """
+
+    def __init__(self, in_rate: float, out_rate: float, num_channels: int, max_chunk: int,
+                 dtype='float32', quality='HQ', capacity: int = None, out_dtype=None, dither=True):
+        if in_rate <= 0 or out_rate <= 0:
+            raise ValueError('Sample rate should be over 0')
+
+        if num_channels < 1 or _CH_LIMIT < num_channels:
+            raise ValueError(_CH_EXEED_ERR_STR.format(num_channels))
+
+        if max_chunk < 1:
+            raise ValueError('max_chunk should be over 0')
+
+        if capacity is not None and capacity < 1:
+            raise ValueError('capacity should be over 0')
+
+        self._type = np.dtype(dtype)
+        self._out_type = self._type if out_dtype is None else np.dtype(out_dtype)
+        itype = _to_soxr_datatype(self._type)
+        otype = _to_soxr_datatype(self._out_type)
+
+        q = _quality_to_enum(quality)
+
+        self._cring = soxr_ext.CSoxrRing(in_rate, out_rate, num_channels, itype, otype, q,
+                                         max_chunk, capacity or 0, dither)
+        self._push = getattr(self._cring, f'push_{self._type}')
+
+    @property
+    def capacity(self) -> int:
+        """ Size of the ring in output frames.
+        """
+        return self._cring.capacity
+
+    def push(self, x: np.ndarray, last=False) -> None:
+        """ Resample input chunk into the ring. (producer)
+
+        Parameters
+        ----------
+        x : np.ndarray
+            C-contiguous input array of `dtype`, at most `max_chunk` frames.
+            Mono(1D) or multi-channel(2D of [frame, channel]).
+            It is not converted, to avoid allocation.
+        last : bool, optional
+            Set True at final chunk to flush last outputs.
+        """
+        self._push(x, last)
+
+    def pull_into(self, out: np.ndarray) -> int:
+        """ Fill `out` with output from the ring. (consumer)
+
+        Frames not available are filled with zeros, and counted as underrun.
+
+        Parameters
+        ----------
+        out : np.ndarray
+            C-contiguous output array of `out_dtype`.
+            Mono(1D) or multi-channel(2D of [frame, channel]).
+
+        Returns
+        -------
+        int
+            Number of frames read from the ring.
+        """
+        return self._cring.pull_into(out)
+
+    def available(self) -> int:
+        """ Number of output frames in the ring.
+        """
+        return self._cring.available()
+
+    def underruns(self) -> int:
+        """ Number of output frames zero-filled by `pull_into()`, as output was not available.
+        """
+        return self._cring.underruns()
+
+    def overruns(self) -> int:
+        """ Number of output frames dropped, as the ring was full.
+        """
+        return self._cring.overruns()
+
+    @property
+    def ended(self) -> bool:
+        """ True if last input was pushed and all output was pulled.
+        """
+        return self._cring.ended()
+
+    def num_clips(self) -> int:
+        """ Clip counter. (for int I/O)
+        """
+        return self._cring.num_clips()
+
+    def delay(self) -> float:
+        """ Current delay in output samples.
+        """
+        return self._cring.delay()
+
+    def clear(self) -> None:
+        """ Reset resampler, ring and counters. Ready for fresh signal, same config.
+
+        This is not real-time safe. Call when neither `push()` nor `pull_into()` is running.
+        Raises `RuntimeError` if one is running on another thread.
+        """
+        self._cring.clear()
+
+
+_async_executor = None
+_async_max_workers = None
+_async_executor_lock = threading.Lock()
+
+
+def _get_async_executor():
+    global _async_executor
+    with _async_executor_lock:
+        if _async_executor is None:
+            _async_executor = ThreadPoolExecutor(max_workers=_async_max_workers or os.cpu_count() or 1,
+                                                 thread_name_prefix='soxr')
+        return _async_executor
+
+
+def set_async_max_workers(max_workers: int) -> None:
+    """ Set number of worker threads used by async API. (`aresample()`, `AsyncResampleStream`)
+
+    Async API runs resampling on a thread pool owned by this library.
+    Resampling releases GIL, so the event loop is not blocked.
+    Jobs exceeding the number of workers wait in queue.
+
+    Parameters
+    ----------
+    max_workers : int
+        Number of worker threads. (default: number of CPU cores)
+    """
+    global _async_executor, _async_max_workers
+    if max_workers < 1:
+        raise ValueError('max_workers should be over 0')
+
+    with _async_executor_lock:
+        old, _async_executor = _async_executor, None
+        _async_max_workers = max_workers
+    if old is not None:
+        old.shutdown(wait=False)
+
+
+async def aresample(x: ArrayLike, in_rate: float, out_rate: float, **kwargs) -> np.ndarray:
+    """ Async version of `resample()`
+
+    Runs `resample()` on the library's thread pool. See `set_async_max_workers()`.
+    Arguments are same with `resample()`.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_async_executor(), partial(resample, x, in_rate, out_rate, **kwargs))
+
+
+class AsyncResampleStream:
+    """ Streaming resampler for asyncio
+
+    Async version of `ResampleStream`. Chunks are resampled on the library's thread pool,
+    in order of calls. See `set_async_max_workers()`.
+
+    Use `resample_chunk()` to await each output.
+    Or `feed()` chunks from a producer, and `read()` (or `async for` over `outputs()`) from a consumer.
+
+    Parameters
+    ----------
+    in_rate : float
+        Input sample-rate.
+    out_rate : float
+        Output sample-rate.
+    num_channels : int
+        Number of channels.
+    dtype : type or str, optional
+        Internal data type processed with.
+        Should be one of float32, float64, int16, int32.
+    quality : int or str, optional
+        Quality setting.
+        One of `QQ`, `LQ`, `MQ`, `HQ`, `VHQ`.
+    max_pending : int, optional
+        Maximum number of chunks fed but not read yet.
+        `feed()` waits while it is reached, so a slow consumer holds back the producer. (default: 4)
+    **kwargs
+        Other arguments passed to `ResampleStream`.
+    """
+
+    def __init__(self, in_rate: float, out_rate: float, num_channels: int,
+                 dtype='float32', quality='HQ', max_pending: int = 4, **kwargs):
+        if max_pending < 1:
+            raise ValueError('max_pending should be over 0')
+
+        self._stream = ResampleStream(in_rate, out_rate, num_channels, dtype, quality, **kwargs)
+        self._max_pending = max_pending
+
+        # Created in the running event loop
+        self._lock = None
+        self._pending = None
+        self._fed = None
+
+    def _init_sync(self):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+            self._pending = asyncio.Semaphore(self._max_pending)
+            self._fed = asyncio.Queue()
+
+    async def _run(self, fn, *args):
+        # Run `fn` exclusively, in order of calls
+        self._init_sync()
+        async with self._lock:
+            fut = asyncio.get_running_loop().run_in_executor(_get_async_executor(), fn, *args)
+            try:
+                return await asyncio.shield(fut)
+            except asyncio.CancelledError:
+                # Next chunk must not start while this one is running
+                await asyncio.wait([fut])
+                raise
+
+    async def resample_chunk(self, x: np.ndarray, last=False) -> np.ndarray:
+        """ Resample chunk. Same as `ResampleStream.resample_chunk()`.
+
+        Concurrent calls are processed in order of calls.
+        If cancelled, the chunk is still consumed by the resampler, but its output is lost.
+        """
+        return await self._run(self._stream.resample_chunk, x, last)
+
+    async def feed(self, x: np.ndarray, last=False) -> None:
+        """ Queue chunk for resampling. Output is taken by `read()`.
+
+        Waits while `max_pending` chunks are fed but not read yet.
+        """
+        self._init_sync()
+        await self._pending.acquire()
+        task = asyncio.ensure_future(self.resample_chunk(x, last))
+        self._fed.put_nowait((task, last))
+
+    async def _read(self):
+        self._init_sync()
+        task, last = await self._fed.get()
+        try:
+            return await task, last
+        finally:
+            self._pending.release()
+
+    async def read(self) -> np.ndarray:
+        """ Get output of next fed chunk, in order of `feed()`. Waits until a chunk is fed.
+        """
+        y, _ = await self._read()
+        return y
+
+    async def outputs(self):
+        """ Async iterator of outputs of fed chunks, until the chunk fed with `last=True`.
+        """
+        while True:
+            y, last = await self._read()
+            yield y
+            if last:
+                return
+
+    def max_out_frames(self, in_frames: int) -> int:
+        """ Maximum number of output frames for next chunk. See `ResampleStream.max_out_frames()`.
+
+        While a chunk is being processed, it's as of before the chunk.
+        """
+        return self._stream.max_out_frames(in_frames)
+
+    def num_clips(self) -> int:
+        """ Clip counter. (for int I/O)
+
+        While a chunk is being processed, it's as of before the chunk.
+        """
+        return self._stream.num_clips()
+
+    def delay(self) -> float:
+        """ Get current delay in output samples.
+
+        While a chunk is being processed, it's as of before the chunk.
+        """
+        return self._stream.delay()
+
+    async def clear(self) -> None:
+        """ Reset resampler, after chunks queued before are processed.
+        """
+        await self._run(self._stream.clear)
+
+
+def _with_last(iterable):
+    # Yield (item, is_last) with one item lookahead
+    it = iter(iterable)
+    try:
+        prev = next(it)
+    except StopIteration:
+        return
+    for item in it:
+        yield prev, False
+        prev = item
+    yield prev, True
+
+
+def _reblock(ys, size):
+    # Re-block arrays to `size` frames. Last block may be shorter.
+    pending = []
+    num_pending = 0
+    for y in ys:
+        pending.append(y)
+        num_pending += len(y)
+        if num_pending < size:
+            continue
+
+        buf = np.concatenate(pending)
+        end = num_pending // size * size
+        for idx in range(0, end, size):
+            yield buf[idx:idx + size]
+        pending = [buf[end:]]
+        num_pending -= end
+
+    if num_pending:
+        yield np.concatenate(pending)
+
+
+def _resample_worker(rs, in_q, out_q):
+    # Resample chunks from `in_q` until None. Exception is passed to `out_q`.
+    failed = False
+    while True:
+        item = in_q.get()
+        if item is None:
+            break
+        if failed:
+            continue  # drain, so producer never blocks
+
+        try:
+            x, last = item
+            out_q.put(rs.resample_chunk(x, last=last))
+        except BaseException as e:
+            out_q.put(e)
+            failed = True
+    out_q.put(None)
+
+
+def resample_iter(chunks, in_rate: float, out_rate: float, channels: int = None, dtype=None,
+                  quality='HQ', out_chunk: int = None, background=False, max_pending: int = 2,
+                  **kwargs):
+    """ Resample iterable of chunks, yielding output chunks
+
+    Streaming pipeline over `ResampleStream`.
+    End of stream is detected by lookahead, so last output is flushed automatically.
+
+    Parameters
+    ----------
+    chunks : iterable of array_like
+        Input chunks. Each chunk can be mono(1D) or multi-channel(2D of [frame, channel]).
+        (e.g. generator of decoded audio blocks)
+    in_rate : float
+        Input sample-rate.
+    out_rate : float
+        Output sample-rate.
+    channels : int, optional
+        Number of channels. Taken from first chunk if not given.
+    dtype : type or str, optional
+        Data type of input. Taken from first chunk if not given.
+    quality : int or str, optional
+        Quality setting.
+        One of `QQ`, `LQ`, `MQ`, `HQ`, `VHQ`.
+    out_chunk : int, optional
+        Yield output chunks of `out_chunk` frames. Last chunk may be shorter.
+        If not given, one output chunk is yielded per input chunk.
+    background : bool, optional
+        Resample on a background thread, while next input chunk is taken from `chunks`.
+        This overlaps decoding and resampling. (default: False)
+    max_pending : int, optional
+        Maximum number of input chunks queued to the background thread.
+        Taking next input waits while the queue is full. (default: 2)
+    **kwargs
+        Other arguments passed to `ResampleStream`. (e.g. `num_threads`, `out_dtype`)
+
+    Yields
+    ------
+    np.ndarray
+        Resampled chunk.
+    """
+    stream = [None]
+
+    def prepare(x):
+        x = _as_array(x, np.float32 if dtype is None else dtype)
+
+        if stream[0] is None:
+            num_channels = channels
+            if num_channels is None:
+                num_channels = x.shape[1] if x.ndim == 2 else 1
+            stream[0] = ResampleStream(in_rate, out_rate, num_channels,
+                                       x.dtype if dtype is None else dtype, quality, **kwargs)
+        return x
+
+    def resample_all():
+        for x, last in _with_last(chunks):
+            x = prepare(x)
+            yield stream[0].resample_chunk(x, last=last)
+
+    def resample_background():
+        in_q = queue.Queue(maxsize=max(1, max_pending))
+        out_q = queue.Queue()
+        worker = None
+        finished = False
+
+        def get_ready(block):
+            while True:
+                try:
+                    y = out_q.get(block=block)
+                except queue.Empty:
+                    return
+                if y is None:
+                    return
+                if isinstance(y, BaseException):
+                    raise y
+                yield y
+
+        try:
+            for x, last in _with_last(chunks):
+                x = prepare(x)
+                if worker is None:
+                    worker = threading.Thread(target=_resample_worker, args=(stream[0], in_q, out_q),
+                                              daemon=True)
+                    worker.start()
+                in_q.put((x, last))
+                yield from get_ready(block=False)
+
+            if worker is not None:
+                in_q.put(None)
+                finished = True
+                yield from get_ready(block=True)
+        finally:
+            if worker is not None:
+                if not finished:
+                    in_q.put(None)  # early close or error
+                worker.join()
+
+    ys = resample_background() if background else resample_all()
+    if out_chunk is not None:
+        if out_chunk < 1:
+            raise ValueError('out_chunk should be over 0')
+        ys = _reblock(ys, out_chunk)
+    return ys
+
+
+def max_out_frames(in_frames: int, in_rate: float, out_rate: float) -> int:
+    """ Maximum number of output frames of `resample()`
+
+    Use this to allocate `out` array for `resample()`.
+
+    Parameters
+    ----------
+    in_frames : int
+        Number of input frames.
+    in_rate : float
+        Input sample-rate.
+    out_rate : float
+        Output sample-rate.
+
+    Returns
+    -------
+    int
+        Maximum number of output frames.
+    """
+    return int(in_frames * out_rate / in_rate + 1)
+
+
+def resample(x: ArrayLike, in_rate: float, out_rate: float, quality='HQ', use_pool=True,
+             num_threads: int = 1, out: np.ndarray = None, out_dtype=None, dither=True,
+             in_dtype=None, runtime_spec=None, length: int = None, axis: int = None) -> np.ndarray:
+    """ Resample signal
+
+    Parameters
+    ----------
+    x : array_like
+        Input array. Input can be mono(1D) or multi-channel(2D of [frame, channel]),
+        or N-D array with time axis of `axis`.
+        CPU arrays of DLPack (e.g. PyTorch tensor) or buffer protocol (e.g. memoryview)
+        are used without copy, in their dtype.
+        Other input is converted to `np.ndarray(dtype='float32')`.
+        Its dtype should be one of float32, float64, int16, int32, or int8, uint8, float16.
+        int8, uint8(offset binary) and float16 are converted block by block while resampling,
+        without full size conversion of input.
+    in_rate : float
+        Input sample-rate.
+    out_rate : float
+        Output sample-rate.
+    quality : int or str, optional
+        Quality setting.
+        One of `QQ`, `LQ`, `MQ`, `HQ`, `VHQ`.
+    use_pool : bool, optional
+        Reuse resampler instances of same configuration from previous calls.
+        This saves initialization time when resampling many short signals.
+        See `pool_stats()`. (default: True)
+    num_threads : int, optional
+        Number of threads to process channels in parallel.
+        Useful for input with many channels. 0 to use all CPU cores. (default: 1)
+        Channels are split into groups, each processed by its own resampler.
+        Output is same as `num_threads=1`, except dither noise of int16 output,
+        which depends on grouping of channels.
+        If there are more threads than channels, a long input with integer sample rates
+        is split into overlapped time segments, which are resampled in parallel.
+        Then output differs from `num_threads=1` within rounding error
+        (below 1e-5 of full scale for float32 and int32, 1 LSB for int16 without dither),
+        except for 'QQ' which is not split. Dither noise of int16 output also differs (up to 3 LSB in total).
+        Use `num_threads=1` if output should be same regardless of number of threads.
+    out : np.ndarray, optional
+        Preallocated array to write output into.
+        Should have same ndim and memory layout (C or Fortran order) with input,
+        and at least `max_out_frames(len(x), in_rate, out_rate)` frames.
+        Its dtype is used as output dtype if `out_dtype` is not given.
+    out_dtype : type or str, optional
+        Data type of output. One of float32, float64, int16, int32, int8, uint8, float16 or 'int24'.
+        Defaults to dtype of input. Conversion is done while resampling,
+        without extra pass over the array. Integer outputs are clipped.
+        'int24' output is packed 24-bit little endian samples,
+        as uint8 array of [frame, 3] (mono) or [frame, channel, 3].
+    dither : bool, optional
+        Apply TPDF dither for int16 output. (default: True)
+    in_dtype : str, optional
+        Set 'int24' for packed 24-bit little endian input (e.g. 24-bit WAV data).
+        Then `x` should be uint8 array of [frame, 3] (mono) or [frame, channel, 3],
+        or bytes-like object of mono samples.
+    runtime_spec : RuntimeSpec, optional
+        libsoxr runtime resources (internal threads, DFT sizes, coefficient cache size).
+        See `RuntimeSpec`.
+    length : int, optional
+        Exact number of output frames. Output is cut, or zero padded at the end to this length.
+        It's done while resampling, without extra copy. Then `out` needs only `length` frames.
+        Not supported for int8, uint8, float16 and int24 formats.
+    axis : int, optional
+        Time axis of N-D input. e.g. -1 for [batch, channel, time].
+        All other axes are resampled as channels. Channels are passed to libsoxr
+        as interleaved or split channel memory by strides of input, without copy if possible.
+        Output (and `out`) has same axis order with input.
+        (default: None, 1D or 2D of [frame, channel])
+
+    Returns
+    -------
+    np.ndarray
+        Resampled data.
+        Output is `np.ndarray` with same ndim with input, and dtype of `out_dtype`.
+        If `out` is given, a view of `out` with written frames is returned.
+        For DLPack input (or `out`), output is an array of its library (e.g. PyTorch tensor).
+    """
+    from_dlpack = _native_from_dlpack(x if out is None else out)
+    if from_dlpack is not None:
+        x = _as_array(x)
+        out = None if out is None else _as_array(out, None)
+
+    hook = _stats_hook
+    if hook is not None:
+        t = time.perf_counter()
+
+    if axis is None:
+        y = _resample(x, in_rate, out_rate, quality, use_pool, num_threads, out, out_dtype, dither,
+                      in_dtype, runtime_spec, length)
+    else:
+        y = _resample_axis(x, in_rate, out_rate, quality, use_pool, num_threads, out, out_dtype, dither,
+                           in_dtype, runtime_spec, length, axis)
+
+    if hook is not None:
+        if axis is None:
+            frames_in = len(x) // 3 if _is_int24(in_dtype) and not isinstance(x, np.ndarray) else len(x)
+        else:
+            frames_in = np.shape(x)[axis]
+        hook('resample', frames_in, y.shape[0 if axis is None else axis], time.perf_counter() - t)
+    return _to_native(y, from_dlpack)
+
+
+def _resample(x, in_rate, out_rate, quality, use_pool, num_threads, out, out_dtype, dither,
+              in_dtype, runtime_spec, length) -> np.ndarray:
+    if in_rate <= 0 or out_rate <= 0:
+        raise ValueError('Sample rate should be over 0')
+
+    if num_threads < 0:
+        raise ValueError(_NUM_THREADS_ERR_STR)
+
+    if length is not None and length < 0:
+        raise ValueError(_LENGTH_ERR_STR)
+
+    runtime_spec = _to_runtime_spec(runtime_spec)
+
+    if _is_int24(in_dtype):
+        if length is not None:
+            raise ValueError(_PACKED_LENGTH_ERR_STR)
+        return _resample_packed(x, in_rate, out_rate, quality, use_pool, num_threads, out,
+                                'int24' if out_dtype is None else out_dtype, dither, runtime_spec,
+                                int24_input=True)
+    elif in_dtype is not None:
+        raise ValueError("in_dtype should be None or 'int24'")
+
+    x = _as_array(x)
+
+    if x.dtype in _PACKED_FMT_DICT or (out_dtype is not None and _is_packed(out_dtype)):
+        if length is not None:
+            raise ValueError(_PACKED_LENGTH_ERR_STR)
+        return _resample_packed(x, in_rate, out_rate, quality, use_pool, num_threads, out,
+                                x.dtype if out_dtype is None else out_dtype, dither, runtime_spec)
+
+    try:
+        if x.strides[0] == x.itemsize:  # split channel memory layout
+            divide_proc = getattr(soxr_ext, f'csoxr_split_ch_{x.dtype}')
+        else:
+            divide_proc = getattr(soxr_ext, f'csoxr_divide_proc_{x.dtype}')
+    except AttributeError:
+        raise TypeError(_DTYPE_ERR_STR.format(x.dtype))
+
+    q = _quality_to_enum(quality)
+
+    if out_dtype is None:
+        out_dtype = x.dtype if out is None else out.dtype
+    otype = _to_soxr_datatype(np.dtype(out_dtype))
+
+    if out is not None:
+        out_len = _resample_into(x, out, in_rate, out_rate, q, use_pool, num_threads, otype, dither,
+                                 runtime_spec, length)
+        return out[:out_len]
+
+    if x.ndim == 1:
+        y = divide_proc(in_rate, out_rate, x[:, np.newaxis], q, use_pool, num_threads, otype, dither,
+                        runtime_spec, length)
+        return np.squeeze(y, axis=1)
+    elif x.ndim == 2:
+        num_channels = x.shape[1]
+        if num_channels < 1 or _CH_LIMIT < num_channels:
+            raise ValueError(_CH_EXEED_ERR_STR.format(num_channels))
+
+        return divide_proc(in_rate, out_rate, x, q, use_pool, num_threads, otype, dither, runtime_spec,
+                           length)
+    else:
+        raise ValueError('Input must be 1-D or 2-D array')
+
+
+def _merge_order(shape, strides):
+    # Index order ('C' or 'F') to merge axes into one without copy. None if not possible.
+    dims = [(n, st) for n, st in zip(shape, strides) if n != 1]
+    if all(a[1] == b[0] * b[1] for a, b in zip(dims, dims[1:])):
+        return 'C'
+    if all(b[1] == a[0] * a[1] for a, b in zip(dims, dims[1:])):
+        return 'F'
+    return None
+
+
+def _resample_axis(x, in_rate, out_rate, quality, use_pool, num_threads, out, out_dtype, dither,
+                   in_dtype, runtime_spec, length, axis) -> np.ndarray:
+    # resample() of N-D input along `axis`
+    if in_dtype is not None:
+        raise ValueError('`axis` is not supported with `in_dtype`')
+
+    x = _as_array(x)
+
+    if not -x.ndim <= axis < x.ndim:
+        raise ValueError(f'axis {axis} is out of bounds for {x.ndim}-D input')
+    axis %= x.ndim
+
+    # View as 2D [frame, channel]. Other axes are merged into channels, in order of their strides.
+    xt = np.moveaxis(x, axis, 0)
+    ch_shape = xt.shape[1:]
+    order = _merge_order(ch_shape, xt.strides[1:]) or 'C'  # copied if not mergeable
+    x2d = xt.reshape((len(xt), -1), order=order)
+
+    out_t = None
+    if out is not None:
+        if not isinstance(out, np.ndarray) or out.ndim != x.ndim:
+            raise TypeError(_OUT_DTYPE_ERR_STR)
+        out_t = np.moveaxis(out, axis, 0)
+        if out_t.shape[1:] != ch_shape:
+            raise ValueError('`out` should have same shape with input, except time axis')
+        if _merge_order(ch_shape, out_t.strides[1:]) == order:
+            out = out_t.reshape((len(out_t), -1), order=order)
+        else:
+            # resample and copy into `out`
+            min_frames = max_out_frames(len(xt), in_rate, out_rate) if length is None else length
+            if len(out_t) < min_frames:
+                raise ValueError(_OUT_LEN_ERR_STR.format(min_frames))
+            out = None
+            out_dtype = out_t.dtype if out_dtype is None else out_dtype
+
+    y2d = _resample(x2d, in_rate, out_rate, quality, use_pool, num_threads, out, out_dtype, dither,
+                    None, runtime_spec, length)
+
+    yt = y2d.reshape((len(y2d),) + ch_shape, order=order)
+    if out_t is not None and out is None:
+        out_t[:len(yt)] = yt
+        yt = out_t[:len(yt)]
+    return np.moveaxis(yt, 0, axis)
+
+
+def _resample_packed(x, in_rate, out_rate, quality, use_pool, num_threads, out, out_dtype, dither,
+                     runtime_spec, int24_input=False) -> np.ndarray:
+    # resample() for sample formats not supported by libsoxr.
+    # I/O is passed as bytes of interleaved frames.
+    if out is not None:
+        raise ValueError('`out` is not supported for int8, uint8, float16 and int24 formats')
+
+    if int24_input:
+        if not isinstance(x, np.ndarray):
+            x = np.frombuffer(x, dtype=np.uint8).reshape(-1, 3)
+        if x.dtype != np.uint8 or x.ndim not in (2, 3) or x.shape[-1] != 3:
+            raise ValueError('int24 input should be uint8 array of [frame, 3] or [frame, channel, 3]')
+        ndim = x.ndim - 1
+        num_channels = 1 if ndim == 1 else x.shape[1]
+    else:
+        if x.ndim not in (1, 2):
+            raise ValueError('Input must be 1-D or 2-D array')
+        ndim = x.ndim
+        num_channels = 1 if ndim == 1 else x.shape[1]
+
+    if num_channels < 1 or _CH_LIMIT < num_channels:
+        raise ValueError(_CH_EXEED_ERR_STR.format(num_channels))
+
+    itype, ifmt = _to_sample_format('int24' if int24_input else x.dtype)
+    otype, ofmt = _to_sample_format(out_dtype)
+    q = _quality_to_enum(quality)
+
+    x_bytes = np.ascontiguousarray(x).reshape(len(x), -1).view(np.uint8)
+    y = soxr_ext.csoxr_divide_proc_packed(in_rate, out_rate, x_bytes, num_channels,
+                                          itype, ifmt, otype, ofmt, q, use_pool, num_threads, dither,
+                                          runtime_spec)
+
+    if _is_int24(out_dtype):
+        y = y.reshape(len(y), num_channels, 3)
+        return y[:, 0] if ndim == 1 else y
+
+    y = y.view(out_dtype)
+    return y[:, 0] if ndim == 1 else y
+
+
+def resample_batch(arrays, in_rate: float, out_rate: float, quality='HQ',
+                   num_threads: int = 0, use_pool=True, return_exceptions=False,
+                   length: int = None, out: np.ndarray = None) -> list:
+    """ Resample list of signals on native worker threads
+
+    Each input is resampled independently, same as `resample()`.
+    Inputs may have different lengths and number of channels.
+    All inputs of same dtype are processed in one native call without GIL.
+
+    Parameters
+    ----------
+    arrays : iterable of array_like
+        Input arrays. Each input can be mono(1D) or multi-channel(2D of [frame, channel]).
+        Input is taken same as `resample()`.
+        Its dtype should be one of float32, float64, int16, int32.
+    in_rate : float
+        Input sample-rate.
+    out_rate : float
+        Output sample-rate.
+    quality : int or str, optional
+        Quality setting.
+        One of `QQ`, `LQ`, `MQ`, `HQ`, `VHQ`.
+    num_threads : int, optional
+        Number of worker threads. 0 to use all CPU cores. (default: 0)
+    use_pool : bool, optional
+        Reuse resampler instances. See `resample()`. (default: True)
+    return_exceptions : bool, optional
+        If True, invalid or failed input is reported as an exception object
+        in its place of the result list, instead of raising it.
+        Other inputs are processed regardless. (default: False)
+    length : int, optional
+        Exact number of output frames. See `resample()`.
+    out : np.ndarray, optional
+        Preallocated C-contiguous array to write outputs into, e.g. a batch for ML training.
+        [item, frame] for mono inputs, or [item, frame, channel] for multi-channel inputs.
+        Each output is cut or zero padded to its frame length. Its dtype is used as output dtype.
+        Rows of invalid inputs are left untouched.
+
+    Returns
+    -------
+    list of np.ndarray
+        Resampled data, in same order with input.
+        If `out` is given, views of its rows.
+    """
+    if in_rate <= 0 or out_rate <= 0:
+        raise ValueError('Sample rate should be over 0')
+
+    if num_threads < 0:
+        raise ValueError(_NUM_THREADS_ERR_STR)
+
+    if length is not None and length < 0:
+        raise ValueError(_LENGTH_ERR_STR)
+
+    out_from_dlpack = _native_from_dlpack(out)
+    if out is not None:
+        out = _as_array(out, None)
+        if (not isinstance(out, np.ndarray) or out.ndim not in (2, 3)
+                or not out.flags.c_contiguous or not out.flags.writeable):
+            raise TypeError('`out` should be a writable C-contiguous `np.ndarray` '
+                            'of [item, frame] or [item, frame, channel]')
+        otype = _to_soxr_datatype(out.dtype)
+        out3d = out[:, :, np.newaxis] if out.ndim == 2 else out
+
+    q = _quality_to_enum(quality)
+
+    results = []
+    groups = {}  # dtype: list of (index, ndim, 2D array)
+    for idx, x in enumerate(arrays):
+        results.append(None)
+        try:
+            from_dlpack = out_from_dlpack if out is not None else _native_from_dlpack(x)
+            x = _as_array(x)
+
+            _to_soxr_datatype(x.dtype)
+
+            if x.ndim == 1:
+                x2d = x[:, np.newaxis]
+            elif x.ndim == 2:
+                num_channels = x.shape[1]
+                if num_channels < 1 or _CH_LIMIT < num_channels:
+                    raise ValueError(_CH_EXEED_ERR_STR.format(num_channels))
+                x2d = x
+            else:
+                raise ValueError('Input must be 1-D or 2-D array')
+
+            if out is not None:
+                if len(out) <= idx:
+                    raise ValueError('`out` has fewer rows than inputs')
+                if x.ndim + 1 != out.ndim or x2d.shape[1] != out3d.shape[2]:
+                    raise ValueError('Shape of input does not match with `out`')
+        except (TypeError, ValueError) as e:
+            results[idx] = e
+            continue
+
+        groups.setdefault(x.dtype, []).append((idx, x.ndim, np.ascontiguousarray(x2d), from_dlpack))
+
+    for dtype, items in groups.items():
+        if out is not None:
+            batch_proc = getattr(soxr_ext, f'csoxr_batch_into_{dtype}')
+            ys = batch_proc(in_rate, out_rate, [item[2] for item in items], [item[0] for item in items], out3d,
+                            q, num_threads, use_pool, otype)
+        else:
+            batch_proc = getattr(soxr_ext, f'csoxr_batch_{dtype}')
+            ys = batch_proc(in_rate, out_rate, [item[2] for item in items], q, num_threads, use_pool, length)
+
+        for (idx, ndim, _, from_dlpack), y in zip(items, ys):
+            if isinstance(y, str):
+                results[idx] = RuntimeError(y)
+            elif out is not None:
+                results[idx] = _to_native(out[idx], from_dlpack)
+            elif ndim == 1:
+                results[idx] = _to_native(np.squeeze(y, axis=1), from_dlpack)
+            else:
+                results[idx] = _to_native(y, from_dlpack)
+
+    if not return_exceptions:
+        for r in results:
+            if isinstance(r, Exception):
+                raise r
+
+    return results
+
+
+def _resample_into(x: np.ndarray, out: np.ndarray, in_rate, out_rate, q, use_pool, num_threads,
+                   otype, dither, runtime_spec, length=None) -> int:
+    if (not isinstance(out, np.ndarray) or _to_soxr_datatype(out.dtype) != otype
+            or out.ndim != x.ndim or not out.flags.writeable):
+        raise TypeError(_OUT_DTYPE_ERR_STR)
+
+    if x.strides[0] == x.itemsize:  # split channel memory layout
+        if out.strides[0] != out.itemsize:
+            raise ValueError('`out` should have split channel memory layout (e.g. Fortran order) like input')
+        divide_proc = getattr(soxr_ext, f'csoxr_split_ch_into_{x.dtype}')
+    else:
+        if not out.flags.c_contiguous:
+            raise ValueError('`out` should be C-contiguous like input')
+        divide_proc = getattr(soxr_ext, f'csoxr_divide_proc_into_{x.dtype}')
+
+    min_frames = max_out_frames(x.shape[0], in_rate, out_rate) if length is None else length
+    if out.shape[0] < min_frames:
+        raise ValueError(_OUT_LEN_ERR_STR.format(min_frames))
+
+    if x.ndim == 1:
+        return divide_proc(in_rate, out_rate, x[:, np.newaxis], out[:, np.newaxis], q, use_pool, num_threads,
+                           otype, dither, runtime_spec, length)
+    elif x.ndim == 2:
+        num_channels = x.shape[1]
+        if num_channels < 1 or _CH_LIMIT < num_channels:
+            raise ValueError(_CH_EXEED_ERR_STR.format(num_channels))
+
+        return divide_proc(in_rate, out_rate, x, out, q, use_pool, num_threads, otype, dither, runtime_spec,
+                           length)
+    else:
+        raise ValueError('Input must be 1-D or 2-D array')
+
+
+def _read_npy_header(f):
+    version = np.lib.format.read_magic(f)
+    if version == (1, 0):
+        shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+    else:
+        shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+
+    if fortran_order:
+        raise ValueError('Fortran order .npy file is not supported')
+    return shape, dtype
+
+
+def _write_npy_header(f, shape, dtype):
+    header = {'descr': np.lib.format.dtype_to_descr(dtype), 'fortran_order': False, 'shape': shape}
+    np.lib.format.write_array_header_1_0(f, header)
+
+
+def resample_to_file(src, dst, in_rate: float, out_rate: float, quality='HQ',
+                     max_memory: int = 64 * 2**20, out_dtype=None) -> int:
+    """ Resample large signal into .npy file, with bounded memory usage
+
+    Input is read and resampled block by block, and output is written to file incrementally.
+    Use this for signals too big to hold in memory. (e.g. multi-hour multichannel recording)
+
+    Parameters
+    ----------
+    src : path-like or array_like
+        Input. Path of .npy file, or array (e.g. `np.memmap`).
+        Input can be mono(1D) or multi-channel(2D of [frame, channel]) in C order.
+        .npy file is read by file I/O, so only a block of input resides in memory.
+        Its dtype should be one of float32, float64, int16, int32.
+    dst : path-like
+        Path of output .npy file.
+        Output is written to a temporary file beside it, which replaces `dst` when complete.
+        On failure, existing `dst` is left intact.
+    in_rate : float
+        Input sample-rate.
+    out_rate : float
+        Output sample-rate.
+    quality : int or str, optional
+        Quality setting.
+        One of `QQ`, `LQ`, `MQ`, `HQ`, `VHQ`.
+    max_memory : int, optional
+        Approximate limit of memory used for I/O and resampling buffers, in bytes.
+        Block size is chosen to fit. (default: 64 MiB)
+    out_dtype : type or str, optional
+        Data type of output. Defaults to dtype of input.
+
+    Returns
+    -------
+    int
+        Number of output frames written.
+    """
+    if max_memory <= 0:
+        raise ValueError('max_memory should be over 0')
+
+    if in_rate <= 0 or out_rate <= 0:
+        raise ValueError('Sample rate should be over 0')
+
+    f_in = None
+    try:
+        # Validate input before touching dst
+        if isinstance(src, (str, os.PathLike)):
+            f_in = open(src, 'rb')
+            shape, dtype = _read_npy_header(f_in)
+        else:
+            x = src if isinstance(src, np.ndarray) else np.asarray(src, dtype=np.float32)
+            shape, dtype = x.shape, x.dtype
+
+        if len(shape) not in (1, 2):
+            raise ValueError('Input must be 1-D or 2-D array')
+
+        in_frames = shape[0]
+        num_channels = 1 if len(shape) == 1 else shape[1]
+        out_type = dtype if out_dtype is None else np.dtype(out_dtype)
+
+        rs = ResampleStream(in_rate, out_rate, num_channels, dtype=dtype, quality=quality,
+                            out_dtype=out_type)
+
+        # Split budget in half for I/O buffers and libsoxr's internal buffers
+        ratio = out_rate / in_rate
+        frame_bytes = num_channels * (dtype.itemsize + ratio * out_type.itemsize + 8 * (1 + ratio))
+        block_len = max(1, int(max_memory / 2 / frame_bytes))
+
+        buf = np.empty((min(block_len, in_frames), num_channels), dtype=dtype)
+        out = np.empty((rs.max_out_frames(len(buf)), num_channels), dtype=out_type)
+
+        # Written to temporary file, which replaces dst when complete.
+        # So dst is left intact on failure.
+        tmp = f'{os.fspath(dst)}.{os.getpid()}.tmp'
+        try:
+            with open(tmp, 'wb') as f_out:
+                # Expected output length. Header is corrected later if it differs.
+                out_shape = (round(in_frames * ratio),) + tuple(shape[1:])
+                _write_npy_header(f_out, out_shape, out_type)
+                header_len = f_out.tell()
+
+                out_pos = 0
+                for idx in range(0, max(in_frames, 1), block_len):
+                    x_blk = buf[:min(block_len, in_frames - idx)]
+                    if f_in is not None:
+                        if f_in.readinto(x_blk) != x_blk.nbytes:
+                            raise ValueError('Unexpected end of file')
+                    else:
+                        x_blk[:] = x[idx:idx + len(x_blk)].reshape(len(x_blk), num_channels)
+
+                    if len(out) < rs.max_out_frames(len(x_blk)):
+                        out = np.empty((rs.max_out_frames(len(x_blk)), num_channels), dtype=out_type)
+
+                    last = in_frames <= idx + block_len
+                    n = rs.resample_chunk_into(x_blk, out, last=last)
+                    f_out.write(out[:n])
+                    out_pos += n
+
+                if out_pos != out_shape[0]:
+                    f_out.seek(0)
+                    _write_npy_header(f_out, (out_pos,) + out_shape[1:], out_type)
+                    if f_out.tell() != header_len:
+                        raise RuntimeError('Failed to update .npy header')
+
+            os.replace(tmp, dst)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+    finally:
+        if f_in is not None:
+            f_in.close()
+
+    return out_pos
+
+
+class _SharedArrayOwner:
+    # Base of arrays returned on shared memory. The block is closed when the last array is deleted.
+
+    def __init__(self, shm):
+        self._shm = shm
+        self._buf = np.ndarray(shm.size, np.uint8, buffer=shm.buf)
+        self.__array_interface__ = self._buf.__array_interface__
+
+    def __del__(self):
+        self._buf = None
+        self._shm.close()
+
+
+_process_executor = None
+_process_executor_workers = None
+_process_executor_lock = threading.Lock()
+
+
+def _get_process_executor(processes):
+    global _process_executor, _process_executor_workers
+    with _process_executor_lock:
+        if _process_executor is not None and _process_executor_workers != processes:
+            _process_executor.shutdown(wait=False)
+            _process_executor = None
+        if _process_executor is None:
+            if os.name == 'posix':
+                # Workers should share resource tracker of this process, which owns the blocks.
+                # Otherwise their own trackers would unlink (or warn about) blocks attached by them.
+                resource_tracker.ensure_running()
+            _process_executor = ProcessPoolExecutor(max_workers=processes)
+            _process_executor_workers = processes
+            # Start workers now. Forked later, they would inherit mappings of blocks of the call.
+            _process_executor.submit(int).result()
+        return _process_executor
+
+
+def _aligned_nbytes(shape, dtype):
+    # Arrays in shared memory block start at cache line boundary
+    return -(-int(np.prod(shape)) * dtype.itemsize // 64) * 64
+
+
+def _resample_many_worker(src, out_name, out_offset, out_shape, out_dtype, in_rate, out_rate, quality):
+    # Blocks are attached per task, not to keep their memory after the call
+    blocks = []
+    x = out = None
+    try:
+        if isinstance(src, tuple):
+            in_name, in_offset, in_shape, in_dtype = src
+            blocks.append(shared_memory.SharedMemory(in_name))
+            x = np.ndarray(in_shape, in_dtype, buffer=blocks[-1].buf, offset=in_offset)
+        else:
+            x = np.load(src, mmap_mode='r')
+        blocks.append(shared_memory.SharedMemory(out_name))
+        out = np.ndarray(out_shape, out_dtype, buffer=blocks[-1].buf, offset=out_offset)
+        resample(x, in_rate, out_rate, quality, out=out, length=out_shape[0])
+    finally:
+        x = out = None
+        for shm in blocks:
+            shm.close()
+
+
+def resample_many(items, in_rate: float, out_rate: float, quality='HQ', processes: int = None,
+                  out_dtype=None) -> list:
+    """ Resample many signals on a process pool, through shared memory
+
+    Each input is resampled independently, same as `resample()`.
+    Inputs and outputs are passed to worker processes by shared memory, without pickling of samples.
+    Worker processes are kept for next calls, so their resampler instances stay warm.
+    Use this when Python-side work limits `resample_batch()` or threads.
+
+    Parameters
+    ----------
+    items : iterable of array_like or path-like
+        Inputs. Arrays, or paths of .npy files which are read by worker processes.
+        Each input can be mono(1D) or multi-channel(2D of [frame, channel]).
+        Its dtype should be one of float32, float64, int16, int32.
+    in_rate : float
+        Input sample-rate.
+    out_rate : float
+        Output sample-rate.
+    quality : int or str, optional
+        Quality setting.
+        One of `QQ`, `LQ`, `MQ`, `HQ`, `VHQ`.
+    processes : int, optional
+        Number of worker processes. (default: number of CPU cores)
+    out_dtype : type or str, optional
+        Data type of output. Defaults to dtype of each input.
+
+    Returns
+    -------
+    list of np.ndarray
+        Resampled data, in same order with input.
+        Arrays are views of one shared memory block, which is released when all of them are deleted.
+        Worker processes detach from blocks after each input.
+    """
+    if in_rate <= 0 or out_rate <= 0:
+        raise ValueError('Sample rate should be over 0')
+
+    processes = processes or os.cpu_count() or 1
+    if processes < 1:
+        raise ValueError('processes should be over 0')
+
+    q = _quality_to_enum(quality)
+
+    # Layout of inputs (arrays only) and outputs in shared memory blocks
+    srcs = []
+    in_offset = 0
+    out_offset = 0
+    for item in items:
+        if isinstance(item, (str, os.PathLike)):
+            with open(item, 'rb') as f:
+                shape, dtype = _read_npy_header(f)
+            x = None
+        else:
+            x = _as_array(item)
+            shape, dtype = x.shape, x.dtype
+
+        _to_soxr_datatype(dtype)
+        if len(shape) not in (1, 2):
+            raise ValueError('Input must be 1-D or 2-D array')
+        if len(shape) == 2 and (shape[1] < 1 or _CH_LIMIT < shape[1]):
+            raise ValueError(_CH_EXEED_ERR_STR.format(shape[1]))
+
+        out_type = dtype if out_dtype is None else np.dtype(out_dtype)
+        _to_soxr_datatype(out_type)
+        out_shape = (_total_out_frames(shape[0], in_rate, out_rate),) + tuple(shape[1:])
+        srcs.append((item if x is None else x, shape, dtype, out_offset, out_shape, out_type))
+        if x is not None:
+            in_offset += _aligned_nbytes(shape, dtype)
+        out_offset += _aligned_nbytes(out_shape, out_type)
+
+    ex = _get_process_executor(processes) if srcs else None
+    out_shm = shared_memory.SharedMemory(create=True, size=max(1, out_offset))
+    in_shm = None
+    try:
+        if in_offset:
+            in_shm = shared_memory.SharedMemory(create=True, size=in_offset)
+        tasks = []
+        in_offset = 0
+        for src, shape, dtype, offset, out_shape, out_type in srcs:
+            if isinstance(src, np.ndarray):
+                np.ndarray(shape, dtype, buffer=in_shm.buf, offset=in_offset)[...] = src
+                src = (in_shm.name, in_offset, shape, dtype)
+                in_offset += _aligned_nbytes(shape, dtype)
+            tasks.append((src, out_shm.name, offset, out_shape, out_type, in_rate, out_rate, q))
+
+        if tasks:
+            chunksize = max(1, len(tasks) // (processes * 4))
+            for _ in ex.map(_resample_many_worker, *zip(*tasks), chunksize=chunksize):
+                pass
+    except BaseException:
+        out_shm.close()
+        raise
+    finally:
+        if in_shm is not None:
+            in_shm.close()
+            in_shm.unlink()
+        out_shm.unlink()
+
+    # Views of one array owning the block
+    buf = np.asarray(_SharedArrayOwner(out_shm))
+    return [buf[offset:offset + int(np.prod(out_shape)) * out_type.itemsize].view(out_type).reshape(out_shape)
+            for _, _, _, offset, out_shape, out_type in srcs]
+
+
+def pool_stats() -> dict:
+    """ Get statistics of the resampler pool used by `resample()`.
+
+    Resampler instances are pooled by configuration
+    (sample-rates, number of channels, dtype, memory layout and quality).
+    Dithered int16 output is not pooled, because reused instance would produce different dithering.
+
+    Returns
+    -------
+    dict
+        `hits` and `misses` count of pool lookups,
+        `size` of idle instances in the pool and its `capacity`.
+    """
+    return soxr_ext.pool_stats()
+
+
+def set_pool_capacity(capacity: int) -> None:
+    """ Set maximum number of idle resampler instances kept in the pool.
+
+    Least recently used instances are discarded when the pool is full.
+    Set 0 to disable pooling globally.
+
+    Parameters
+    ----------
+    capacity : int
+        Maximum number of idle instances. (default: 16)
+    """
+    if capacity < 0:
+        raise ValueError('Pool capacity should be 0 or over')
+
+    soxr_ext.set_pool_capacity(capacity)
+
+
+def clear_pool() -> None:
+    """ Discard all idle resampler instances in the pool and reset its counters. """
+    soxr_ext.clear_pool()
+
+
+def resample_stats() -> dict:
+    """ Aggregate performance counters of `resample()` and `resample_batch()`, in this process.
+
+    Returns
+    -------
+    dict
+        `calls` of resampling, `frames_in` and `frames_out` in total,
+        and `native_seconds` spent in native code (w/o GIL, summed over threads).
+    """
+    return soxr_ext.resample_stats()
+
+
+def reset_resample_stats() -> None:
+    """ Reset counters of `resample_stats()`. """
+    soxr_ext.reset_resample_stats()
+
+
+def set_stats_hook(hook) -> None:
+    """ Set a callback called after each `resample()` and `ResampleStream` chunk.
+
+    Use this to export metrics to collectors. (e.g. Prometheus counters and histograms)
+    The hook runs on the calling thread, so it should be quick.
+    When no hook is set, the cost is a single check per call.
+
+    Parameters
+    ----------
+    hook : callable or None
+        `hook(source: str, frames_in: int, frames_out: int, seconds: float)`.
+        `source` is 'resample' or 'stream'. `seconds` is wall time of the call.
+        None to remove the hook.
+    """
+    global _stats_hook
+    if hook is not None and not callable(hook):
+        raise TypeError('hook should be callable or None')
+    _stats_hook = hook
 
 
 def _resample_oneshot(x: np.ndarray, in_rate: float, out_rate: float, quality='HQ') -> np.ndarray:
@@ -11,11 +11,30 @@ Python-SoXR is a Python wrapper of libsoxr.
 
 #include <stdint.h>
 #include <algorithm>
+#include <atomic>
+#include <chrono>
 #include <cmath>
+#include <condition_variable>
+#include <cstring>
+#include <deque>
+#include <functional>
+#include <list>
 #include <memory>
+#include <mutex>
+#include <new>
+#include <numeric>
+#include <thread>
+#include <vector>
+
+#ifndef _WIN32
+#include <unistd.h>
+#endif
 
 #include <nanobind/nanobind.h>
 #include <nanobind/ndarray.h>
+#include <nanobind/operators.h>
+#include <nanobind/stl/optional.h>
+#include <nanobind/stl/vector.h>
 
 #include <soxr.h>
 
@@ -46,316 +65,2747 @@ template <> constexpr soxr_datatype_t to_s_dtype<int32_t> = SOXR_INT32_S;
 template <> constexpr soxr_datatype_t to_s_dtype<int16_t> = SOXR_INT16_S;
 
 
+template <typename T> struct type_tag { using type = T; };
+
+// Call fn(type_tag<T>{}) with the C type T of `dtype`
+template <typename F>
+auto visit_dtype(soxr_datatype_t dtype, F fn) {
+    switch (dtype & ~SOXR_SPLIT) {
+    case SOXR_FLOAT32_I: return fn(type_tag<float>{});
+    case SOXR_FLOAT64_I: return fn(type_tag<double>{});
+    case SOXR_INT32_I:   return fn(type_tag<int32_t>{});
+    case SOXR_INT16_I:   return fn(type_tag<int16_t>{});
+    default: throw nb::type_error("Unsupported data type");
+    }
+}
+
+
+// libsoxr runtime resources. Defaults are same with soxr_runtime_spec(1).
+struct RuntimeSpec {
+    unsigned log2_min_dft_size = 10;
+    unsigned log2_large_dft_size = 17;
+    unsigned coef_size_kbytes = 400;
+    unsigned num_threads = 1;   // libsoxr's OpenMP threads. 0: per OMP_NUM_THREADS
+
+    RuntimeSpec() = default;
+
+    RuntimeSpec(unsigned num_threads, unsigned log2_min_dft_size, unsigned log2_large_dft_size,
+                unsigned coef_size_kbytes) :
+            log2_min_dft_size(log2_min_dft_size),
+            log2_large_dft_size(log2_large_dft_size),
+            coef_size_kbytes(coef_size_kbytes),
+            num_threads(num_threads) {
+        if (log2_min_dft_size < 8 || 15 < log2_min_dft_size)
+            throw std::invalid_argument("log2_min_dft_size should be in [8, 15]");
+        if (log2_large_dft_size < 8 || 20 < log2_large_dft_size)
+            throw std::invalid_argument("log2_large_dft_size should be in [8, 20]");
+        if (coef_size_kbytes < 100 || 800 < coef_size_kbytes)
+            throw std::invalid_argument("coef_size_kbytes should be in [100, 800]");
+        if (64 < num_threads)
+            throw std::invalid_argument("num_threads should be in [0, 64]");
+    }
+
+    bool operator==(const RuntimeSpec& o) const {
+        return log2_min_dft_size == o.log2_min_dft_size && log2_large_dft_size == o.log2_large_dft_size
+            && coef_size_kbytes == o.coef_size_kbytes && num_threads == o.num_threads;
+    }
+
+    soxr_runtime_spec_t to_soxr() const {
+        soxr_runtime_spec_t spec = soxr_runtime_spec(num_threads);
+        spec.log2_min_dft_size = log2_min_dft_size;
+        spec.log2_large_dft_size = log2_large_dft_size;
+        spec.coef_size_kbytes = coef_size_kbytes;
+        return spec;
+    }
+};
+
+
+// Everything that determines the behavior of a soxr_t
+struct SoxrConfig {
+    double in_rate;
+    double out_rate;
+    unsigned channels;
+    soxr_datatype_t itype;
+    soxr_datatype_t otype;
+    unsigned long quality;
+    bool dither = true;     // TPDF dither for int16 output
+    RuntimeSpec runtime {};
+
+    bool operator==(const SoxrConfig& o) const {
+        return in_rate == o.in_rate && out_rate == o.out_rate && channels == o.channels
+            && itype == o.itype && otype == o.otype && quality == o.quality && dither == o.dither
+            && runtime == o.runtime;
+    }
+
+    // int16 output is dithered, and soxr_clear() resets the dither seed.
+    // Reused instance would not reproduce fresh instance's output.
+    bool poolable() const {
+        return !dither || (otype & ~SOXR_SPLIT) != SOXR_INT16_I;
+    }
+
+    soxr_t create(soxr_error_t* err) const {
+        soxr_io_spec_t io_spec = soxr_io_spec(itype, otype);
+        if (!dither) io_spec.flags |= SOXR_NO_DITHER;
+        const soxr_quality_spec_t quality_spec = soxr_quality_spec(quality, 0);
+        const soxr_runtime_spec_t runtime_spec = runtime.to_soxr();
+
+        return soxr_create(
+            in_rate, out_rate, channels,
+            err, &io_spec, &quality_spec, &runtime_spec);
+    }
+};
+
+
+// Keeps idle soxr_t instances to skip soxr_create() on repeated resample() calls.
+// Least recently used instance is evicted when the pool exceeds its capacity.
+class SoxrPool {
+    std::mutex _mutex;
+    std::list<std::pair<SoxrConfig, soxr_t>> _idle;  // front: most recently used
+    size_t _capacity = 16;
+    size_t _hits = 0;
+    size_t _misses = 0;
+
+    void _evict(size_t size) {
+        while (size < _idle.size()) {
+            soxr_delete(_idle.back().second);
+            _idle.pop_back();
+        }
+    }
+
+public:
+    ~SoxrPool() { _evict(0); }
+
+    soxr_t acquire(const SoxrConfig& config, soxr_error_t* err, bool use_pool=true) {
+        if (use_pool && config.poolable()) {
+            std::lock_guard<std::mutex> lock(_mutex);
+            for (auto it = _idle.begin(); it != _idle.end(); ++it) {
+                if (it->first == config) {
+                    soxr_t soxr = it->second;
+                    _idle.erase(it);
+                    ++_hits;
+                    return soxr;
+                }
+            }
+            ++_misses;
+        }
+        return config.create(err);
+    }
+
+    // Take back `soxr` after use. Instances with error are not reused.
+    void release(const SoxrConfig& config, soxr_t soxr, soxr_error_t err, bool use_pool=true) {
+        if (!use_pool || !config.poolable() || err || soxr_clear(soxr)) {
+            soxr_delete(soxr);
+            return;
+        }
+        std::lock_guard<std::mutex> lock(_mutex);
+        _idle.emplace_front(config, soxr);
+        _evict(_capacity);
+    }
+
+    void set_capacity(size_t capacity) {
+        std::lock_guard<std::mutex> lock(_mutex);
+        _capacity = capacity;
+        _evict(_capacity);
+    }
+
+    void clear() {
+        std::lock_guard<std::mutex> lock(_mutex);
+        _evict(0);
+        _hits = 0;
+        _misses = 0;
+    }
+
+    nb::dict stats() {
+        std::lock_guard<std::mutex> lock(_mutex);
+        nb::dict d;
+        d["hits"] = _hits;
+        d["misses"] = _misses;
+        d["size"] = _idle.size();
+        d["capacity"] = _capacity;
+        return d;
+    }
+};
+
+static SoxrPool g_pool;
+
+
+// Aggregate counters of one-shot resampling. (resample(), resample_batch())
+class ResampleStats {
+    std::atomic<uint64_t> _calls { 0 };
+    std::atomic<uint64_t> _frames_in { 0 };
+    std::atomic<uint64_t> _frames_out { 0 };
+    std::atomic<uint64_t> _native_ns { 0 };
+
+public:
+    void add(size_t frames_in, size_t frames_out, std::chrono::steady_clock::time_point t0) {
+        const auto elapsed = std::chrono::steady_clock::now() - t0;
+        _calls.fetch_add(1, std::memory_order_relaxed);
+        _frames_in.fetch_add(frames_in, std::memory_order_relaxed);
+        _frames_out.fetch_add(frames_out, std::memory_order_relaxed);
+        _native_ns.fetch_add(
+            std::chrono::duration_cast<std::chrono::nanoseconds>(elapsed).count(), std::memory_order_relaxed);
+    }
+
+    nb::dict stats() const {
+        nb::dict d;
+        d["calls"] = _calls.load();
+        d["frames_in"] = _frames_in.load();
+        d["frames_out"] = _frames_out.load();
+        d["native_seconds"] = _native_ns.load() * 1e-9;
+        return d;
+    }
+
+    void reset() {
+        _calls = 0;
+        _frames_in = 0;
+        _frames_out = 0;
+        _native_ns = 0;
+    }
+};
+
+static ResampleStats g_stats;
+
+
+// Raises if another thread is in a method of the object, instead of racing on its state.
+// (e.g. free-threaded Python, or while GIL is released for processing)
+// Nested calls of the owning thread pass.
+// With `try_only`, it doesn't raise. Check `acquired()` instead.
+class OwnerGuard {
+    std::atomic<std::thread::id>& _owner;
+    bool _nested;
+    bool _acquired = true;
+
+public:
+    explicit OwnerGuard(std::atomic<std::thread::id>& owner, bool try_only=false) : _owner(owner) {
+        const auto self = std::this_thread::get_id();
+        _nested = _owner.load(std::memory_order_relaxed) == self;
+
+        std::thread::id none;
+        if (!_nested && !_owner.compare_exchange_strong(none, self, std::memory_order_acquire)) {
+            if (!try_only)
+                throw std::runtime_error("Resampler is in use by another thread");
+            _acquired = false;
+        }
+    }
+
+    bool acquired() const { return _acquired; }
+    bool nested() const { return _nested; }
+
+    ~OwnerGuard() {
+        if (_acquired && !_nested) _owner.store(std::thread::id(), std::memory_order_release);
+    }
+};
+
+
+// Output buffer shared by streams of a thread. (`CSoxr::_shared_buf`)
+struct SharedBuf {
+    std::shared_ptr<uint8_t[]> buf;
+    size_t bytes = 0;
+};
+
+static thread_local SharedBuf t_shared_buf;
+
+
+// Resolve number of threads to use. (0: number of CPU cores)
+inline unsigned num_workers(unsigned num_threads) {
+    return num_threads ? num_threads : std::max(1u, std::thread::hardware_concurrency());
+}
+
+
+// Persistent worker threads of parallel_for(). Created lazily, grown to the largest `num_threads` used.
+// Never destroyed, so idle threads don't delay interpreter exit.
+class WorkerPool {
+    std::mutex _mutex;
+    std::condition_variable _cv;
+    std::deque<std::function<void()>> _tasks;
+    std::vector<std::thread> _threads;
+#ifndef _WIN32
+    const pid_t _pid = getpid();
+#endif
+
+    void _work() {
+        for (;;) {
+            std::function<void()> task;
+            {
+                std::unique_lock<std::mutex> lock(_mutex);
+                _cv.wait(lock, [&] { return !_tasks.empty(); });
+                task = std::move(_tasks.front());
+                _tasks.pop_front();
+            }
+            task();
+        }
+    }
+
+public:
+    // Threads don't exist in a forked child. (e.g. multiprocessing)
+    bool usable() const {
+#ifndef _WIN32
+        return _pid == getpid();
+#else
+        return true;
+#endif
+    }
+
+    // Queue `count` runs of `task`, with at least `num_threads` threads if they can be created.
+    void post(size_t num_threads, const std::function<void()>& task, size_t count) {
+        std::lock_guard<std::mutex> lock(_mutex);
+        try {
+            while (_threads.size() < num_threads)
+                _threads.emplace_back([this] { _work(); });
+        } catch (const std::system_error&) {
+            // Go on with threads created so far
+        }
+        for (size_t i = 0; i < count; ++i)
+            _tasks.push_back(task);
+        _cv.notify_all();
+    }
+};
+
+inline WorkerPool& worker_pool() {
+    static WorkerPool* pool = new WorkerPool();
+    return *pool;
+}
+
+
+// Run fn(0), ..., fn(n-1) on up to `num_threads` threads. (0: number of CPU cores)
+// The calling thread works too, with helpers from the persistent WorkerPool.
+// Helpers which start late (e.g. pool busy with outer parallel_for) find no work and return,
+// so nested calls don't deadlock. `fn` must not throw.
+template <typename F>
+void parallel_for(size_t n, unsigned num_threads, F fn) {
+    num_threads = std::min<size_t>(num_workers(num_threads), n);
+
+    if (num_threads <= 1 || !worker_pool().usable()) {
+        for (size_t i = 0; i < n; ++i) fn(i);
+        return;
+    }
+
+    struct State {
+        std::atomic<size_t> next { 0 };
+        std::atomic<size_t> active { 0 };  // helpers in work loop
+        std::mutex mutex;
+        std::condition_variable done;
+        std::atomic<bool> finished { false };
+    };
+    auto state = std::make_shared<State>();
+    const std::function<void(size_t)> work = std::ref(fn);
+    const std::function<void(size_t)>* work_ptr = &work;
+
+    // Helpers reference `work` only while they have claimed an index. See the wait below.
+    worker_pool().post(num_threads - 1, [state, work_ptr, n] {
+        ++state->active;
+        if (!state->finished) {
+            for (size_t i = state->next++; i < n; i = state->next++) (*work_ptr)(i);
+        }
+        if (--state->active == 0) {
+            std::lock_guard<std::mutex> lock(state->mutex);
+            state->done.notify_all();
+        }
+    }, num_threads - 1);
+
+    for (size_t i = state->next++; i < n; i = state->next++) fn(i);
+    state->finished = true;
+
+    std::unique_lock<std::mutex> lock(state->mutex);
+    state->done.wait(lock, [&] { return state->active == 0; });
+}
+
+
+// Grow `buf` to fit `req_size` bytes, to next power of 2 (but not over `max_size` if it fits)
+template <typename Buf>
+void grow_buf(Buf& buf, size_t& buf_bytes, size_t req_size, bool copy, size_t max_size=SIZE_MAX) {
+    if (buf && req_size < buf_bytes)
+        return;
+
+    size_t new_size = 1024;
+    while (new_size < req_size) new_size <<= 1;
+    new_size = std::min(new_size, std::max(req_size, max_size));
+
+    Buf new_buf(new uint8_t[new_size]);
+    if (copy && buf) {
+        std::copy_n(buf.get(), buf_bytes, new_buf.get());
+    }
+    buf = std::move(new_buf);
+    buf_bytes = new_size;
+}
+
+
+// Interleaved buffer, or split channel buffers (channel `ch` at `ch_data[ch]`)
+template <typename T>
+class ChBuf {
+    std::vector<T*> _ptrs;  // per-channel pointers passed to soxr
+
+public:
+    T* data = nullptr;
+    std::vector<T*> ch_data;
+    unsigned channels = 0;
+
+    static ChBuf interleaved(T* data, unsigned channels) {
+        ChBuf buf;
+        buf.data = data;
+        buf.channels = channels;
+        return buf;
+    }
+
+    static ChBuf split(std::vector<T*> ch_data) {
+        ChBuf buf;
+        buf.channels = ch_data.size();
+        buf.ch_data = std::move(ch_data);
+        buf._ptrs.resize(buf.channels);
+        return buf;
+    }
+
+    static ChBuf split(T* data, int64_t ch_stride, unsigned channels) {
+        std::vector<T*> ch_data(channels);
+        for (unsigned ch = 0; ch < channels; ++ch)
+            ch_data[ch] = data + ch_stride * ch;
+        return split(std::move(ch_data));
+    }
+
+    bool is_split() const { return !ch_data.empty(); }
+
+    // soxr_in_t or soxr_out_t pointing frame `pos`
+    void* at(size_t pos) {
+        if (!is_split())
+            return (void*)(data + pos * channels);
+
+        for (unsigned ch = 0; ch < channels; ++ch)
+            _ptrs[ch] = ch_data[ch] + pos;
+        return (void*)_ptrs.data();
+    }
+
+    // Channels [offset, offset+num) of split buffer
+    ChBuf sub(unsigned offset, unsigned num) const {
+        return split(std::vector<T*>(ch_data.begin() + offset, ch_data.begin() + offset + num));
+    }
+
+    // Buffer starting from frame `pos`
+    ChBuf shift(size_t pos) const {
+        if (!is_split())
+            return interleaved(data + pos * channels, channels);
+
+        std::vector<T*> shifted(ch_data);
+        for (auto& p : shifted) p += pos;
+        return split(std::move(shifted));
+    }
+
+    T& operator()(size_t pos, unsigned ch) {
+        return is_split() ? ch_data[ch][pos] : data[pos * channels + ch];
+    }
+};
+
+
+// Copy `len` frames of `src` into channels starting from `offset` of `dst`
+template <typename T>
+void copy_frames(ChBuf<T>& src, ChBuf<T>& dst, unsigned offset, size_t len) {
+    if (!src.is_split() && !dst.is_split()) {
+        for (size_t i = 0; i < len; ++i)
+            std::copy_n(&src.data[i*src.channels], src.channels, &dst.data[i*dst.channels + offset]);
+    } else if (src.is_split() && dst.is_split()) {
+        for (unsigned ch = 0; ch < src.channels; ++ch)
+            std::copy_n(src.ch_data[ch], len, dst.ch_data[offset + ch]);
+    } else {
+        for (size_t i = 0; i < len; ++i)
+            for (unsigned ch = 0; ch < src.channels; ++ch)
+                dst(i, offset + ch) = src(i, ch);
+    }
+}
+
+
 class CSoxr {
     soxr_t _soxr = nullptr;
     double _oi_ratio;           // out_rate/in_rate
-    std::unique_ptr<uint8_t[]> _y_buf;
+    std::shared_ptr<uint8_t[]> _y_buf;  // also referenced by zero-copy outputs
     size_t _y_buf_bytes = 0;    // _y_buf size in bytes
     size_t _olen = 0;           // _y_buf size in frames
 
+    // Channel groups processed on worker threads. (_soxr is not used if any)
+    std::vector<std::unique_ptr<CSoxr>> _groups;
+    std::vector<unsigned> _ch_offsets;
+    std::unique_ptr<uint8_t[]> _x_buf;  // gathered input of a channel group
+    size_t _x_buf_bytes = 0;
+
+    // Counters for stats()
+    uint64_t _calls = 0;
+    uint64_t _frames_in = 0;
+    uint64_t _frames_out = 0;
+    uint64_t _native_ns = 0;        // time spent in _run_nogil()
+    uint64_t _buf_allocs = 0;       // `_y_buf` (re)allocations
+    uint64_t _buf_peak_bytes = 0;
+    uint64_t _flush_iters = 0;      // soxr_process() calls to flush
+
+    // Buffer memory policy. See set_buffer_policy()
+    size_t _max_buf_bytes = 0;      // 0: unlimited
+    unsigned _shrink_after = 0;     // 0: never
+    unsigned _small_calls = 0;      // consecutive calls using < 1/4 of `_y_buf`
+    bool _shared_buf = false;
+
+    std::atomic<std::thread::id> _owner { std::thread::id() };  // thread in a method. See OwnerGuard
+    friend class CSoxrBank;
+
+    // Values of read-only accessors as of the last call, returned while another thread is processing.
+    // (e.g. AsyncResampleStream)
+    std::atomic<double> _last_delay { 0 };
+    std::atomic<double> _last_oi_ratio { 0 };
+    std::atomic<size_t> _last_clips { 0 };
+
 public:
     const double _in_rate;
     const double _out_rate;
-    const soxr_datatype_t _ntype;
+    const soxr_datatype_t _itype;
+    const soxr_datatype_t _otype;
+    const bool _split;          // split channel I/O
     const unsigned _channels;
     const size_t _div_len;      // length to divide long input (in frames)
+    const bool _zero_copy;      // return outputs sharing `_y_buf`
     bool _ended = false;
 
     CSoxr(double in_rate, double out_rate, unsigned num_channels,
-          soxr_datatype_t ntype, unsigned long quality, bool vr) :
+          soxr_datatype_t itype, soxr_datatype_t otype, unsigned long quality, bool vr,
+          unsigned num_threads=1, bool zero_copy=false, bool dither=true,
+          const RuntimeSpec& runtime=RuntimeSpec()) :
             _in_rate(in_rate),
             _out_rate(out_rate),
             _oi_ratio(out_rate / in_rate),
-            _ntype(ntype),
+            _itype(itype),
+            _otype(otype),
+            _split(itype & SOXR_SPLIT),
             _channels(num_channels),
-            _div_len(std::max(1000., 48000 * _in_rate / _out_rate)) {
+            _div_len(std::max(1000., 48000 * _in_rate / _out_rate)),
+            _zero_copy(zero_copy) {
+        if ((itype & SOXR_SPLIT) != (otype & SOXR_SPLIT))
+            throw std::invalid_argument("Memory layout mismatch");
+        _last_oi_ratio = _oi_ratio;
+
+        const unsigned num_groups = std::min(num_workers(num_threads), num_channels);
+
+        if (1 < num_groups) {
+            // split channels evenly
+            for (unsigned g = 0; g < num_groups; ++g) {
+                const unsigned ch_begin = num_channels * g / num_groups;
+                const unsigned ch_end = num_channels * (g+1) / num_groups;
+                _ch_offsets.push_back(ch_begin);
+                _groups.push_back(make_unique<CSoxr>(
+                    in_rate, out_rate, ch_end - ch_begin, itype, otype, quality, vr,
+                    1, false, dither, runtime));
+            }
+            return;
+        }
+
         soxr_error_t err = NULL;
-        soxr_io_spec_t io_spec = soxr_io_spec(ntype, ntype);
+        soxr_io_spec_t io_spec = soxr_io_spec(itype, otype);
+        if (!dither) io_spec.flags |= SOXR_NO_DITHER;
         soxr_quality_spec_t quality_spec = soxr_quality_spec(quality, vr ? SOXR_VR : 0);
+        soxr_runtime_spec_t runtime_spec = runtime.to_soxr();
 
         _soxr = soxr_create(
             in_rate, out_rate, num_channels,
-            &err, &io_spec, &quality_spec, NULL);
+            &err, &io_spec, &quality_spec, &runtime_spec);
+
+        if (err != NULL) {
+            throw std::runtime_error(err);
+        }
+    }
+
+    ~CSoxr() {
+        soxr_delete(_soxr);
+    }
+
+    template <typename T>
+    ChBuf<T> _ybuf() {
+        T* y = reinterpret_cast<T*>(_y_buf.get());
+        return _split ? ChBuf<T>::split(y, _olen, _channels) : ChBuf<T>::interleaved(y, _channels);
+    }
+
+    // Grow `_y_buf` to fit `req_len` frames
+    template <typename T>
+    ChBuf<T> _resize_ybuf(size_t req_len, bool copy) {
+        const size_t old_olen = _olen;
+        const auto old_buf = _y_buf;
+
+        grow_buf(_y_buf, _y_buf_bytes, sizeof(T) * req_len * _channels, copy && !_split,
+                 _max_buf_bytes ? _max_buf_bytes : SIZE_MAX);
+        _olen = _y_buf_bytes / (sizeof(T) * _channels);
+        if (_y_buf != old_buf) {
+            ++_buf_allocs;
+            _buf_peak_bytes = std::max<uint64_t>(_buf_peak_bytes, _y_buf_bytes);
+        }
+
+        if (copy && _split && old_buf && old_buf != _y_buf) {
+            // move each channel to its new position
+            const T* src = reinterpret_cast<const T*>(old_buf.get());
+            T* dst = reinterpret_cast<T*>(_y_buf.get());
+            for (unsigned ch = 0; ch < _channels; ++ch)
+                std::copy_n(&src[old_olen * ch], old_olen, &dst[_olen * ch]);
+        }
+        return _ybuf<T>();
+    }
+
+    // Flush until no more output.
+    // `_y_buf` grows if output is full, unless writing to external `out` buffer.
+    template <typename T>
+    soxr_error_t _flush(soxr_in_t input, ChBuf<T>& y, size_t& olen, size_t& out_pos, bool grow) {
+        size_t odone = 0;
+        do {
+            if (olen <= out_pos) {
+                if (!grow) break;  // remaining output stays pending in soxr
+
+                y = _resize_ybuf<T>(_olen * 2, true);
+                olen = _olen;
+            }
+            soxr_error_t err = soxr_process(
+                _soxr,
+                input, 0, NULL,
+                y.at(out_pos), olen-out_pos, &odone);
+            out_pos += odone;
+            ++_flush_iters;
+
+            if (err != NULL) return err;
+        } while (0 < odone);
+        return NULL;
+    }
+
+    // Resample `x` into `out`, or `_y_buf` if `out` is not given. (GIL-free)
+    template <typename TI, typename TO>
+    soxr_error_t _process(ChBuf<const TI>& x, size_t ilen, bool last, size_t& out_pos,
+                          const ChBuf<TO>* out=nullptr, size_t out_len=0) {
+        const bool grow = !out;
+
+        ChBuf<TO> y;
+        size_t olen = out_len;
+        if (grow) {
+            // This is slower than returning fixed `ilen * _oi_ratio` buffers w/o copying.
+            // But it ensures the lowest output delay provided by libsoxr.
+            y = _resize_ybuf<TO>(max_out_len(ilen), false);
+            olen = _olen;
+        } else {
+            y = *out;
+        }
+
+        // divide long input and process
+        soxr_error_t err = NULL;
+        size_t odone = 0;
+        for (size_t idx = 0; idx < ilen && !err; idx += _div_len) {
+            err = soxr_process(
+                _soxr,
+                x.at(idx), std::min(_div_len, ilen-idx), NULL,
+                y.at(out_pos), olen-out_pos, &odone);
+            out_pos += odone;
+
+            if (!err && olen <= out_pos) {
+                // for VR mode, output buffer may be full
+                err = _flush<TO>(x.at(idx), y, olen, out_pos, grow);
+            }
+        }
+
+        // flush if last input
+        if (!err && last) {
+            err = _flush<TO>(NULL, y, olen, out_pos, grow);
+        }
+        return err;
+    }
+
+    // Copy channels of this group from interleaved `x` into `_x_buf`
+    template <typename T>
+    ChBuf<const T> _gather(const ChBuf<const T>& x, size_t ilen, unsigned offset) {
+        grow_buf(_x_buf, _x_buf_bytes, sizeof(T) * ilen * _channels, false);
+        T* xg = reinterpret_cast<T*>(_x_buf.get());
+
+        for (size_t i = 0; i < ilen; ++i)
+            std::copy_n(&x.data[i*x.channels + offset], _channels, &xg[i*_channels]);
+        return ChBuf<const T>::interleaved(xg, _channels);
+    }
+
+    // Resample each channel group on its own thread,
+    // then merge into `out` or `_y_buf`. (GIL-free)
+    template <typename TI, typename TO>
+    soxr_error_t _process_groups(ChBuf<const TI>& x, size_t ilen, bool last, size_t& out_pos,
+                                 const ChBuf<TO>* out=nullptr, size_t out_len=0) {
+        if (!out || !_max_buf_bytes)
+            return _process_groups_step<TI, TO>(x, ilen, last, out_pos, out, out_len);
+
+        // Process in slices, to keep buffers of groups within `_max_buf_bytes`
+        const size_t step = _max_in_len<TO>();
+        size_t idx = 0;
+        do {
+            const size_t len = std::min(step, ilen - idx);
+            ChBuf<const TI> xs = x.shift(idx);
+            const ChBuf<TO> ys = out->shift(out_pos);
+            size_t odone = 0;
+            soxr_error_t err = _process_groups_step<TI, TO>(
+                xs, len, last && ilen <= idx + len, odone, &ys, out_len - out_pos);
+            if (err) return err;
+
+            out_pos += odone;
+            idx += len;
+        } while (idx < ilen);
+        return NULL;
+    }
+
+    template <typename TI, typename TO>
+    soxr_error_t _process_groups_step(ChBuf<const TI>& x, size_t ilen, bool last, size_t& out_pos,
+                                      const ChBuf<TO>* out=nullptr, size_t out_len=0) {
+        const size_t num_groups = _groups.size();
+        std::vector<size_t> out_lens(num_groups, 0);
+        std::vector<soxr_error_t> errs(num_groups, nullptr);
+
+        parallel_for(num_groups, num_groups, [&](size_t g) {
+            CSoxr& grp = *_groups[g];
+            try {
+                ChBuf<const TI> xg = _split
+                    ? x.sub(_ch_offsets[g], grp._channels)
+                    : grp._gather<TI>(x, ilen, _ch_offsets[g]);
+                errs[g] = grp._process<TI, TO>(xg, ilen, last, out_lens[g]);
+            } catch (const std::bad_alloc&) {
+                errs[g] = "malloc failed";
+            }
+        });
+
+        for (size_t g = 0; g < num_groups; ++g) {
+            if (errs[g]) return errs[g];
+            if (out_lens[g] != out_lens[0]) return "Channel group output length mismatch";
+        }
+
+        out_pos = out_lens[0];
+        ChBuf<TO> y;
+        if (!out) {
+            y = _resize_ybuf<TO>(out_pos, false);
+        } else if (out_len < out_pos) {
+            return "Output buffer too small";
+        } else {
+            y = *out;
+        }
+
+        for (size_t g = 0; g < num_groups; ++g) {
+            ChBuf<TO> yg = _groups[g]->_ybuf<TO>();
+            copy_frames(yg, y, _ch_offsets[g], out_pos);
+        }
+        return NULL;
+    }
+
+    // Input length whose output fits in `_max_buf_bytes`
+    template <typename T>
+    size_t _max_in_len() {
+        const double max_frames = (double)_max_buf_bytes / (sizeof(T) * _channels);
+        return std::max(1., (max_frames - delay() - 1) / _oi_ratio);
+    }
+
+    template <typename T>
+    void _check_input(unsigned channels, bool split) {
+        if (_ended)
+            throw std::runtime_error("Input after last input");
+
+        if (channels != _channels)
+            throw std::invalid_argument("Channel num mismatch");
+
+        if (split != _split)
+            throw std::invalid_argument("Memory layout mismatch");
+
+        constexpr soxr_datatype_t ntype = to_i_dtype<T>;
+
+        if (ntype != (_itype & ~SOXR_SPLIT))
+            throw nb::type_error("Data type mismatch");
+    }
+
+    // Resample into `out`, or `_y_buf` if `out` is not given. Returns number of frames written.
+    template <typename TI, typename TO>
+    size_t _run(ChBuf<const TI>& x, size_t ilen, bool last,
+                const ChBuf<TO>* out=nullptr, size_t out_len=0) {
+        soxr_error_t err = NULL;
+        size_t out_pos = 0;
+        {
+            nb::gil_scoped_release release;
+            err = _run_nogil<TI, TO>(x, ilen, last, out_pos, out, out_len);
+        }
+
+        if (err) {
+            throw std::runtime_error(err);
+        }
+        return out_pos;
+    }
+
+    // _run() without GIL handling and exception. (GIL-free)
+    template <typename TI, typename TO>
+    soxr_error_t _run_nogil(ChBuf<const TI>& x, size_t ilen, bool last, size_t& out_pos,
+                            const ChBuf<TO>* out=nullptr, size_t out_len=0) {
+        // Leave buffer to previous outputs if they still reference it
+        if (!out && 1 < _y_buf.use_count()) {
+            _y_buf.reset();
+            _y_buf_bytes = 0;
+        }
+
+        // Release oversized buffers, to be reallocated to fit
+        if (!out && _shrink_after && _shrink_after <= _small_calls) {
+            trim();
+        }
+
+        _ended = last;
+        const auto t0 = std::chrono::steady_clock::now();
+
+        soxr_error_t err = NULL;
+        try {
+            if (_groups.empty())
+                err = _process<TI, TO>(x, ilen, last, out_pos, out, out_len);
+            else
+                err = _process_groups<TI, TO>(x, ilen, last, out_pos, out, out_len);
+        } catch (const std::bad_alloc&) {
+            err = "malloc failed";
+        }
+
+        if (!out) {
+            // output is in `_y_buf`, and also in buffers of groups if any
+            const size_t used = sizeof(TO) * _channels * out_pos * (_groups.empty() ? 1 : 2);
+            size_t held = _y_buf_bytes;
+            for (auto& grp : _groups) held += grp->_y_buf_bytes + grp->_x_buf_bytes;
+            _small_calls = used * 4 < held ? _small_calls + 1 : 0;
+        }
+
+        ++_calls;
+        _frames_in += ilen;
+        _frames_out += out_pos;
+        _native_ns += std::chrono::duration_cast<std::chrono::nanoseconds>(
+            std::chrono::steady_clock::now() - t0).count();
+        _update_last();
+        return err;
+    }
+
+    void _update_last() {
+        _last_delay = _delay();
+        _last_oi_ratio = _oi_ratio;
+        _last_clips = _num_clips();
+    }
+
+    double _delay() { return _groups.empty() ? soxr_delay(_soxr) : _groups[0]->_delay(); }
+
+    size_t _num_clips() {
+        if (_groups.empty())
+            return *soxr_num_clips(_soxr);
+
+        size_t clips = 0;
+        for (auto& grp : _groups) clips += grp->_num_clips();
+        return clips;
+    }
+
+    // Output array of `_y_buf`. Returns a copy, or read-only array sharing `_y_buf` if `_zero_copy`.
+    template <typename T>
+    nb::object _output(size_t out_pos) {
+        T* y = reinterpret_cast<T*>(_y_buf.get());
+        const size_t channels = _channels;
+
+        if (_zero_copy) {
+            // Release the reference when the 'owner' capsule expires
+            auto ref = new std::shared_ptr<uint8_t[]>(_y_buf);
+            nb::capsule owner(ref, [](void *p) noexcept {
+                delete (std::shared_ptr<uint8_t[]> *) p;
+            });
+            if (_split)
+                return ndarray<nb::numpy, const T>(y, { out_pos, channels }, owner, { (int64_t)1, (int64_t)_olen }).cast();
+            return ndarray<nb::numpy, const T>(y, { out_pos, channels }, owner).cast();
+        }
+
+        if (!_split) {
+            // Return a copy
+            return ndarray<nb::numpy, T>(y, { out_pos, channels }).cast();
+        }
+
+        // Return a compact copy of split channels
+        T* y_copy = new T[out_pos * channels];
+        for (size_t ch = 0; ch < channels; ++ch)
+            std::copy_n(&y[_olen * ch], out_pos, &y_copy[out_pos * ch]);
+
+        // Delete 'y_copy' when the 'owner' capsule expires
+        nb::capsule owner(y_copy, [](void *p) noexcept {
+            delete[] (T *) p;
+        });
+        return ndarray<nb::numpy, T>(y_copy, { out_pos, channels }, owner, { (int64_t)1, (int64_t)out_pos }).cast();
+    }
+
+    // Resample into new array, not to grow `_y_buf` over `_max_buf_bytes`
+    template <typename TI, typename TO>
+    nb::object _run_unbuffered(ChBuf<const TI>& x, size_t ilen, bool last) {
+        const size_t len = max_out_len(ilen);
+        const size_t channels = _channels;
+        TO* y = new TO[len * channels];
+
+        // Delete 'y' when the 'owner' capsule expires
+        nb::capsule owner(y, [](void *p) noexcept {
+            delete[] (TO *) p;
+        });
+        const auto yb = _split ? ChBuf<TO>::split(y, len, _channels) : ChBuf<TO>::interleaved(y, _channels);
+        const size_t out_pos = _run<TI, TO>(x, ilen, last, &yb, len);
+
+        if (_split)
+            return ndarray<nb::numpy, TO>(y, { out_pos, channels }, owner, { (int64_t)1, (int64_t)len }).cast();
+        return ndarray<nb::numpy, TO>(y, { out_pos, channels }, owner).cast();
+    }
+
+    // Resample into `_y_buf` and return output array of `_otype`
+    template <typename TI>
+    nb::object _run_output(ChBuf<const TI>& x, size_t ilen, bool last) {
+        // Borrow output buffer of this thread during the call
+        struct Lease {
+            CSoxr* s;
+            ~Lease() {
+                if (!s) return;
+                t_shared_buf.buf = std::move(s->_y_buf);
+                t_shared_buf.bytes = s->_y_buf_bytes;
+                s->_y_buf_bytes = 0;
+                s->_olen = 0;
+            }
+        } lease { _shared_buf ? this : nullptr };
+        if (_shared_buf) {
+            _y_buf = std::move(t_shared_buf.buf);
+            _y_buf_bytes = t_shared_buf.bytes;
+        }
+
+        return visit_dtype(_otype, [&](auto tag) -> nb::object {
+            using TO = typename decltype(tag)::type;
+            if (_max_buf_bytes && _max_buf_bytes < sizeof(TO) * _channels * max_out_len(ilen))
+                return this->template _run_unbuffered<TI, TO>(x, ilen, last);
+
+            const size_t out_pos = this->template _run<TI, TO>(x, ilen, last);
+            return this->template _output<TO>(out_pos);
+        });
+    }
+
+    // Resample into `out`. `out` should have dtype of `_otype`.
+    template <typename TI, typename Out>
+    size_t _run_into(ChBuf<const TI>& x, size_t ilen, bool last, Out& out) {
+        _check_output(ilen, out.shape(0), out.shape(1));
+
+        return visit_dtype(_otype, [&](auto tag) {
+            using TO = typename decltype(tag)::type;
+            if (out.dtype() != nb::dtype<TO>())
+                throw nb::type_error("Output data type mismatch");
+
+            TO* y = static_cast<TO*>(out.data());
+            const auto yb = _split
+                ? ChBuf<TO>::split(y, out.stride(1), _channels)
+                : ChBuf<TO>::interleaved(y, _channels);
+            return this->template _run<TI, TO>(x, ilen, last, &yb, out.shape(0));
+        });
+    }
+
+    template <typename T>
+    nb::object process(
+            ndarray<const T, nb::ndim<2>, nb::c_contig, nb::device::cpu> x,
+            bool last=false) {
+        OwnerGuard guard(_owner);
+        _check_input<T>(x.shape(1), false);
+
+        auto xb = ChBuf<const T>::interleaved(x.data(), _channels);
+        return _run_output(xb, x.shape(0), last);
+    }
+
+    // split channel input (e.g. Fortran order)
+    template <typename T>
+    nb::object process_split(
+            ndarray<const T, nb::ndim<2>, nb::device::cpu> x,
+            bool last=false) {
+        OwnerGuard guard(_owner);
+        _check_input<T>(x.shape(1), true);
+
+        if (1 < x.shape(0) && x.stride(0) != 1)
+            throw std::invalid_argument("Data not contiguous");
+
+        auto xb = ChBuf<const T>::split(x.data(), x.stride(1), _channels);
+        return _run_output(xb, x.shape(0), last);
+    }
+
+    // split channel input of per-channel arrays
+    template <typename T>
+    nb::object process_split_list(
+            std::vector<ndarray<const T, nb::ndim<1>, nb::c_contig, nb::device::cpu>> xs,
+            bool last=false) {
+        OwnerGuard guard(_owner);
+        auto xb = _split_list_input(xs);
+        return _run_output(xb, xs[0].shape(0), last);
+    }
+
+    template <typename T>
+    ChBuf<const T> _split_list_input(
+            const std::vector<ndarray<const T, nb::ndim<1>, nb::c_contig, nb::device::cpu>>& xs) {
+        _check_input<T>(xs.size(), true);
+
+        std::vector<const T*> ch_data;
+        for (const auto& x_ch : xs) {
+            if (x_ch.shape(0) != xs[0].shape(0))
+                throw std::invalid_argument("Channel length mismatch");
+            ch_data.push_back(x_ch.data());
+        }
+        return ChBuf<const T>::split(std::move(ch_data));
+    }
+
+    // Resample into preallocated `out`. Returns number of frames written.
+    template <typename T>
+    size_t process_into(
+            ndarray<const T, nb::ndim<2>, nb::c_contig, nb::device::cpu> x,
+            ndarray<nb::ndim<2>, nb::c_contig, nb::device::cpu> out,
+            bool last=false) {
+        OwnerGuard guard(_owner);
+        _check_input<T>(x.shape(1), false);
+
+        auto xb = ChBuf<const T>::interleaved(x.data(), _channels);
+        return _run_into(xb, x.shape(0), last, out);
+    }
+
+    template <typename T>
+    size_t process_split_into(
+            ndarray<const T, nb::ndim<2>, nb::device::cpu> x,
+            ndarray<nb::ndim<2>, nb::device::cpu> out,
+            bool last=false) {
+        OwnerGuard guard(_owner);
+        _check_input<T>(x.shape(1), true);
+
+        if (1 < x.shape(0) && x.stride(0) != 1)
+            throw std::invalid_argument("Data not contiguous");
+
+        if (1 < out.shape(0) && out.stride(0) != 1)
+            throw std::invalid_argument("Output not contiguous");
+
+        auto xb = ChBuf<const T>::split(x.data(), x.stride(1), _channels);
+        return _run_into(xb, x.shape(0), last, out);
+    }
+
+    template <typename T>
+    size_t process_split_list_into(
+            std::vector<ndarray<const T, nb::ndim<1>, nb::c_contig, nb::device::cpu>> xs,
+            ndarray<nb::ndim<2>, nb::device::cpu> out,
+            bool last=false) {
+        OwnerGuard guard(_owner);
+        auto xb = _split_list_input(xs);
+
+        if (1 < out.shape(0) && out.stride(0) != 1)
+            throw std::invalid_argument("Output not contiguous");
+
+        return _run_into(xb, xs[0].shape(0), last, out);
+    }
+
+    void _check_output(size_t ilen, size_t out_len, size_t out_channels) {
+        if (out_channels != _channels)
+            throw std::invalid_argument("Channel num mismatch");
+
+        if (out_len < max_out_len(ilen))
+            throw std::invalid_argument("Output buffer too small");
+    }
+
+    // Maximum output length for `ilen` input frames, including pending output
+    // Read-only accessors don't raise while another thread is processing. They return values as of the last call.
+    size_t max_out_len(size_t ilen) {
+        OwnerGuard guard(_owner, true);
+        if (!guard.acquired())
+            return _last_delay + ilen * _last_oi_ratio + 1;
+
+        return _delay() + ilen * _oi_ratio + 1;
+    }
+
+    size_t num_clips() {
+        OwnerGuard guard(_owner, true);
+        return guard.acquired() ? _num_clips() : _last_clips.load();
+    }
+
+    nb::dict stats() {
+        OwnerGuard guard(_owner);
+        uint64_t buf_allocs = _buf_allocs, buf_peak_bytes = _buf_peak_bytes, flush_iters = _flush_iters;
+        for (auto& grp : _groups) {
+            buf_allocs += grp->_buf_allocs;
+            buf_peak_bytes += grp->_buf_peak_bytes;
+            flush_iters += grp->_flush_iters;
+        }
+
+        nb::dict d;
+        d["calls"] = _calls;
+        d["frames_in"] = _frames_in;
+        d["frames_out"] = _frames_out;
+        d["native_seconds"] = _native_ns * 1e-9;
+        d["buffer_allocs"] = buf_allocs;
+        d["buffer_peak_bytes"] = buf_peak_bytes;
+        d["flush_iterations"] = flush_iters;
+        return d;
+    }
+
+    // max_bytes: limit of output buffer size (0: unlimited). Larger outputs are returned in new arrays.
+    // shrink_after: release buffers after this many calls using less than 1/4 of it (0: never)
+    // shared: use output buffer shared by streams of the calling thread
+    void set_buffer_policy(size_t max_bytes, unsigned shrink_after, bool shared) {
+        OwnerGuard guard(_owner);
+        if (shared && _zero_copy)
+            throw std::invalid_argument("Shared buffer can't be used with zero-copy output");
+
+        _max_buf_bytes = max_bytes;
+        _shrink_after = shrink_after;
+        _shared_buf = shared;
+        for (auto& grp : _groups)
+            grp->set_buffer_policy(max_bytes * grp->_channels / _channels, 0, false);
+        trim();
+    }
+
+    // Release internal buffers. Outputs referencing them (zero-copy) remain valid.
+    void trim() {
+        OwnerGuard guard(_owner);
+        for (auto& grp : _groups) grp->trim();
+
+        _y_buf.reset();
+        _y_buf_bytes = 0;
+        _olen = 0;
+        _x_buf.reset();
+        _x_buf_bytes = 0;
+        _small_calls = 0;
+    }
+
+    // Bytes of internal buffers. (not including libsoxr internals)
+    nb::dict memory_usage() {
+        OwnerGuard guard(_owner);
+        size_t scratch_bytes = _x_buf_bytes;
+        for (auto& grp : _groups) scratch_bytes += grp->_y_buf_bytes + grp->_x_buf_bytes;
+
+        nb::dict d;
+        d["buffer_bytes"] = _y_buf_bytes;
+        d["scratch_bytes"] = scratch_bytes;
+        d["shared_bytes"] = _shared_buf ? t_shared_buf.bytes : 0;
+        return d;
+    }
+
+    double delay() {
+        OwnerGuard guard(_owner, true);
+        return guard.acquired() ? _delay() : _last_delay.load();
+    }
+
+    char const * engine() { return _groups.empty() ? soxr_engine(_soxr) : _groups[0]->engine(); }
+
+    void clear() {
+        OwnerGuard guard(_owner);
+        for (auto& grp : _groups) grp->clear();
+
+        if (_soxr) {
+            soxr_error_t err = soxr_clear(_soxr);
+            if (err != NULL) throw std::runtime_error(err);
+        }
+        _ended = false;
+        _update_last();
+    }
+
+    void set_io_ratio(double io_ratio, size_t slew_len=0) {
+        OwnerGuard guard(_owner);
+        for (auto& grp : _groups) grp->set_io_ratio(io_ratio, slew_len);
+
+        if (_soxr) {
+            soxr_error_t err = soxr_set_io_ratio(_soxr, io_ratio, slew_len);
+            if (err != NULL) throw std::runtime_error(err);
+        }
+        _oi_ratio = std::max(_oi_ratio, 1 / io_ratio);
+        _update_last();
+    }
+};
+
+
+// Independent streams of same config, processed together in one call.
+// This saves per-call overhead (dispatch, GIL release, ...) for many short chunks.
+class CSoxrBank {
+    std::vector<std::unique_ptr<CSoxr>> _streams;
+
+    template <typename T>
+    nb::list _process(const std::vector<const T*>& xs, const std::vector<size_t>& ilens,
+                      const std::vector<bool>& lasts) {
+        const size_t num_streams = _streams.size();
+
+        if (xs.size() != num_streams)
+            throw std::invalid_argument("Number of chunks mismatch");
+
+        if (lasts.size() != num_streams)
+            throw std::invalid_argument("Number of last flags mismatch");
+
+        // Own all streams until outputs are made. Their methods raise meanwhile. (e.g. `clear()` of another thread)
+        std::deque<OwnerGuard> guards;
+        for (auto& stream : _streams) guards.emplace_back(stream->_owner);
+
+        // A stream after its last input fails alone
+        std::vector<soxr_error_t> errs(num_streams, nullptr);
+        for (size_t i = 0; i < num_streams; ++i) {
+            if (_streams[i]->_ended)
+                errs[i] = "Input after last input";
+            else
+                _streams[i]->_check_input<T>(_channels, false);
+        }
+
+        return visit_dtype(_otype, [&](auto tag) {
+            using TO = typename decltype(tag)::type;
+
+            std::vector<size_t> out_lens(num_streams, 0);
+            {
+                nb::gil_scoped_release release;
+
+                parallel_for(num_streams, _num_threads, [&](size_t i) {
+                    if (errs[i]) return;
+                    auto xb = ChBuf<const T>::interleaved(xs[i], _channels);
+                    errs[i] = _streams[i]->template _run_nogil<T, TO>(xb, ilens[i], lasts[i], out_lens[i]);
+                });
+            }
+
+            // Error message (str) in place of output of a failed stream. Others have advanced already.
+            nb::list results;
+            for (size_t i = 0; i < num_streams; ++i) {
+                if (errs[i])
+                    results.append(nb::str(errs[i]));
+                else
+                    results.append(_streams[i]->template _output<TO>(out_lens[i]));
+            }
+            return results;
+        });
+    }
+
+public:
+    const unsigned _channels;
+    const soxr_datatype_t _otype;
+    const unsigned _num_threads;
+
+    CSoxrBank(size_t num_streams, double in_rate, double out_rate, unsigned num_channels,
+              soxr_datatype_t itype, soxr_datatype_t otype, unsigned long quality, bool vr,
+              unsigned num_threads=1, bool dither=true) :
+            _channels(num_channels),
+            _otype(otype),
+            _num_threads(num_threads) {
+        for (size_t i = 0; i < num_streams; ++i) {
+            _streams.push_back(make_unique<CSoxr>(
+                in_rate, out_rate, num_channels, itype, otype, quality, vr, 1, false, dither));
+        }
+    }
+
+    // Chunk of each stream
+    template <typename T>
+    nb::list process(
+            std::vector<ndarray<const T, nb::ndim<2>, nb::c_contig, nb::device::cpu>> xs,
+            std::vector<bool> lasts) {
+        std::vector<const T*> ptrs;
+        std::vector<size_t> ilens;
+        for (const auto& x : xs) {
+            if (x.shape(1) != _channels)
+                throw std::invalid_argument("Channel num mismatch");
+            ptrs.push_back(x.data());
+            ilens.push_back(x.shape(0));
+        }
+        return _process<T>(ptrs, ilens, lasts);
+    }
+
+    // Stacked chunks of [stream, frame, channel]
+    template <typename T>
+    nb::list process_stacked(
+            ndarray<const T, nb::ndim<3>, nb::c_contig, nb::device::cpu> x,
+            std::vector<bool> lasts) {
+        if (x.shape(2) != _channels)
+            throw std::invalid_argument("Channel num mismatch");
+
+        const size_t ilen = x.shape(1);
+        std::vector<const T*> ptrs;
+        for (size_t i = 0; i < x.shape(0); ++i)
+            ptrs.push_back(x.data() + i * ilen * _channels);
+        return _process<T>(ptrs, std::vector<size_t>(x.shape(0), ilen), lasts);
+    }
+
+    CSoxrBank(const CSoxrBank&) = delete;
+
+    size_t size() const { return _streams.size(); }
+    CSoxr& stream(size_t i) {
+        if (_streams.size() <= i)
+            throw nb::index_error("Stream index out of range");
+        return *_streams[i];
+    }
+};
+
+
+// Pull-mode resampler. `read(n)` outputs exactly `n` frames unless input has ended.
+// Input is supplied by a Python callable through soxr_set_input_fn(),
+// or pushed by `write()`. Pushed input is resampled into an output FIFO.
+class CSoxrPuller {
+    soxr_t _soxr = nullptr;
+
+    // callable(requested_len) -> 2D array of `_itype`, or None at end of input
+    nb::object _input_fn;
+    nb::object _input;          // input array being consumed by soxr
+    friend int puller_tp_traverse(PyObject*, visitproc, void*);
+    friend int puller_tp_clear(PyObject*);
+    const uint8_t* _input_data = nullptr;
+    size_t _input_len = 0;
+    size_t _input_pos = 0;
+
+    // Output FIFO of pushed input. Frames [_fifo_begin, _fifo_end) are pending.
+    std::unique_ptr<uint8_t[]> _fifo;
+    size_t _fifo_bytes = 0;
+    size_t _fifo_begin = 0;
+    size_t _fifo_end = 0;
+
+    std::atomic<std::thread::id> _owner { std::thread::id() };  // thread in a method. See OwnerGuard
+
+    // Methods changing state can't be called from `_input_fn`, which runs inside soxr_output().
+    static void _check_reentry(const OwnerGuard& guard) {
+        if (guard.nested())
+            throw std::runtime_error("Resampler is in use by input function");
+    }
+
+    // soxr_input_fn_t. Called from soxr_output() w/o GIL.
+    static size_t _supply(void* state, soxr_in_t* data, size_t requested_len) {
+        auto self = static_cast<CSoxrPuller*>(state);
+        nb::gil_scoped_acquire acquire;
+        try {
+            return self->_supply_input(data, requested_len);
+        } catch (nb::python_error& e) {
+            e.restore();
+        } catch (const std::exception& e) {
+            PyErr_SetString(PyExc_ValueError, e.what());
+        }
+        *data = NULL;  // report failure
+        return 0;
+    }
+
+    size_t _supply_input(soxr_in_t* data, size_t requested_len) {
+        if (_input_len <= _input_pos) {
+            nb::object x = _input_fn(requested_len);
+            _input = nb::none();
+            _input_data = nullptr;
+            _input_len = _input_pos = 0;
+
+            if (!x.is_none()) {
+                auto arr = nb::cast<ndarray<nb::ndim<2>, nb::c_contig, nb::device::cpu>>(x);
+                if (arr.shape(1) != _channels)
+                    throw std::invalid_argument("Channel num mismatch");
+                _check_dtype(arr, _itype);
+
+                _input = x;
+                _input_data = static_cast<const uint8_t*>(arr.data());
+                _input_len = arr.shape(0);
+            }
+            if (!_input_len) {
+                *data = this;  // end of input
+                return 0;
+            }
+        }
+        const size_t len = std::min(requested_len, _input_len - _input_pos);
+        *data = _input_data + _input_pos * _isize;
+        _input_pos += len;
+        return len;
+    }
+
+    template <typename Array>
+    static void _check_dtype(const Array& arr, soxr_datatype_t dtype) {
+        visit_dtype(dtype, [&](auto tag) {
+            using T = typename decltype(tag)::type;
+            if (arr.dtype() != nb::dtype<T>())
+                throw nb::type_error("Data type mismatch");
+        });
+    }
+
+    // Grow FIFO to fit `frames` more frames after `_fifo_end`
+    void _reserve_fifo(size_t frames) {
+        if (_fifo_begin) {
+            std::memmove(_fifo.get(), _fifo.get() + _fifo_begin * _osize, (_fifo_end - _fifo_begin) * _osize);
+            _fifo_end -= _fifo_begin;
+            _fifo_begin = 0;
+        }
+        grow_buf(_fifo, _fifo_bytes, (_fifo_end + frames) * _osize, true);
+    }
+
+    // Resample pushed input into FIFO. (GIL-free)
+    soxr_error_t _push(const uint8_t* x, size_t ilen, bool last) {
+        soxr_error_t err = NULL;
+        size_t odone = 0;
+        for (size_t idx = 0; idx < ilen && !err; idx += _div_len) {
+            const size_t len = std::min(_div_len, ilen - idx);
+            _reserve_fifo(soxr_delay(_soxr) + len * _oi_ratio + 1);
+            err = soxr_process(
+                _soxr,
+                x + idx * _isize, len, NULL,
+                _fifo.get() + _fifo_end * _osize, _fifo_bytes / _osize - _fifo_end, &odone);
+            _fifo_end += odone;
+        }
+
+        // flush
+        while (last && !err) {
+            _reserve_fifo(soxr_delay(_soxr) + 1);
+            err = soxr_process(
+                _soxr,
+                NULL, 0, NULL,
+                _fifo.get() + _fifo_end * _osize, _fifo_bytes / _osize - _fifo_end, &odone);
+            _fifo_end += odone;
+            if (!odone) break;
+        }
+        return err;
+    }
+
+    // Output up to `n` frames into `y`. Returns number of frames written.
+    size_t _read(uint8_t* y, size_t n) {
+        size_t done = 0;
+        if (_input_fn.is_none()) {
+            done = std::min(n, _fifo_end - _fifo_begin);
+            std::copy_n(_fifo.get() + _fifo_begin * _osize, done * _osize, y);
+            _fifo_begin += done;
+            _ended = _input_ended && _fifo_begin == _fifo_end;
+            return done;
+        }
+
+        if (_ended) return 0;
+        {
+            nb::gil_scoped_release release;
+            done = soxr_output(_soxr, y, n);
+        }
+        if (PyErr_Occurred())
+            throw nb::python_error();
+
+        soxr_error_t err = soxr_error(_soxr);
+        if (err != NULL)
+            throw std::runtime_error(err);
+
+        // soxr_output() returns less than `n` only after end of input
+        _ended = done < n;
+        return done;
+    }
+
+public:
+    const double _in_rate;
+    const double _out_rate;
+    const double _oi_ratio;     // out_rate/in_rate
+    const soxr_datatype_t _itype;
+    const soxr_datatype_t _otype;
+    const unsigned _channels;
+    const size_t _isize;        // bytes per input frame
+    const size_t _osize;        // bytes per output frame
+    const size_t _div_len;      // max input frames per soxr call
+    bool _input_ended = false;  // last input was pushed
+    bool _ended = false;        // all output was read
+
+    CSoxrPuller(double in_rate, double out_rate, unsigned num_channels,
+                soxr_datatype_t itype, soxr_datatype_t otype, unsigned long quality,
+                nb::object input_fn, bool dither=true) :
+            _input_fn(input_fn),
+            _in_rate(in_rate),
+            _out_rate(out_rate),
+            _oi_ratio(out_rate / in_rate),
+            _itype(itype),
+            _otype(otype),
+            _channels(num_channels),
+            _isize(soxr_datatype_size(itype) * num_channels),
+            _osize(soxr_datatype_size(otype) * num_channels),
+            _div_len(std::max(1000., 48000 * in_rate / out_rate)) {
+        // soxr_output() does not support split channel output
+        if ((itype & SOXR_SPLIT) || (otype & SOXR_SPLIT))
+            throw std::invalid_argument("Memory layout mismatch");
+
+        soxr_error_t err = NULL;
+        soxr_io_spec_t io_spec = soxr_io_spec(itype, otype);
+        if (!dither) io_spec.flags |= SOXR_NO_DITHER;
+        soxr_quality_spec_t quality_spec = soxr_quality_spec(quality, 0);
+
+        _soxr = soxr_create(
+            in_rate, out_rate, num_channels,
+            &err, &io_spec, &quality_spec, NULL);
+
+        if (err != NULL) {
+            throw std::runtime_error(err);
+        }
+        _set_input_fn();
+    }
+
+    ~CSoxrPuller() {
+        soxr_delete(_soxr);
+    }
+
+    CSoxrPuller(const CSoxrPuller&) = delete;
+
+    void _set_input_fn() {
+        if (!_input_fn.is_none())
+            soxr_set_input_fn(_soxr, _supply, this, _div_len);
+    }
+
+    template <typename T>
+    void write(ndarray<const T, nb::ndim<2>, nb::c_contig, nb::device::cpu> x, bool last=false) {
+        OwnerGuard guard(_owner);
+        if (!_input_fn.is_none())
+            throw std::runtime_error("Input is supplied by input function");
+
+        if (_input_ended)
+            throw std::runtime_error("Input after last input");
+
+        if (x.shape(1) != _channels)
+            throw std::invalid_argument("Channel num mismatch");
+
+        if (to_i_dtype<T> != _itype)
+            throw nb::type_error("Data type mismatch");
+
+        _input_ended = last;
+
+        soxr_error_t err = NULL;
+        {
+            nb::gil_scoped_release release;
+            try {
+                err = _push(reinterpret_cast<const uint8_t*>(x.data()), x.shape(0), last);
+            } catch (const std::bad_alloc&) {
+                err = "malloc failed";
+            }
+        }
+        if (err != NULL)
+            throw std::runtime_error(err);
+    }
+
+    nb::object read(size_t n) {
+        OwnerGuard guard(_owner);
+        _check_reentry(guard);
+        return visit_dtype(_otype, [&](auto tag) -> nb::object {
+            using T = typename decltype(tag)::type;
+
+            T* y = new T[n * _channels];
+            nb::capsule owner(y, [](void *p) noexcept {
+                delete[] (T *) p;
+            });
+            const size_t done = _read(reinterpret_cast<uint8_t*>(y), n);
+            return ndarray<nb::numpy, T>(y, { done, _channels }, owner).cast();
+        });
+    }
+
+    // Output into preallocated `out`. Returns number of frames written.
+    size_t read_into(ndarray<nb::ndim<2>, nb::c_contig, nb::device::cpu> out) {
+        OwnerGuard guard(_owner);
+        _check_reentry(guard);
+        if (out.shape(1) != _channels)
+            throw std::invalid_argument("Channel num mismatch");
+        _check_dtype(out, _otype);
+
+        return _read(static_cast<uint8_t*>(out.data()), out.shape(0));
+    }
+
+    // Frames ready to read of pushed input
+    size_t available() {
+        OwnerGuard guard(_owner);
+        return _fifo_end - _fifo_begin;
+    }
+
+    size_t num_clips() {
+        OwnerGuard guard(_owner);
+        return *soxr_num_clips(_soxr);
+    }
+
+    double delay() {
+        OwnerGuard guard(_owner);
+        return soxr_delay(_soxr);
+    }
+
+    void clear() {
+        OwnerGuard guard(_owner);
+        _check_reentry(guard);
+        soxr_error_t err = soxr_clear(_soxr);
+        if (err != NULL) throw std::runtime_error(err);
+
+        // soxr_clear() resets max_ilen of input fn
+        _set_input_fn();
+        _input = nb::none();
+        _input_data = nullptr;
+        _input_len = _input_pos = 0;
+        _fifo_begin = _fifo_end = 0;
+        _input_ended = false;
+        _ended = false;
+    }
+};
+
+
+// `input_fn` may reference the Python object owning CSoxrPuller. Let GC find such cycles.
+int puller_tp_traverse(PyObject* self, visitproc visit, void* arg) {
+    Py_VISIT(Py_TYPE(self));
+    if (!nb::inst_ready(self))
+        return 0;
+
+    CSoxrPuller* puller = nb::inst_ptr<CSoxrPuller>(self);
+    Py_VISIT(puller->_input_fn.ptr());
+    Py_VISIT(puller->_input.ptr());
+    return 0;
+}
+
+int puller_tp_clear(PyObject* self) {
+    CSoxrPuller* puller = nb::inst_ptr<CSoxrPuller>(self);
+    puller->_input_fn = nb::none();
+    puller->_input = nb::none();
+    return 0;
+}
+
+PyType_Slot puller_slots[] = {
+    { Py_tp_traverse, (void*) puller_tp_traverse },
+    { Py_tp_clear, (void*) puller_tp_clear },
+    { 0, nullptr }
+};
+
+
+// Real-time safe streaming resampler. All buffers are allocated at construction,
+// from maximum input chunk size. `push()` resamples into a single-producer/single-consumer
+// ring buffer, which `pull_into()` reads from. They don't allocate nor lock,
+// so can run on separate threads (e.g. network thread and audio callback).
+class CSoxrRing {
+    soxr_t _soxr = nullptr;
+    std::unique_ptr<uint8_t[]> _ring;   // `_capacity` frames of `_otype`
+    std::unique_ptr<uint8_t[]> _obuf;   // resampler output of a chunk
+    size_t _obuf_len;
+
+    // Total frames written/read. Written by producer/consumer only.
+    std::atomic<uint64_t> _write_pos { 0 };
+    std::atomic<uint64_t> _read_pos { 0 };
+    std::atomic<uint64_t> _underruns { 0 };
+    std::atomic<uint64_t> _overruns { 0 };
+    std::atomic<bool> _input_ended { false };
+
+    // One producer and one consumer. A second thread on either side raises. See OwnerGuard
+    std::atomic<std::thread::id> _producer { std::thread::id() };
+    std::atomic<std::thread::id> _consumer { std::thread::id() };
+
+    // Copy `len` frames to the ring. Frames not fitting are dropped as overrun.
+    void _write_ring(const uint8_t* src, size_t len) {
+        const uint64_t w = _write_pos.load(std::memory_order_relaxed);
+        const uint64_t r = _read_pos.load(std::memory_order_acquire);
+        const size_t n = std::min<uint64_t>(len, _capacity - (w - r));
+
+        const size_t begin = w % _capacity;
+        const size_t n1 = std::min(n, _capacity - begin);
+        std::memcpy(&_ring[begin * _osize], src, n1 * _osize);
+        std::memcpy(&_ring[0], src + n1 * _osize, (n - n1) * _osize);
+
+        if (n < len)
+            _overruns.fetch_add(len - n, std::memory_order_relaxed);
+        _write_pos.store(w + n, std::memory_order_release);
+    }
+
+    // Resample a chunk into the ring. (GIL-free)
+    soxr_error_t _push(const uint8_t* x, size_t ilen, bool last) {
+        size_t odone = 0;
+        soxr_error_t err = soxr_process(_soxr, x, ilen, NULL, _obuf.get(), _obuf_len, &odone);
+        _write_ring(_obuf.get(), odone);
+
+        // drain pending output w/o flushing
+        while (!err && odone == _obuf_len) {
+            err = soxr_process(_soxr, x, 0, NULL, _obuf.get(), _obuf_len, &odone);
+            _write_ring(_obuf.get(), odone);
+        }
+
+        // flush
+        while (last && !err) {
+            err = soxr_process(_soxr, NULL, 0, NULL, _obuf.get(), _obuf_len, &odone);
+            _write_ring(_obuf.get(), odone);
+            if (!odone) break;
+        }
+        return err;
+    }
+
+public:
+    const soxr_datatype_t _itype;
+    const soxr_datatype_t _otype;
+    const unsigned _channels;
+    const size_t _isize;        // bytes per input frame
+    const size_t _osize;        // bytes per output frame
+    const size_t _max_chunk;    // max input frames per push
+    const size_t _capacity;     // ring size in frames
+
+    CSoxrRing(double in_rate, double out_rate, unsigned num_channels,
+              soxr_datatype_t itype, soxr_datatype_t otype, unsigned long quality,
+              size_t max_chunk, size_t capacity=0, bool dither=true) :
+            _obuf_len(max_chunk * out_rate / in_rate + 2),
+            _itype(itype),
+            _otype(otype),
+            _channels(num_channels),
+            _isize(soxr_datatype_size(itype) * num_channels),
+            _osize(soxr_datatype_size(otype) * num_channels),
+            _max_chunk(max_chunk),
+            _capacity(capacity ? capacity : _obuf_len * 4) {
+        if ((itype & SOXR_SPLIT) || (otype & SOXR_SPLIT))
+            throw std::invalid_argument("Memory layout mismatch");
+
+        if (!max_chunk)
+            throw std::invalid_argument("max_chunk should be over 0");
+
+        soxr_error_t err = NULL;
+        soxr_io_spec_t io_spec = soxr_io_spec(itype, otype);
+        if (!dither) io_spec.flags |= SOXR_NO_DITHER;
+        soxr_quality_spec_t quality_spec = soxr_quality_spec(quality, 0);
+
+        _soxr = soxr_create(
+            in_rate, out_rate, num_channels,
+            &err, &io_spec, &quality_spec, NULL);
+
+        if (err != NULL) {
+            throw std::runtime_error(err);
+        }
+
+        _ring.reset(new uint8_t[_capacity * _osize]);
+        _obuf.reset(new uint8_t[_obuf_len * _osize]);
+    }
+
+    ~CSoxrRing() {
+        soxr_delete(_soxr);
+    }
+
+    CSoxrRing(const CSoxrRing&) = delete;
+
+    // Mono(1D) or [frame, channel] input
+    template <typename T>
+    void push(ndarray<const T, nb::c_contig, nb::device::cpu> x, bool last=false) {
+        OwnerGuard guard(_producer);
+        const size_t ilen = x.ndim() ? x.shape(0) : 0;
+        const size_t channels = x.ndim() == 2 ? x.shape(1) : 1;
+
+        if ((x.ndim() != 1 && x.ndim() != 2) || channels != _channels)
+            throw std::invalid_argument("Channel num mismatch");
+
+        if (to_i_dtype<T> != _itype)
+            throw nb::type_error("Data type mismatch");
+
+        if (_max_chunk < ilen)
+            throw std::invalid_argument("Chunk is longer than max_chunk");
+
+        if (_input_ended.load(std::memory_order_relaxed))
+            throw std::runtime_error("Input after last input");
+
+        soxr_error_t err = NULL;
+        {
+            nb::gil_scoped_release release;
+            err = _push(reinterpret_cast<const uint8_t*>(x.data()), ilen, last);
+            if (last) _input_ended.store(true, std::memory_order_release);
+        }
+        if (err != NULL)
+            throw std::runtime_error(err);
+    }
+
+    // Fill `out` from the ring. Frames not available are zero-filled and counted as underrun.
+    // Returns number of frames read from the ring.
+    size_t pull_into(ndarray<nb::c_contig, nb::device::cpu> out) {
+        OwnerGuard guard(_consumer);
+        const size_t olen = out.ndim() ? out.shape(0) : 0;
+        const size_t channels = out.ndim() == 2 ? out.shape(1) : 1;
+
+        if ((out.ndim() != 1 && out.ndim() != 2) || channels != _channels)
+            throw std::invalid_argument("Channel num mismatch");
+
+        visit_dtype(_otype, [&](auto tag) {
+            using T = typename decltype(tag)::type;
+            if (out.dtype() != nb::dtype<T>())
+                throw nb::type_error("Output data type mismatch");
+        });
+
+        uint8_t* y = static_cast<uint8_t*>(out.data());
+
+        nb::gil_scoped_release release;
+
+        // Load `_input_ended` first. Ring is complete if it was set.
+        const bool ended = _input_ended.load(std::memory_order_acquire);
+        const uint64_t r = _read_pos.load(std::memory_order_relaxed);
+        const uint64_t w = _write_pos.load(std::memory_order_acquire);
+        const size_t n = std::min<uint64_t>(olen, w - r);
+
+        const size_t begin = r % _capacity;
+        const size_t n1 = std::min(n, _capacity - begin);
+        std::memcpy(y, &_ring[begin * _osize], n1 * _osize);
+        std::memcpy(y + n1 * _osize, &_ring[0], (n - n1) * _osize);
+        std::memset(y + n * _osize, 0, (olen - n) * _osize);
+
+        _read_pos.store(r + n, std::memory_order_release);
+        if (n < olen && !ended)
+            _underruns.fetch_add(olen - n, std::memory_order_relaxed);
+        return n;
+    }
+
+    size_t available() const {
+        return _write_pos.load(std::memory_order_acquire) - _read_pos.load(std::memory_order_acquire);
+    }
+
+    uint64_t underruns() const { return _underruns.load(std::memory_order_relaxed); }
+    uint64_t overruns() const { return _overruns.load(std::memory_order_relaxed); }
+    bool ended() const {
+        return _input_ended.load(std::memory_order_acquire) && !available();
+    }
+
+    // Producer side, as libsoxr is used by `push()`
+    size_t num_clips() {
+        OwnerGuard guard(_producer);
+        return *soxr_num_clips(_soxr);
+    }
+
+    double delay() {
+        OwnerGuard guard(_producer);
+        return soxr_delay(_soxr);
+    }
+
+    // Not real-time safe. Raises while `push()` or `pull_into()` is in progress.
+    void clear() {
+        OwnerGuard producer(_producer);
+        OwnerGuard consumer(_consumer);
+        soxr_error_t err = soxr_clear(_soxr);
+        if (err != NULL) throw std::runtime_error(err);
+
+        _write_pos = 0;
+        _read_pos = 0;
+        _underruns = 0;
+        _overruns = 0;
+        _input_ended = false;
+    }
+};
+
+
+// Split channels into groups and run `proc(group_config, first_channel, out_pos)`
+// for each group on worker threads. (GIL-free)
+template <typename F>
+soxr_error_t proc_ch_groups(const SoxrConfig& config, unsigned num_threads, size_t& out_pos, F proc) {
+    const unsigned num_groups = std::min(num_workers(num_threads), config.channels);
+    if (num_groups <= 1)
+        return proc(config, 0u, out_pos);
+
+    std::vector<size_t> out_lens(num_groups, 0);
+    std::vector<soxr_error_t> errs(num_groups, nullptr);
+
+    parallel_for(num_groups, num_groups, [&](size_t g) {
+        const unsigned ch_begin = config.channels * g / num_groups;
+        const unsigned ch_end = config.channels * (g+1) / num_groups;
+
+        SoxrConfig group_config = config;
+        group_config.channels = ch_end - ch_begin;
+        try {
+            errs[g] = proc(group_config, ch_begin, out_lens[g]);
+        } catch (const std::bad_alloc&) {
+            errs[g] = "malloc failed";
+        }
+    });
+
+    for (unsigned g = 0; g < num_groups; ++g) {
+        if (errs[g]) return errs[g];
+        if (out_lens[g] != out_lens[0]) return "Channel group output length mismatch";
+    }
+    out_pos = out_lens[0];
+    return NULL;
+}
+
+
+// Minimum number of input frames of a time segment, relative to its pre/post-roll
+static constexpr size_t SEGMENT_ROLL_DIV = 4;
+// Segment boundaries are also aligned to this, for multi-stage (e.g. half-band) filters
+static constexpr size_t SEGMENT_ALIGN = 64;
+
+// Number of input frames of context needed on each side of a time segment.
+// Segment boundaries are multiples of `unit` input frames. (GIL-free)
+inline size_t segment_roll(const SoxrConfig& config, size_t unit, bool use_pool, soxr_error_t* err) {
+    // Prime a fresh instance and measure its delay, in output frames
+    const bool split = config.itype & SOXR_SPLIT;
+    SoxrConfig probe_config = config;
+    probe_config.itype = probe_config.otype = split ? SOXR_FLOAT32_S : SOXR_FLOAT32_I;
+
+    soxr_t soxr = g_pool.acquire(probe_config, err, use_pool);
+    if (*err) return 0;
+
+    const size_t div_len = std::max(1000., 48000 * config.in_rate / config.out_rate);
+    const size_t blk_olen = div_len * config.out_rate / config.in_rate + 1;
+    std::vector<float> ibuf(div_len * config.channels, 0.f);
+    std::vector<float> obuf(blk_olen * config.channels);
+    auto x = ChBuf<float>::interleaved(ibuf.data(), config.channels);
+    auto y = ChBuf<float>::interleaved(obuf.data(), config.channels);
+    if (split) {
+        x = ChBuf<float>::split(ibuf.data(), div_len, config.channels);
+        y = ChBuf<float>::split(obuf.data(), blk_olen, config.channels);
+    }
+
+    size_t odone = 0;
+    *err = soxr_process(soxr, x.at(0), div_len, NULL, y.at(0), blk_olen, &odone);
+    const double delay = soxr_delay(soxr);
+    g_pool.release(probe_config, soxr, *err, use_pool);
+
+    const size_t roll = std::ceil(delay * config.in_rate / config.out_rate) + unit;
+    return (roll + unit - 1) / unit * unit;
+}
+
+
+// Resample `x` into `y` by splitting the time axis into overlapped segments
+// and processing them in parallel. Each segment is resampled with pre/post-roll
+// of filter length, then trimmed and stitched at the output. (GIL-free)
+// Return false without processing if the input can't be divided.
+template <typename TI, typename TO>
+bool segment_proc(
+        const SoxrConfig& config, ChBuf<TI> x, size_t ilen,
+        ChBuf<TO> y, size_t olen, size_t& out_pos, bool use_pool, unsigned num_threads,
+        soxr_error_t* err) {
+    const unsigned num_segs_max = num_workers(num_threads);
+    if (num_segs_max <= 1 || config.quality == SOXR_QQ  // cubic interpolation phase is not periodic
+            || config.in_rate != std::floor(config.in_rate) || config.out_rate != std::floor(config.out_rate)
+            || config.in_rate > UINT32_MAX || config.out_rate > UINT32_MAX)
+        return false;
+
+    // Segment boundaries are aligned to the polyphase period of the filter,
+    // so that each segment sees the same filter phases as sequential processing.
+    const uint64_t in_rate = config.in_rate, out_rate = config.out_rate;
+    const uint64_t g = std::gcd(in_rate, out_rate);
+    const size_t unit = in_rate / g * SEGMENT_ALIGN, ounit = out_rate / g * SEGMENT_ALIGN;
+    if (ilen < unit * SEGMENT_ROLL_DIV * num_segs_max)
+        return false;
+
+    const size_t roll = segment_roll(config, unit, use_pool, err);
+    if (*err) return true;
+
+    const size_t num_units = ilen / unit;
+    const size_t num_segs = std::min<size_t>(num_segs_max, num_units * unit / (roll * SEGMENT_ROLL_DIV));
+    if (num_segs <= 1)
+        return false;
+
+    // Input frames [bounds[k], bounds[k+1]) go to output [bounds[k]/unit*ounit, ...)
+    std::vector<size_t> bounds(num_segs + 1);
+    for (size_t k = 0; k < num_segs; ++k)
+        bounds[k] = num_units * k / num_segs * unit;
+    bounds[num_segs] = ilen;
+
+    std::vector<size_t> out_lens(num_segs, 0);
+    std::vector<soxr_error_t> errs(num_segs, nullptr);
+
+    const size_t div_len = std::max(1000., 48000 * config.in_rate / config.out_rate);
+    const size_t blk_olen = div_len * config.out_rate / config.in_rate + 1;
+
+    parallel_for(num_segs, num_segs, [&](size_t k) {
+        const bool last = (k == num_segs - 1);
+        const size_t in_begin = k ? bounds[k] - roll : 0;
+        const size_t in_end = last ? ilen : bounds[k+1] + roll;
+        const size_t out_begin = bounds[k] / unit * ounit;
+        const size_t out_end = last ? olen : std::min(olen, bounds[k+1] / unit * ounit);
+        const size_t skip = k ? roll / unit * ounit : 0;
+        const size_t keep = out_begin < out_end ? out_end - out_begin : 0;  // output may be cut by `olen`
+
+        soxr_error_t& seg_err = errs[k];
+        soxr_t soxr = nullptr;
+        try {
+            soxr = g_pool.acquire(config, &seg_err, use_pool);
+            if (seg_err) return;
+
+            auto obuf_data = make_unique<TO[]>(blk_olen * config.channels);
+            ChBuf<TO> obuf = y.is_split()
+                ? ChBuf<TO>::split(obuf_data.get(), blk_olen, config.channels)
+                : ChBuf<TO>::interleaved(obuf_data.get(), config.channels);
+            ChBuf<TI> xk = x;
+            ChBuf<TO> yk = y.shift(out_begin);
+
+            // Copy output of the segment except pre/post-roll
+            size_t produced = 0, kept = 0;
+            auto take = [&](size_t odone) {
+                const size_t b = std::max(produced, skip);
+                const size_t e = std::min(produced + odone, skip + keep);
+                if (b < e) {
+                    auto src = obuf.shift(b - produced);
+                    auto dst = yk.shift(b - skip);
+                    copy_frames(src, dst, 0, e - b);
+                    kept += e - b;
+                }
+                produced += odone;
+            };
+
+            size_t odone = 0;
+            for (size_t idx = in_begin; idx < in_end && kept < keep && !seg_err; idx += div_len) {
+                seg_err = soxr_process(
+                    soxr,
+                    xk.at(idx), std::min(div_len, in_end-idx), NULL,
+                    obuf.at(0), blk_olen, &odone);
+                take(odone);
+            }
+            // flush
+            while (!seg_err && kept < keep) {
+                seg_err = soxr_process(soxr, NULL, 0, NULL, obuf.at(0), blk_olen, &odone);
+                if (!odone) break;
+                take(odone);
+            }
+            out_lens[k] = kept;
+            if (!last && !seg_err && kept != keep)
+                seg_err = "Segment output length mismatch";
+        } catch (const std::bad_alloc&) {
+            seg_err = "malloc failed";
+        }
+        if (soxr)
+            g_pool.release(config, soxr, seg_err, use_pool);
+    });
+
+    for (size_t k = 0; k < num_segs; ++k) {
+        if (errs[k]) {
+            *err = errs[k];
+            return true;
+        }
+    }
+    out_pos = std::accumulate(out_lens.begin(), out_lens.end(), (size_t)0);
+    return true;
+}
+
+
+// divide_proc() for a channel group of interleaved I/O with `stride` channels.
+// Each block is gathered to/scattered from contiguous buffers. (GIL-free)
+template <typename TI, typename TO>
+soxr_error_t divide_proc_strided(
+        const SoxrConfig& config, const TI* x, size_t ilen,
+        TO* y, size_t olen, size_t& out_pos, bool use_pool, unsigned stride) {
+    const unsigned channels = config.channels;
+
+    const size_t div_len = std::max(1000., 48000 * config.in_rate / config.out_rate);
+    const size_t blk_olen = div_len * config.out_rate / config.in_rate + 1;
+    auto ibuf = make_unique<TI[]>(div_len * channels);
+    auto obuf = make_unique<TO[]>(blk_olen * channels);
+
+    soxr_error_t err = NULL;
+    soxr_t soxr = g_pool.acquire(config, &err, use_pool);
+    if (err) return err;
+
+    // process and scatter until no more output (or output is full)
+    auto drain = [&](soxr_in_t in, size_t in_len) {
+        size_t odone = 0;
+        size_t cap = 0;
+        do {
+            cap = std::min(blk_olen, olen-out_pos);
+            err = soxr_process(
+                soxr,
+                in, in_len, NULL,
+                obuf.get(), cap, &odone);
+            for (size_t i = 0; i < odone; ++i)
+                std::copy_n(&obuf[i*channels], channels, &y[(out_pos+i)*stride]);
+            out_pos += odone;
+            in_len = 0;
+        } while (!err && 0 < odone && odone == cap);
+    };
+
+    // divide long input and process
+    for (size_t idx = 0; idx < ilen && !err; idx += div_len) {
+        const size_t len = std::min(div_len, ilen-idx);
+        for (size_t i = 0; i < len; ++i)
+            std::copy_n(&x[(idx+i)*stride], channels, &ibuf[i*channels]);
+        drain(ibuf.get(), len);
+    }
+
+    // flush
+    if (!err) drain(NULL, 0);
+
+    g_pool.release(config, soxr, err, use_pool);
+    return err;
+}
+
+
+// soxr_oneshot() becomes much slower when input is long.
+// To avoid this, divide long input and process. (GIL-free)
+template <typename TI, typename TO>
+soxr_error_t divide_proc(
+        const SoxrConfig& config, const TI* x, size_t ilen,
+        TO* y, size_t olen, size_t& out_pos, bool use_pool, unsigned stride) {
+    const unsigned channels = config.channels;
+
+    if (stride != channels)
+        return divide_proc_strided(config, x, ilen, y, olen, out_pos, use_pool, stride);
+
+    soxr_error_t err = NULL;
+    soxr_t soxr = g_pool.acquire(config, &err, use_pool);
+    if (err) return err;
+
+    const size_t div_len = std::max(1000., 48000 * config.in_rate / config.out_rate);
+
+    // divide long input and process
+    size_t odone = 0;
+    for (size_t idx = 0; idx < ilen && !err; idx += div_len) {
+        err = soxr_process(
+            soxr,
+            &x[idx*channels], std::min(div_len, ilen-idx), NULL,
+            &y[out_pos*channels], olen-out_pos, &odone);
+        out_pos += odone;
+    }
+
+    // flush
+    if (!err) {
+        err = soxr_process(
+            soxr,
+            NULL, 0, NULL,
+            &y[out_pos*channels], olen-out_pos, &odone);
+        out_pos += odone;
+    }
+
+    g_pool.release(config, soxr, err, use_pool);
+    return err;
+}
+
+
+// Resample interleaved `x` into `y`, processing channel groups in parallel.
+// If there are more threads than channels, time segments are processed in parallel instead. (GIL-free)
+template <typename TI, typename TO>
+soxr_error_t divide_proc_mt(
+        const SoxrConfig& config, const TI* x, size_t ilen,
+        TO* y, size_t olen, size_t& out_pos, bool use_pool, unsigned num_threads) {
+    soxr_error_t err = NULL;
+    if (num_workers(num_threads) > config.channels
+            && segment_proc(
+                config, ChBuf<TI>::interleaved(const_cast<TI*>(x), config.channels), ilen,
+                ChBuf<TO>::interleaved(y, config.channels), olen, out_pos, use_pool, num_threads, &err))
+        return err;
+
+    return proc_ch_groups(config, num_threads, out_pos,
+        [&](const SoxrConfig& group_config, unsigned ch, size_t& group_pos) {
+            return divide_proc(
+                group_config, &x[ch], ilen,
+                &y[ch], olen, group_pos, use_pool, config.channels);
+        });
+}
+
+
+// Sample formats not supported by libsoxr.
+// These are converted from/to float32 block by block while resampling.
+enum packed_fmt_t : int {
+    PACKED_NONE = 0,    // libsoxr datatype
+    PACKED_INT8,
+    PACKED_UINT8,       // offset binary (e.g. 8-bit WAV)
+    PACKED_FLOAT16,
+    PACKED_INT24,       // 3 bytes, little endian
+};
+
+inline size_t packed_size(packed_fmt_t fmt) {
+    switch (fmt) {
+    case PACKED_INT8:
+    case PACKED_UINT8: return 1;
+    case PACKED_FLOAT16: return 2;
+    case PACKED_INT24: return 3;
+    default: return 0;
+    }
+}
 
-        if (err != NULL) {
-            throw std::runtime_error(err);
-        }
+inline float half_to_float(uint16_t h) {
+    const uint32_t sign = (h & 0x8000u) << 16;
+    uint32_t exp = (h >> 10) & 0x1f;
+    uint32_t mant = h & 0x3ff;
+    uint32_t bits;
+
+    if (exp == 0x1f) {          // inf, nan
+        bits = sign | 0x7f800000u | (mant << 13);
+    } else if (exp != 0) {      // normal
+        bits = sign | ((exp + 112) << 23) | (mant << 13);
+    } else if (mant == 0) {     // zero
+        bits = sign;
+    } else {                    // subnormal
+        exp = 113;
+        while (!(mant & 0x400)) { mant <<= 1; --exp; }
+        bits = sign | (exp << 23) | ((mant & 0x3ff) << 13);
     }
+    float f;
+    std::memcpy(&f, &bits, sizeof(f));
+    return f;
+}
 
-    ~CSoxr() {
-        soxr_delete(_soxr);
+// Round to nearest even
+inline uint16_t float_to_half(float f) {
+    uint32_t bits;
+    std::memcpy(&bits, &f, sizeof(bits));
+    const uint16_t sign = (bits >> 16) & 0x8000u;
+    const uint32_t abs = bits & 0x7fffffffu;
+
+    if (0x7f800000u < abs)      // nan
+        return sign | 0x7e00u;
+    if (0x477ff000u <= abs)     // overflow to inf
+        return sign | 0x7c00u;
+    if (abs < 0x38800000u) {    // subnormal or zero
+        if (abs < 0x33000000u) return sign;
+        const uint32_t exp = abs >> 23;
+        const uint32_t mant = (abs & 0x7fffffu) | 0x800000u;
+        const uint32_t shift = 126 - exp;
+        uint32_t h = mant >> shift;
+        const uint32_t rem = mant & ((1u << shift) - 1);
+        const uint32_t half = 1u << (shift - 1);
+        if (half < rem || (rem == half && (h & 1))) ++h;
+        return sign | h;
     }
+    uint32_t h = ((abs - 0x38000000u) >> 13);
+    const uint32_t rem = abs & 0x1fffu;
+    if (0x1000u < rem || (rem == 0x1000u && (h & 1))) ++h;
+    return sign | h;
+}
 
-    template <typename T>
-    T* _resize_ybuf(size_t req_size, bool copy) {
-        if (_y_buf && req_size < _y_buf_bytes)
-            return reinterpret_cast<T*>(_y_buf.get());
+// Decode `len` frames of `channels` samples. Frame `i` starts at `src + i*src_stride`.
+inline void decode_packed(packed_fmt_t fmt, const uint8_t* src, size_t src_stride,
+                          float* dst, size_t len, unsigned channels) {
+    for (size_t i = 0; i < len; ++i) {
+        const uint8_t* s = src + i * src_stride;
+        float* d = dst + i * channels;
+        for (unsigned ch = 0; ch < channels; ++ch) {
+            switch (fmt) {
+            case PACKED_INT8:
+                d[ch] = (int8_t)s[ch] * (1.f / 128);
+                break;
+            case PACKED_UINT8:
+                d[ch] = ((int)s[ch] - 128) * (1.f / 128);
+                break;
+            case PACKED_FLOAT16: {
+                uint16_t h;
+                std::memcpy(&h, &s[ch*2], 2);
+                d[ch] = half_to_float(h);
+                break;
+            }
+            case PACKED_INT24: {
+                const uint8_t* b = &s[ch*3];
+                const int32_t v = (int32_t)((uint32_t)b[0] << 8 | (uint32_t)b[1] << 16 | (uint32_t)b[2] << 24) >> 8;
+                d[ch] = v * (1.f / 8388608);
+                break;
+            }
+            default:
+                break;
+            }
+        }
+    }
+}
 
-        // Grow to next power of 2
-        size_t new_size = 1024;
-        while (new_size < req_size) new_size <<= 1;
+inline int32_t round_clip(float v, float scale, int32_t lo, int32_t hi) {
+    const float r = std::nearbyint(v * scale);
+    return r < lo ? lo : (hi < r ? hi : (int32_t)r);
+}
 
-        auto new_buf = std::make_unique<uint8_t[]>(new_size);
-        if (copy && _y_buf) {
-            std::copy_n(_y_buf.get(), _y_buf_bytes, new_buf.get());
+// Encode `len` frames of `channels` samples. Frame `i` starts at `dst + i*dst_stride`.
+inline void encode_packed(packed_fmt_t fmt, const float* src, size_t len, unsigned channels,
+                          uint8_t* dst, size_t dst_stride) {
+    for (size_t i = 0; i < len; ++i) {
+        const float* s = src + i * channels;
+        uint8_t* d = dst + i * dst_stride;
+        for (unsigned ch = 0; ch < channels; ++ch) {
+            switch (fmt) {
+            case PACKED_INT8:
+                d[ch] = (uint8_t)(int8_t)round_clip(s[ch], 128, -128, 127);
+                break;
+            case PACKED_UINT8:
+                d[ch] = (uint8_t)(round_clip(s[ch], 128, -128, 127) + 128);
+                break;
+            case PACKED_FLOAT16: {
+                const uint16_t h = float_to_half(s[ch]);
+                std::memcpy(&d[ch*2], &h, 2);
+                break;
+            }
+            case PACKED_INT24: {
+                const uint32_t v = round_clip(s[ch], 8388608, -8388608, 8388607);
+                d[ch*3] = v & 0xff;
+                d[ch*3+1] = (v >> 8) & 0xff;
+                d[ch*3+2] = (v >> 16) & 0xff;
+                break;
+            }
+            default:
+                break;
+            }
         }
-        _y_buf = std::move(new_buf);
-        _y_buf_bytes = new_size;
-        _olen = _y_buf_bytes / (sizeof(T) * _channels);
-
-        return reinterpret_cast<T*>(_y_buf.get());
     }
+}
 
-    template <typename T>
-    T* _flush(soxr_in_t input, size_t& out_pos) {
-        // flush until no more output
-        T* y = reinterpret_cast<T*>(_y_buf.get());
+
+// Resample interleaved bytes with packed sample formats.
+// Input is decoded to float32 (and output encoded from float32) per block of `div_len` frames,
+// so only block sized scratch buffers are needed.
+// Frame stride of `x` and `y` is `x_stride` and `y_stride` bytes. (GIL-free)
+inline soxr_error_t divide_proc_packed(
+        const SoxrConfig& config,
+        const uint8_t* x, packed_fmt_t ifmt, size_t x_stride, size_t ilen,
+        uint8_t* y, packed_fmt_t ofmt, size_t y_stride, size_t olen,
+        size_t& out_pos, bool use_pool) {
+    const unsigned channels = config.channels;
+    const size_t ifrm = channels * soxr_datatype_size(config.itype);  // bytes per soxr frame
+    const size_t ofrm = channels * soxr_datatype_size(config.otype);
+
+    const size_t div_len = std::max(1000., 48000 * config.in_rate / config.out_rate);
+    const size_t blk_olen = div_len * config.out_rate / config.in_rate + 1;
+    auto ibuf = make_unique<uint8_t[]>(div_len * ifrm);
+    auto obuf = make_unique<uint8_t[]>(blk_olen * ofrm);
+
+    soxr_error_t err = NULL;
+    soxr_t soxr = g_pool.acquire(config, &err, use_pool);
+    if (err) return err;
+
+    // process and encode until no more output (or output is full)
+    auto drain = [&](soxr_in_t in, size_t in_len) {
         size_t odone = 0;
+        size_t cap = 0;
         do {
-            if (_olen <= out_pos) {
-                y = _resize_ybuf<T>(_y_buf_bytes * 2, true);
+            cap = std::min(blk_olen, olen-out_pos);
+            err = soxr_process(
+                soxr,
+                in, in_len, NULL,
+                obuf.get(), cap, &odone);
+            if (ofmt != PACKED_NONE) {
+                encode_packed(ofmt, (const float*)obuf.get(), odone, channels, &y[out_pos*y_stride], y_stride);
+            } else {
+                for (size_t i = 0; i < odone; ++i)
+                    std::memcpy(&y[(out_pos+i)*y_stride], &obuf[i*ofrm], ofrm);
             }
-            soxr_error_t err = soxr_process(
-                _soxr,
-                input, 0, NULL,
-                &y[out_pos*_channels], _olen-out_pos, &odone);
             out_pos += odone;
+            in_len = 0;
+        } while (!err && 0 < odone && odone == cap);
+    };
+
+    // divide long input, decode and process
+    for (size_t idx = 0; idx < ilen && !err; idx += div_len) {
+        const size_t len = std::min(div_len, ilen-idx);
+        if (ifmt != PACKED_NONE) {
+            decode_packed(ifmt, &x[idx*x_stride], x_stride, (float*)ibuf.get(), len, channels);
+        } else {
+            for (size_t i = 0; i < len; ++i)
+                std::memcpy(&ibuf[i*ifrm], &x[(idx+i)*x_stride], ifrm);
+        }
+        drain(ibuf.get(), len);
+    }
 
-            if (err != NULL) throw std::runtime_error(err);
-        } while (0 < odone);
-        return y;
+    // flush
+    if (!err) drain(NULL, 0);
+
+    g_pool.release(config, soxr, err, use_pool);
+    return err;
+}
+
+
+// Resample packed sample formats. `x` is bytes of interleaved frames, shape (frames, bytes per frame).
+// `ifmt`/`ofmt` is PACKED_NONE if input/output is `itype`/`otype` of libsoxr.
+// Returns bytes of output frames.
+nb::object csoxr_divide_proc_packed(
+        double in_rate, double out_rate,
+        ndarray<const uint8_t, nb::ndim<2>, nb::c_contig, nb::device::cpu> x,
+        unsigned channels, soxr_datatype_t itype, packed_fmt_t ifmt,
+        soxr_datatype_t otype, packed_fmt_t ofmt,
+        unsigned long quality, bool use_pool=true, unsigned num_threads=1, bool dither=true,
+        const RuntimeSpec& runtime=RuntimeSpec()) {
+    if (ifmt != PACKED_NONE) itype = SOXR_FLOAT32_I;
+    if (ofmt != PACKED_NONE) otype = SOXR_FLOAT32_I;
+
+    const size_t isize = ifmt != PACKED_NONE ? packed_size(ifmt) : soxr_datatype_size(itype);
+    const size_t osize = ofmt != PACKED_NONE ? packed_size(ofmt) : soxr_datatype_size(otype);
+
+    if (channels == 0 || x.shape(1) != channels * isize)
+        throw std::invalid_argument("Channel num mismatch");
+
+    const size_t ilen = x.shape(0);
+    const size_t olen = ilen * out_rate / in_rate + 1;
+    const size_t y_stride = channels * osize;
+
+    soxr_error_t err = NULL;
+
+    uint8_t *y = nullptr;
+    size_t out_pos = 0;
+    {
+        nb::gil_scoped_release release;
+        const auto t0 = std::chrono::steady_clock::now();
+
+        const SoxrConfig config { in_rate, out_rate, channels, itype, otype, quality, dither, runtime };
+
+        y = new uint8_t[olen * y_stride] { 0 };
+        err = proc_ch_groups(config, num_threads, out_pos,
+            [&](const SoxrConfig& group_config, unsigned ch, size_t& group_pos) {
+                return divide_proc_packed(
+                    group_config, &x.data()[ch*isize], ifmt, x.shape(1), ilen,
+                    &y[ch*osize], ofmt, y_stride, olen, group_pos, use_pool);
+            });
+        if (!err) g_stats.add(ilen, out_pos, t0);
     }
 
-    template <typename T>
-    auto process(
-            ndarray<const T, nb::ndim<2>, nb::c_contig, nb::device::cpu> x,
-            bool last=false) {
-        const unsigned channels = x.shape(1);
+    if (err) {
+        delete[] y;
+        throw std::runtime_error(err);
+    }
 
-        if (_ended)
-            throw std::runtime_error("Input after last input");
+    // Delete 'y' when the 'owner' capsule expires
+    nb::capsule owner(y, [](void *p) noexcept {
+        delete[] (uint8_t *) p;
+    });
+    return ndarray<nb::numpy, uint8_t>(y, { out_pos, y_stride }, owner).cast();
+}
 
-        if (channels != _channels)
-            throw std::invalid_argument("Channel num mismatch");
 
-        constexpr soxr_datatype_t ntype = to_i_dtype<T>;
+// Zero frames [begin, end) of `y`. Channel `ch` is at `y + y_st*ch` if split.
+template <typename T>
+void zero_frames(T* y, size_t begin, size_t end, unsigned channels, int64_t y_st=0) {
+    if (end <= begin)
+        return;
+    if (!y_st) {
+        std::fill_n(&y[begin * channels], (end - begin) * channels, T(0));
+        return;
+    }
+    for (unsigned ch = 0; ch < channels; ++ch)
+        std::fill_n(&y[y_st * ch + begin], end - begin, T(0));
+}
 
-        if (ntype != _ntype)
-            throw nb::type_error("Data type mismatch");
 
-        T *y = nullptr;
+// Returns output array of `otype`.
+// If `length` is given, output has exactly `length` frames. (cut, or zero padded)
+template <typename T>
+nb::object csoxr_divide_proc(
+        double in_rate, double out_rate,
+        ndarray<const T, nb::ndim<2>, nb::c_contig, nb::device::cpu> x,
+        unsigned long quality, bool use_pool=true, unsigned num_threads=1,
+        soxr_datatype_t otype=to_i_dtype<T>, bool dither=true,
+        const RuntimeSpec& runtime=RuntimeSpec(), std::optional<size_t> length=std::nullopt) {
+    const size_t ilen = x.shape(0);
+    const size_t olen = length ? *length : (size_t)(ilen * out_rate / in_rate + 1);
+    const unsigned channels = x.shape(1);
+
+    return visit_dtype(otype, [&](auto tag) -> nb::object {
+        using TO = typename decltype(tag)::type;
 
         soxr_error_t err = NULL;
+
+        TO *y = nullptr;
         size_t out_pos = 0;
         {
             nb::gil_scoped_release release;
+            const auto t0 = std::chrono::steady_clock::now();
 
-            const size_t ilen = x.shape(0);
+            const SoxrConfig config { in_rate, out_rate, channels, to_i_dtype<T>, to_i_dtype<TO>, quality, dither, runtime };
 
-            // This is slower than returning fixed `ilen * _oi_ratio` buffers w/o copying.
-            // But it ensures the lowest output delay provided by libsoxr.
-            const size_t req_len = soxr_delay(_soxr) + ilen * _oi_ratio + 1;
-            y = _resize_ybuf<T>(sizeof(T) * req_len * channels, false);
+            y = new TO[olen * channels]();  // zeros for padding
+            err = divide_proc_mt(config, x.data(), ilen, y, olen, out_pos, use_pool, num_threads);
+            if (!err) g_stats.add(ilen, out_pos, t0);
+        }
 
-            // divide long input and process
-            size_t odone = 0;
-            for (size_t idx = 0; idx < ilen; idx += _div_len) {
-                err = soxr_process(
-                    _soxr,
-                    &x.data()[idx*channels], std::min(_div_len, ilen-idx), NULL,
-                    &y[out_pos*channels], _olen-out_pos, &odone);
-                out_pos += odone;
-
-                if (_olen <= out_pos) {
-                    // for VR mode, output buffer may be full
-                    y = _flush<T>(&x.data()[idx*channels], out_pos);
-                }
-            }
+        if (err) {
+            delete[] y;
+            throw std::runtime_error(err);
+        }
+
+        // Delete 'y' when the 'owner' capsule expires
+        nb::capsule owner(y, [](void *p) noexcept {
+            delete[] (TO *) p;
+        });
+        return ndarray<nb::numpy, TO>(y, { length ? olen : out_pos, channels }, owner).cast();
+    });
+}
+
+
+// Resample into preallocated `out`. Output type follows dtype of `out`.
+// Returns number of frames written. (`length` if given, zero padded)
+template <typename T>
+size_t csoxr_divide_proc_into(
+        double in_rate, double out_rate,
+        ndarray<const T, nb::ndim<2>, nb::c_contig, nb::device::cpu> x,
+        ndarray<nb::ndim<2>, nb::c_contig, nb::device::cpu> out,
+        unsigned long quality, bool use_pool=true, unsigned num_threads=1,
+        soxr_datatype_t otype=to_i_dtype<T>, bool dither=true,
+        const RuntimeSpec& runtime=RuntimeSpec(), std::optional<size_t> length=std::nullopt) {
+    const size_t ilen = x.shape(0);
+    const size_t olen = length ? *length : (size_t)(ilen * out_rate / in_rate + 1);
+    const unsigned channels = x.shape(1);
+
+    if (out.shape(1) != channels)
+        throw std::invalid_argument("Channel num mismatch");
+
+    if (out.shape(0) < olen)
+        throw std::invalid_argument("Output buffer too small");
+
+    return visit_dtype(otype, [&](auto tag) {
+        using TO = typename decltype(tag)::type;
+
+        if (out.dtype() != nb::dtype<TO>())
+            throw nb::type_error("Output data type mismatch");
+
+        soxr_error_t err = NULL;
+        size_t out_pos = 0;
+        {
+            nb::gil_scoped_release release;
+            const auto t0 = std::chrono::steady_clock::now();
 
-            // flush if last input
-            if (last) {
-                _ended = true;
-                y = _flush<T>(NULL, out_pos);
+            const SoxrConfig config { in_rate, out_rate, channels, to_i_dtype<T>, to_i_dtype<TO>, quality, dither, runtime };
+
+            err = divide_proc_mt(config, x.data(), ilen, static_cast<TO*>(out.data()), olen,
+                                 out_pos, use_pool, num_threads);
+            if (!err) g_stats.add(ilen, out_pos, t0);
+            if (!err && length) {
+                zero_frames(static_cast<TO*>(out.data()), out_pos, olen, channels);
+                out_pos = olen;
             }
         }
 
         if (err) {
             throw std::runtime_error(err);
         }
+        return out_pos;
+    });
+}
 
-        // Return a copy
-        return ndarray<nb::numpy, T>(y, { out_pos, channels }).cast();
-    }
 
-    size_t num_clips() { return *soxr_num_clips(_soxr); }
-    double delay() { return soxr_delay(_soxr); }
-    char const * engine() { return soxr_engine(_soxr); }
+// Resample list of independent inputs on worker threads, releasing GIL once.
+// Returns list of output arrays. Failed item is replaced with its error message.
+template <typename T>
+nb::list csoxr_batch(
+        double in_rate, double out_rate,
+        std::vector<ndarray<const T, nb::ndim<2>, nb::c_contig, nb::device::cpu>> xs,
+        unsigned long quality, unsigned num_threads, bool use_pool=true,
+        std::optional<size_t> length=std::nullopt) {
+    const size_t num_items = xs.size();
+
+    auto ys = make_unique<T*[]>(num_items);
+    auto out_lens = make_unique<size_t[]>(num_items);
+    auto errs = make_unique<soxr_error_t[]>(num_items);
+    {
+        nb::gil_scoped_release release;
 
-    void clear() {
-        soxr_error_t err = soxr_clear(_soxr);
-        if (err != NULL) throw std::runtime_error(err);
-        _ended = false;
+        constexpr soxr_datatype_t ntype = to_i_dtype<T>;
+
+        parallel_for(num_items, num_threads, [&](size_t i) {
+            const size_t ilen = xs[i].shape(0);
+            const size_t olen = length ? *length : (size_t)(ilen * out_rate / in_rate + 1);
+            const unsigned channels = xs[i].shape(1);
+            const SoxrConfig config { in_rate, out_rate, channels, ntype, ntype, quality };
+
+            ys[i] = new (std::nothrow) T[olen * channels]();
+            if (!ys[i]) {
+                errs[i] = "malloc failed";
+                return;
+            }
+            const auto t0 = std::chrono::steady_clock::now();
+            errs[i] = divide_proc(config, xs[i].data(), ilen, ys[i], olen, out_lens[i], use_pool, channels);
+            if (!errs[i]) g_stats.add(ilen, out_lens[i], t0);
+            if (length) out_lens[i] = olen;
+        });
     }
 
-    void set_io_ratio(double io_ratio, size_t slew_len=0) {
-        soxr_error_t err = soxr_set_io_ratio(_soxr, io_ratio, slew_len);
-        if (err != NULL) throw std::runtime_error(err);
-        _oi_ratio = std::max(_oi_ratio, 1 / io_ratio);
+    nb::list results;
+    for (size_t i = 0; i < num_items; ++i) {
+        if (errs[i]) {
+            delete[] ys[i];
+            results.append(nb::str(errs[i]));
+            continue;
+        }
+
+        // Delete 'y' when the 'owner' capsule expires
+        nb::capsule owner(ys[i], [](void *p) noexcept {
+            delete[] (T *) p;
+        });
+        const size_t channels = xs[i].shape(1);
+        results.append(ndarray<nb::numpy, T>(ys[i], { out_lens[i], channels }, owner));
     }
-};
+    return results;
+}
 
 
-// soxr_oneshot() becomes much slower when input is long.
-// To avoid this, divide long input and process.
+// Resample list of independent inputs into rows of `out` [item, frame, channel], on worker threads.
+// Each output is `out.shape(1)` frames, cut or zero padded. Output type follows dtype of `out`.
+// Returns list of error message, or None for each item.
 template <typename T>
-auto csoxr_divide_proc(
+nb::list csoxr_batch_into(
         double in_rate, double out_rate,
-        ndarray<const T, nb::ndim<2>, nb::c_contig, nb::device::cpu> x,
-        unsigned long quality) {
-    const unsigned channels = x.shape(1);
+        std::vector<ndarray<const T, nb::ndim<2>, nb::c_contig, nb::device::cpu>> xs,
+        std::vector<size_t> rows,
+        ndarray<nb::ndim<3>, nb::c_contig, nb::device::cpu> out,
+        unsigned long quality, unsigned num_threads, bool use_pool=true,
+        soxr_datatype_t otype=to_i_dtype<T>) {
+    const size_t num_items = xs.size();
+    const size_t olen = out.shape(1);
+    const unsigned channels = out.shape(2);
+
+    if (rows.size() != num_items)
+        throw std::invalid_argument("Number of rows mismatch");
+
+    for (size_t i = 0; i < num_items; ++i) {
+        if (out.shape(0) <= rows[i])
+            throw std::invalid_argument("Row index out of range");
+        if (xs[i].shape(1) != channels)
+            throw std::invalid_argument("Channel num mismatch");
+    }
 
-    soxr_error_t err = NULL;
+    return visit_dtype(otype, [&](auto tag) {
+        using TO = typename decltype(tag)::type;
 
-    T *y = nullptr;
-    size_t out_pos = 0;
-    do {
-        nb::gil_scoped_release release;
+        if (out.dtype() != nb::dtype<TO>())
+            throw nb::type_error("Output data type mismatch");
 
-        constexpr soxr_datatype_t ntype = to_i_dtype<T>;
+        auto errs = make_unique<soxr_error_t[]>(num_items);
+        {
+            nb::gil_scoped_release release;
 
-        // init soxr
-        const soxr_io_spec_t io_spec = soxr_io_spec(ntype, ntype);
-        const soxr_quality_spec_t quality_spec = soxr_quality_spec(quality, 0);
+            parallel_for(num_items, num_threads, [&](size_t i) {
+                const size_t ilen = xs[i].shape(0);
+                const SoxrConfig config { in_rate, out_rate, channels, to_i_dtype<T>, to_i_dtype<TO>, quality };
+                TO* y = static_cast<TO*>(out.data()) + rows[i] * olen * channels;
+
+                size_t out_pos = 0;
+                const auto t0 = std::chrono::steady_clock::now();
+                errs[i] = divide_proc(config, xs[i].data(), ilen, y, olen, out_pos, use_pool, channels);
+                if (!errs[i]) g_stats.add(ilen, out_pos, t0);
+                zero_frames(y, out_pos, olen, channels);
+            });
+        }
 
-        soxr_t soxr = soxr_create(
-            in_rate, out_rate, channels,
-            &err, &io_spec, &quality_spec, NULL);
+        nb::list results;
+        for (size_t i = 0; i < num_items; ++i) {
+            if (errs[i])
+                results.append(nb::str(errs[i]));
+            else
+                results.append(nb::none());
+        }
+        return results;
+    });
+}
 
-        if (err) break;
 
-        // alloc
-        const size_t ilen = x.shape(0);
-        const size_t olen = ilen * out_rate / in_rate + 1;
-        const size_t div_len = std::max(1000., 48000 * in_rate / out_rate);
-        y = new T[olen * channels] { 0 };
+// Resample split channel I/O. Channel `ch` is at `x + x_st*ch` and `y + y_st*ch`. (GIL-free)
+template <typename TI, typename TO>
+soxr_error_t split_ch_proc(
+        const SoxrConfig& config, const TI* x, int64_t x_st, size_t ilen,
+        TO* y, int64_t y_st, size_t olen, size_t& out_pos, bool use_pool) {
+    const unsigned channels = config.channels;
 
-        // divide long input and process
-        size_t odone = 0;
-        for (size_t idx = 0; idx < ilen; idx += div_len) {
-            err = soxr_process(
-                soxr,
-                &x.data()[idx*channels], std::min(div_len, ilen-idx), NULL,
-                &y[out_pos*channels], olen-out_pos, &odone);
-            out_pos += odone;
+    auto ibuf_ptrs = make_unique<const TI*[]>(channels);
+    auto obuf_ptrs = make_unique<TO*[]>(channels);
+
+    soxr_error_t err = NULL;
+    soxr_t soxr = g_pool.acquire(config, &err, use_pool);
+    if (err) return err;
+
+    const size_t div_len = std::max(1000., 48000 * config.in_rate / config.out_rate);
+
+    // divide long input and process
+    size_t odone = 0;
+    for (size_t idx = 0; idx < ilen && !err; idx += div_len) {
+        // get pointers to each channel i/o
+        for (size_t ch = 0; ch < channels; ++ch) {
+            ibuf_ptrs[ch] = &x[x_st * ch + idx];
+            obuf_ptrs[ch] = &y[y_st * ch + out_pos];
         }
 
-        // flush
+        err = soxr_process(
+            soxr,
+            ibuf_ptrs.get(), std::min(div_len, ilen-idx), NULL,
+            obuf_ptrs.get(), olen-out_pos, &odone);
+        out_pos += odone;
+    }
+
+    // flush
+    if (!err) {
+        for (size_t ch = 0; ch < channels; ++ch) {
+            obuf_ptrs[ch] = &y[y_st * ch + out_pos];
+        }
         err = soxr_process(
             soxr,
             NULL, 0, NULL,
-            &y[out_pos*channels], olen-out_pos, &odone);
+            obuf_ptrs.get(), olen-out_pos, &odone);
         out_pos += odone;
+    }
 
-        // destruct
-        soxr_delete(soxr);
-    } while (false);
+    g_pool.release(config, soxr, err, use_pool);
+    return err;
+}
 
-    if (err) {
-        delete[] y;
-        throw std::runtime_error(err);
-    }
 
-    // Delete 'y' when the 'owner' capsule expires
-    nb::capsule owner(y, [](void *p) noexcept {
-        delete[] (T *) p;
-    });
-    return ndarray<nb::numpy, T>(y, { out_pos, channels }, owner);
+// Resample split channel I/O, processing channel groups in parallel.
+// If there are more threads than channels, time segments are processed in parallel instead. (GIL-free)
+template <typename TI, typename TO>
+soxr_error_t split_ch_proc_mt(
+        const SoxrConfig& config, const TI* x, int64_t x_st, size_t ilen,
+        TO* y, int64_t y_st, size_t olen, size_t& out_pos, bool use_pool, unsigned num_threads) {
+    soxr_error_t err = NULL;
+    if (num_workers(num_threads) > config.channels
+            && segment_proc(
+                config, ChBuf<TI>::split(const_cast<TI*>(x), x_st, config.channels), ilen,
+                ChBuf<TO>::split(y, y_st, config.channels), olen, out_pos, use_pool, num_threads, &err))
+        return err;
+
+    return proc_ch_groups(config, num_threads, out_pos,
+        [&](const SoxrConfig& group_config, unsigned ch, size_t& group_pos) {
+            return split_ch_proc(
+                group_config, &x[x_st * ch], x_st, ilen,
+                &y[y_st * ch], y_st, olen, group_pos, use_pool);
+        });
 }
 
 
 // split channel memory I/O (e.g. Fortran order)
 template <typename T>
-auto csoxr_split_ch(
+nb::object csoxr_split_ch(
         double in_rate, double out_rate,
         ndarray<const T, nb::ndim<2>, nb::device::cpu> x,
-        unsigned long quality) {
+        unsigned long quality, bool use_pool=true, unsigned num_threads=1,
+        soxr_datatype_t otype=to_i_dtype<T>, bool dither=true,
+        const RuntimeSpec& runtime=RuntimeSpec(), std::optional<size_t> length=std::nullopt) {
     if (in_rate <= 0 || out_rate <= 0)
         throw std::invalid_argument("Sample rate should be over 0");
 
     const size_t ilen = x.shape(0);
-    const size_t olen = ilen * out_rate / in_rate + 1;
+    const size_t olen = length ? *length : (size_t)(ilen * out_rate / in_rate + 1);
     const unsigned channels = x.shape(1);
 
     if (ilen != 0 && x.stride(0) != 1)
         throw std::invalid_argument("Data not contiguous");
 
-    soxr_error_t err = NULL;
+    return visit_dtype(otype, [&](auto tag) -> nb::object {
+        using TO = typename decltype(tag)::type;
 
-    T *y = nullptr;
-    size_t out_pos = 0;
-    do {
-        nb::gil_scoped_release release;
+        soxr_error_t err = NULL;
+
+        TO *y = nullptr;
+        size_t out_pos = 0;
+        {
+            nb::gil_scoped_release release;
+            const auto t0 = std::chrono::steady_clock::now();
 
-        constexpr soxr_datatype_t ntype = to_s_dtype<T>;
+            const SoxrConfig config { in_rate, out_rate, channels, to_s_dtype<T>, to_s_dtype<TO>, quality, dither, runtime };
 
-        // init soxr
-        const soxr_io_spec_t io_spec = soxr_io_spec(ntype, ntype);
-        const soxr_quality_spec_t quality_spec = soxr_quality_spec(quality, 0);
+            y = new TO[olen * channels]();  // zeros for padding
+            err = split_ch_proc_mt(
+                config, x.data(), x.stride(1), ilen,
+                y, olen, olen, out_pos, use_pool, num_threads);
+            if (!err) g_stats.add(ilen, out_pos, t0);
+        }
 
-        soxr_t soxr = soxr_create(
-            in_rate, out_rate, channels,
-            &err, &io_spec, &quality_spec, NULL);
+        if (err) {
+            delete[] y;
+            throw std::runtime_error(err);
+        }
 
-        if (err) break;
+        // Delete 'y' when the 'owner' capsule expires
+        nb::capsule owner(y, [](void *p) noexcept {
+           delete[] (TO *) p;
+        });
+        return ndarray<nb::numpy, TO>(y, { length ? olen : out_pos, channels }, owner, { (int64_t)1, (int64_t)olen }).cast();
+    });
+}
 
-        // alloc
-        const size_t div_len = std::max(1000., 48000 * in_rate / out_rate);
-        y = new T[olen * channels] { 0 };
 
-        const int64_t st = x.stride(1);
-        auto ibuf_ptrs = make_unique<const T*[]>(channels);
-        auto obuf_ptrs = make_unique<T*[]>(channels);
+// Resample split channel I/O into preallocated `out`. Output type follows dtype of `out`.
+// Returns number of frames written.
+template <typename T>
+size_t csoxr_split_ch_into(
+        double in_rate, double out_rate,
+        ndarray<const T, nb::ndim<2>, nb::device::cpu> x,
+        ndarray<nb::ndim<2>, nb::device::cpu> out,
+        unsigned long quality, bool use_pool=true, unsigned num_threads=1,
+        soxr_datatype_t otype=to_i_dtype<T>, bool dither=true,
+        const RuntimeSpec& runtime=RuntimeSpec(), std::optional<size_t> length=std::nullopt) {
+    if (in_rate <= 0 || out_rate <= 0)
+        throw std::invalid_argument("Sample rate should be over 0");
 
-        // divide long input and process
-        size_t odone = 0;
-        for (size_t idx = 0; idx < ilen; idx += div_len) {
-            // get pointers to each channel i/o
-            for (size_t ch = 0; ch < channels; ++ch) {
-                ibuf_ptrs[ch] = &x.data()[st * ch + idx];
-                obuf_ptrs[ch] = &y[olen * ch + out_pos];
-            }
+    const size_t ilen = x.shape(0);
+    const size_t olen = length ? *length : (size_t)(ilen * out_rate / in_rate + 1);
+    const unsigned channels = x.shape(1);
 
-            err = soxr_process(
-                soxr,
-                ibuf_ptrs.get(), std::min(div_len, ilen-idx), NULL,
-                obuf_ptrs.get(), olen-out_pos, &odone);
-            out_pos += odone;
-        }
+    if (ilen != 0 && x.stride(0) != 1)
+        throw std::invalid_argument("Data not contiguous");
 
-        // flush
-        for (size_t ch = 0; ch < channels; ++ch) {
-            obuf_ptrs[ch] = &y[olen * ch + out_pos];
-        }
-        err = soxr_process(
-            soxr,
-            NULL, 0, NULL,
-            obuf_ptrs.get(), olen-out_pos, &odone);
-        out_pos += odone;
+    if (out.shape(1) != channels)
+        throw std::invalid_argument("Channel num mismatch");
 
-        // destruct
-        soxr_delete(soxr);
-    } while (false);
+    if (out.shape(0) < olen)
+        throw std::invalid_argument("Output buffer too small");
 
-    if (err) {
-        delete[] y;
-        throw std::runtime_error(err);
-    }
+    if (out.stride(0) != 1)
+        throw std::invalid_argument("Output not contiguous");
 
-    // Delete 'y' when the 'owner' capsule expires
-    nb::capsule owner(y, [](void *p) noexcept {
-       delete[] (T *) p;
+    return visit_dtype(otype, [&](auto tag) {
+        using TO = typename decltype(tag)::type;
+
+        if (out.dtype() != nb::dtype<TO>())
+            throw nb::type_error("Output data type mismatch");
+
+        soxr_error_t err = NULL;
+        size_t out_pos = 0;
+        {
+            nb::gil_scoped_release release;
+            const auto t0 = std::chrono::steady_clock::now();
+
+            const SoxrConfig config { in_rate, out_rate, channels, to_s_dtype<T>, to_s_dtype<TO>, quality, dither, runtime };
+
+            err = split_ch_proc_mt(
+                config, x.data(), x.stride(1), ilen,
+                static_cast<TO*>(out.data()), out.stride(1), olen, out_pos, use_pool, num_threads);
+            if (!err) g_stats.add(ilen, out_pos, t0);
+            if (!err && length) {
+                zero_frames(static_cast<TO*>(out.data()), out_pos, olen, channels, out.stride(1));
+                out_pos = olen;
+            }
+        }
+
+        if (err) {
+            throw std::runtime_error(err);
+        }
+        return out_pos;
     });
-    return ndarray<nb::numpy, T>(y, { out_pos, channels }, owner, { (int64_t)1, (int64_t)olen });
 }
 
 
@@ -405,33 +2855,213 @@ auto csoxr_oneshot(
 NB_MODULE(soxr_ext, m) {
     m.def("libsoxr_version", libsoxr_version);
 
+    nb::class_<RuntimeSpec>(m, "RuntimeSpec",
+        "libsoxr runtime resources\n\n"
+        "Parameters\n"
+        "----------\n"
+        "num_threads : int, optional\n"
+        "    Threads used inside libsoxr to process channels. 0 for OMP_NUM_THREADS. (default: 1)\n"
+        "    Takes effect only if libsoxr is built with OpenMP. See `soxr.__with_openmp__`.\n"
+        "log2_min_dft_size : int, optional\n"
+        "    log2 of minimum DFT size, in [8, 15]. (default: 10)\n"
+        "log2_large_dft_size : int, optional\n"
+        "    log2 of DFT size considered large, in [8, 20]. (default: 17)\n"
+        "    Smaller sizes may fit better in small CPU caches.\n"
+        "coef_size_kbytes : int, optional\n"
+        "    Size limit of interpolated filter coefficients for irrational ratios, in [100, 800]. (default: 400)\n")
+        .def(nb::init<unsigned, unsigned, unsigned, unsigned>(),
+             "num_threads"_a = 1, "log2_min_dft_size"_a = 10, "log2_large_dft_size"_a = 17,
+             "coef_size_kbytes"_a = 400)
+        .def_ro("num_threads", &RuntimeSpec::num_threads)
+        .def_ro("log2_min_dft_size", &RuntimeSpec::log2_min_dft_size)
+        .def_ro("log2_large_dft_size", &RuntimeSpec::log2_large_dft_size)
+        .def_ro("coef_size_kbytes", &RuntimeSpec::coef_size_kbytes)
+        .def(nb::self == nb::self)
+        .def("__repr__", [](const RuntimeSpec& spec) {
+            return nb::str("RuntimeSpec(num_threads={}, log2_min_dft_size={}, log2_large_dft_size={}, "
+                           "coef_size_kbytes={})").format(
+                spec.num_threads, spec.log2_min_dft_size, spec.log2_large_dft_size, spec.coef_size_kbytes);
+        });
+
+#ifdef SOXR_WITH_OPENMP  // defined by CMakeLists.txt if libsoxr is built with OpenMP
+    m.attr("with_openmp") = true;
+#else
+    m.attr("with_openmp") = false;
+#endif
+
     nb::class_<CSoxr>(m, "CSoxr")
         .def_ro("in_rate", &CSoxr::_in_rate)
         .def_ro("out_rate", &CSoxr::_out_rate)
-        .def_ro("ntype", &CSoxr::_ntype)
+        .def_ro("itype", &CSoxr::_itype)
+        .def_ro("otype", &CSoxr::_otype)
         .def_ro("channels", &CSoxr::_channels)
         .def_ro("ended", &CSoxr::_ended)
-        .def(nb::init<double, double, unsigned, soxr_datatype_t, unsigned long, bool>())
+        .def(nb::init<double, double, unsigned, soxr_datatype_t, soxr_datatype_t, unsigned long, bool,
+                      unsigned, bool, bool, const RuntimeSpec&>())
         .def("process_float32", &CSoxr::process<float>)
         .def("process_float64", &CSoxr::process<double>)
         .def("process_int32", &CSoxr::process<int32_t>)
         .def("process_int16", &CSoxr::process<int16_t>)
+        .def("process_split_float32", &CSoxr::process_split<float>)
+        .def("process_split_float32", &CSoxr::process_split_list<float>)
+        .def("process_split_float64", &CSoxr::process_split<double>)
+        .def("process_split_float64", &CSoxr::process_split_list<double>)
+        .def("process_split_int32", &CSoxr::process_split<int32_t>)
+        .def("process_split_int32", &CSoxr::process_split_list<int32_t>)
+        .def("process_split_int16", &CSoxr::process_split<int16_t>)
+        .def("process_split_int16", &CSoxr::process_split_list<int16_t>)
+        .def("process_into_float32", &CSoxr::process_into<float>,
+             "x"_a, "out"_a.noconvert(), "last"_a = false)
+        .def("process_into_float64", &CSoxr::process_into<double>,
+             "x"_a, "out"_a.noconvert(), "last"_a = false)
+        .def("process_into_int32", &CSoxr::process_into<int32_t>,
+             "x"_a, "out"_a.noconvert(), "last"_a = false)
+        .def("process_into_int16", &CSoxr::process_into<int16_t>,
+             "x"_a, "out"_a.noconvert(), "last"_a = false)
+        .def("process_split_into_float32", &CSoxr::process_split_into<float>,
+             "x"_a, "out"_a.noconvert(), "last"_a = false)
+        .def("process_split_into_float32", &CSoxr::process_split_list_into<float>,
+             "x"_a, "out"_a.noconvert(), "last"_a = false)
+        .def("process_split_into_float64", &CSoxr::process_split_into<double>,
+             "x"_a, "out"_a.noconvert(), "last"_a = false)
+        .def("process_split_into_float64", &CSoxr::process_split_list_into<double>,
+             "x"_a, "out"_a.noconvert(), "last"_a = false)
+        .def("process_split_into_int32", &CSoxr::process_split_into<int32_t>,
+             "x"_a, "out"_a.noconvert(), "last"_a = false)
+        .def("process_split_into_int32", &CSoxr::process_split_list_into<int32_t>,
+             "x"_a, "out"_a.noconvert(), "last"_a = false)
+        .def("process_split_into_int16", &CSoxr::process_split_into<int16_t>,
+             "x"_a, "out"_a.noconvert(), "last"_a = false)
+        .def("process_split_into_int16", &CSoxr::process_split_list_into<int16_t>,
+             "x"_a, "out"_a.noconvert(), "last"_a = false)
+        .def("max_out_len", &CSoxr::max_out_len)
         .def("num_clips", &CSoxr::num_clips)
         .def("delay", &CSoxr::delay)
+        .def("stats", &CSoxr::stats)
+        .def("set_buffer_policy", &CSoxr::set_buffer_policy)
+        .def("trim", &CSoxr::trim)
+        .def("memory_usage", &CSoxr::memory_usage)
         .def("engine", &CSoxr::engine)
         .def("clear", &CSoxr::clear)
         .def("set_io_ratio", &CSoxr::set_io_ratio);
 
+    nb::class_<CSoxrBank>(m, "CSoxrBank")
+        .def(nb::init<size_t, double, double, unsigned, soxr_datatype_t, soxr_datatype_t, unsigned long, bool,
+                      unsigned, bool>())
+        .def("process_float32", &CSoxrBank::process<float>)
+        .def("process_stacked_float32", &CSoxrBank::process_stacked<float>)
+        .def("process_float64", &CSoxrBank::process<double>)
+        .def("process_stacked_float64", &CSoxrBank::process_stacked<double>)
+        .def("process_int32", &CSoxrBank::process<int32_t>)
+        .def("process_stacked_int32", &CSoxrBank::process_stacked<int32_t>)
+        .def("process_int16", &CSoxrBank::process<int16_t>)
+        .def("process_stacked_int16", &CSoxrBank::process_stacked<int16_t>)
+        .def("__len__", &CSoxrBank::size)
+        .def("stream", &CSoxrBank::stream, nb::rv_policy::reference_internal);
+
+    nb::class_<CSoxrPuller>(m, "CSoxrPuller", nb::type_slots(puller_slots))
+        .def_ro("itype", &CSoxrPuller::_itype)
+        .def_ro("otype", &CSoxrPuller::_otype)
+        .def_ro("channels", &CSoxrPuller::_channels)
+        .def_ro("ended", &CSoxrPuller::_ended)
+        .def(nb::init<double, double, unsigned, soxr_datatype_t, soxr_datatype_t, unsigned long,
+                      nb::object, bool>(),
+             "in_rate"_a, "out_rate"_a, "num_channels"_a, "itype"_a, "otype"_a, "quality"_a,
+             "input_fn"_a.none(), "dither"_a = true)
+        .def("write_float32", &CSoxrPuller::write<float>, "x"_a, "last"_a = false)
+        .def("write_float64", &CSoxrPuller::write<double>, "x"_a, "last"_a = false)
+        .def("write_int32", &CSoxrPuller::write<int32_t>, "x"_a, "last"_a = false)
+        .def("write_int16", &CSoxrPuller::write<int16_t>, "x"_a, "last"_a = false)
+        .def("read", &CSoxrPuller::read)
+        .def("read_into", &CSoxrPuller::read_into, "out"_a.noconvert())
+        .def("available", &CSoxrPuller::available)
+        .def("num_clips", &CSoxrPuller::num_clips)
+        .def("delay", &CSoxrPuller::delay)
+        .def("clear", &CSoxrPuller::clear);
+
+    nb::class_<CSoxrRing>(m, "CSoxrRing")
+        .def_ro("itype", &CSoxrRing::_itype)
+        .def_ro("otype", &CSoxrRing::_otype)
+        .def_ro("channels", &CSoxrRing::_channels)
+        .def_ro("max_chunk", &CSoxrRing::_max_chunk)
+        .def_ro("capacity", &CSoxrRing::_capacity)
+        .def(nb::init<double, double, unsigned, soxr_datatype_t, soxr_datatype_t, unsigned long,
+                      size_t, size_t, bool>())
+        .def("push_float32", &CSoxrRing::push<float>, "x"_a.noconvert(), "last"_a = false)
+        .def("push_float64", &CSoxrRing::push<double>, "x"_a.noconvert(), "last"_a = false)
+        .def("push_int32", &CSoxrRing::push<int32_t>, "x"_a.noconvert(), "last"_a = false)
+        .def("push_int16", &CSoxrRing::push<int16_t>, "x"_a.noconvert(), "last"_a = false)
+        .def("pull_into", &CSoxrRing::pull_into, "out"_a.noconvert())
+        .def("available", &CSoxrRing::available)
+        .def("underruns", &CSoxrRing::underruns)
+        .def("overruns", &CSoxrRing::overruns)
+        .def("ended", &CSoxrRing::ended)
+        .def("num_clips", &CSoxrRing::num_clips)
+        .def("delay", &CSoxrRing::delay)
+        .def("clear", &CSoxrRing::clear);
+
+    m.def("pool_stats", []() { return g_pool.stats(); });
+    m.def("set_pool_capacity", [](size_t capacity) { g_pool.set_capacity(capacity); });
+    m.def("clear_pool", []() { g_pool.clear(); });
+    m.def("resample_stats", []() { return g_stats.stats(); });
+    m.def("reset_resample_stats", []() { g_stats.reset(); });
+
     m.def("csoxr_divide_proc_float32", csoxr_divide_proc<float>);
     m.def("csoxr_divide_proc_float64", csoxr_divide_proc<double>);
     m.def("csoxr_divide_proc_int32", csoxr_divide_proc<int32_t>);
     m.def("csoxr_divide_proc_int16", csoxr_divide_proc<int16_t>);
 
+    m.def("csoxr_divide_proc_into_float32", csoxr_divide_proc_into<float>,
+          "in_rate"_a, "out_rate"_a, "x"_a, "out"_a.noconvert(), "quality"_a, "use_pool"_a, "num_threads"_a,
+          "otype"_a, "dither"_a, "runtime"_a, "length"_a = nb::none());
+    m.def("csoxr_divide_proc_into_float64", csoxr_divide_proc_into<double>,
+          "in_rate"_a, "out_rate"_a, "x"_a, "out"_a.noconvert(), "quality"_a, "use_pool"_a, "num_threads"_a,
+          "otype"_a, "dither"_a, "runtime"_a, "length"_a = nb::none());
+    m.def("csoxr_divide_proc_into_int32", csoxr_divide_proc_into<int32_t>,
+          "in_rate"_a, "out_rate"_a, "x"_a, "out"_a.noconvert(), "quality"_a, "use_pool"_a, "num_threads"_a,
+          "otype"_a, "dither"_a, "runtime"_a, "length"_a = nb::none());
+    m.def("csoxr_divide_proc_into_int16", csoxr_divide_proc_into<int16_t>,
+          "in_rate"_a, "out_rate"_a, "x"_a, "out"_a.noconvert(), "quality"_a, "use_pool"_a, "num_threads"_a,
+          "otype"_a, "dither"_a, "runtime"_a, "length"_a = nb::none());
+
+    m.def("csoxr_divide_proc_packed", csoxr_divide_proc_packed);
+
+    m.def("csoxr_batch_float32", csoxr_batch<float>);
+    m.def("csoxr_batch_float64", csoxr_batch<double>);
+    m.def("csoxr_batch_int32", csoxr_batch<int32_t>);
+    m.def("csoxr_batch_int16", csoxr_batch<int16_t>);
+
+    m.def("csoxr_batch_into_float32", csoxr_batch_into<float>,
+          "in_rate"_a, "out_rate"_a, "xs"_a, "rows"_a, "out"_a.noconvert(), "quality"_a, "num_threads"_a,
+          "use_pool"_a, "otype"_a);
+    m.def("csoxr_batch_into_float64", csoxr_batch_into<double>,
+          "in_rate"_a, "out_rate"_a, "xs"_a, "rows"_a, "out"_a.noconvert(), "quality"_a, "num_threads"_a,
+          "use_pool"_a, "otype"_a);
+    m.def("csoxr_batch_into_int32", csoxr_batch_into<int32_t>,
+          "in_rate"_a, "out_rate"_a, "xs"_a, "rows"_a, "out"_a.noconvert(), "quality"_a, "num_threads"_a,
+          "use_pool"_a, "otype"_a);
+    m.def("csoxr_batch_into_int16", csoxr_batch_into<int16_t>,
+          "in_rate"_a, "out_rate"_a, "xs"_a, "rows"_a, "out"_a.noconvert(), "quality"_a, "num_threads"_a,
+          "use_pool"_a, "otype"_a);
+
     m.def("csoxr_split_ch_float32", csoxr_split_ch<float>);
     m.def("csoxr_split_ch_float64", csoxr_split_ch<double>);
     m.def("csoxr_split_ch_int32", csoxr_split_ch<int32_t>);
     m.def("csoxr_split_ch_int16", csoxr_split_ch<int16_t>);
 
+    m.def("csoxr_split_ch_into_float32", csoxr_split_ch_into<float>,
+          "in_rate"_a, "out_rate"_a, "x"_a, "out"_a.noconvert(), "quality"_a, "use_pool"_a, "num_threads"_a,
+          "otype"_a, "dither"_a, "runtime"_a, "length"_a = nb::none());
+    m.def("csoxr_split_ch_into_float64", csoxr_split_ch_into<double>,
+          "in_rate"_a, "out_rate"_a, "x"_a, "out"_a.noconvert(), "quality"_a, "use_pool"_a, "num_threads"_a,
+          "otype"_a, "dither"_a, "runtime"_a, "length"_a = nb::none());
+    m.def("csoxr_split_ch_into_int32", csoxr_split_ch_into<int32_t>,
+          "in_rate"_a, "out_rate"_a, "x"_a, "out"_a.noconvert(), "quality"_a, "use_pool"_a, "num_threads"_a,
+          "otype"_a, "dither"_a, "runtime"_a, "length"_a = nb::none());
+    m.def("csoxr_split_ch_into_int16", csoxr_split_ch_into<int16_t>,
+          "in_rate"_a, "out_rate"_a, "x"_a, "out"_a.noconvert(), "quality"_a, "use_pool"_a, "num_threads"_a,
+          "otype"_a, "dither"_a, "runtime"_a, "length"_a = nb::none());
+
     m.def("csoxr_oneshot_float32", csoxr_oneshot<float>);
     m.def("csoxr_oneshot_float64", csoxr_oneshot<double>);
     m.def("csoxr_oneshot_int32", csoxr_oneshot<int32_t>);
@@ -442,6 +3072,18 @@ NB_MODULE(soxr_ext, m) {
         .value("SOXR_FLOAT64_I", SOXR_FLOAT64_I)
         .value("SOXR_INT32_I", SOXR_INT32_I)
         .value("SOXR_INT16_I", SOXR_INT16_I)
+        .value("SOXR_FLOAT32_S", SOXR_FLOAT32_S)
+        .value("SOXR_FLOAT64_S", SOXR_FLOAT64_S)
+        .value("SOXR_INT32_S", SOXR_INT32_S)
+        .value("SOXR_INT16_S", SOXR_INT16_S)
+        .export_values();
+
+    nb::enum_<packed_fmt_t>(m, "packed_fmt_t")
+        .value("PACKED_NONE", PACKED_NONE)
+        .value("PACKED_INT8", PACKED_INT8)
+        .value("PACKED_UINT8", PACKED_UINT8)
+        .value("PACKED_FLOAT16", PACKED_FLOAT16)
+        .value("PACKED_INT24", PACKED_INT24)
         .export_values();
     
     m.attr("QQ") = SOXR_QQ;
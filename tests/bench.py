@@ -48,6 +48,29 @@ t = timeit.timeit(lambda: soxr.resample(sig, P, Q, quality=QUALITY), number=REPE
 print(f'soxr resample: {t:f} (sec)')
 
 
+# soxr resample w/o resampler pool
+t = timeit.timeit(lambda: soxr.resample(sig, P, Q, quality=QUALITY, use_pool=False), number=REPEAT)
+print(f'soxr resample w/o pool: {t:f} (sec)')
+
+
+# int16 to float32: astype() after resample vs. conversion in libsoxr
+sig_i16 = (sig * 16384).astype(np.int16)
+t = timeit.timeit(lambda: soxr.resample(sig_i16, P, Q, quality=QUALITY).astype(np.float32), number=REPEAT)
+print(f'soxr resample int16 + astype: {t:f} (sec)')
+
+t = timeit.timeit(lambda: soxr.resample(sig_i16, P, Q, quality=QUALITY, out_dtype=np.float32), number=REPEAT)
+print(f'soxr resample int16 -> float32: {t:f} (sec)')
+
+
+# long mono signal: time segments in parallel
+sig_long = np.tile(sig[:, 0], 20)
+t = timeit.timeit(lambda: soxr.resample(sig_long, P, Q, quality=QUALITY), number=REPEAT // 20)
+print(f'soxr resample long mono: {t:f} (sec)')
+
+t = timeit.timeit(lambda: soxr.resample(sig_long, P, Q, quality=QUALITY, num_threads=0), number=REPEAT // 20)
+print(f'soxr resample long mono, all cores: {t:f} (sec)')
+
+
 # soxr split ch I/O:
 sig_s = np.asfortranarray(sig)
 t = timeit.timeit(lambda: soxr.resample(sig_s, P, Q, quality=QUALITY), number=REPEAT)
@@ -68,8 +91,10 @@ if hasattr(soxr.ResampleStream, 'clear'):
 
 
 # soxr stream chunk processing
-def soxr_stream():
-    rs_stream = soxr.ResampleStream(P, Q, sig.shape[1], dtype=sig.dtype, quality=QUALITY)
+def soxr_stream(zero_copy=False, layout='interleaved'):
+    rs_stream = soxr.ResampleStream(P, Q, sig.shape[1], dtype=sig.dtype, quality=QUALITY,
+                                    zero_copy=zero_copy, layout=layout)
+    sig_in = sig if layout == 'interleaved' else np.asfortranarray(sig)
 
     y_list = []
     for idx in range(0, len(sig), CHUNK_SIZE):
@@ -78,7 +103,7 @@ def soxr_stream():
         if len(sig) <= end:
             eof = True
             end = len(sig)
-        y_chunk = rs_stream.resample_chunk(sig[idx:end], last=eof)
+        y_chunk = rs_stream.resample_chunk(sig_in[idx:end], last=eof)
         y_list.append(y_chunk)
 
     return np.concatenate(y_list)
@@ -87,6 +112,12 @@ t = timeit.timeit(soxr_stream, number=REPEAT)
 print(f'{CHUNK_SIZE = }')
 print(f'soxr stream: {t:f} (sec)')
 
+t = timeit.timeit(lambda: soxr_stream(zero_copy=True), number=REPEAT)
+print(f'soxr stream zero-copy: {t:f} (sec)')
+
+t = timeit.timeit(lambda: soxr_stream(layout='planar'), number=REPEAT)
+print(f'soxr stream planar: {t:f} (sec)')
+
 
 # resampy kaiser_fast
 try:
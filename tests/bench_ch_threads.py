@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""
+Python-SoXR
+https://github.com/dofuuz/python-soxr
+
+SPDX-FileCopyrightText: (c) 2021 Myungchul Keum
+SPDX-License-Identifier: LGPL-2.1-or-later
+
+Channel-parallel speed benchmark for wide multichannel input.
+"""
+
+import os
+import timeit
+
+import numpy as np
+
+import soxr
+
+LEN = 48000 * 2
+CHANNELS = 128
+REPEAT = 5
+P = 48000
+Q = 44100
+
+QUALITY = 'HQ'
+CHUNK_SIZE = int(P * 0.01)
+
+
+print(f'{soxr.__version__ = }')
+print(f'{os.cpu_count() = }')
+print(f'{CHANNELS = }')
+
+sig = np.random.randn(LEN, CHANNELS).astype(np.float32)
+sig_s = np.asfortranarray(sig)
+
+
+def soxr_stream(num_threads):
+    rs = soxr.ResampleStream(P, Q, CHANNELS, quality=QUALITY, num_threads=num_threads)
+    for idx in range(0, LEN, CHUNK_SIZE):
+        rs.resample_chunk(sig[idx:idx+CHUNK_SIZE], last=LEN <= idx+CHUNK_SIZE)
+
+
+for num_threads in [1, 2, 4, 8, 16]:
+    t = timeit.timeit(lambda: soxr.resample(sig, P, Q, quality=QUALITY, num_threads=num_threads), number=REPEAT)
+    print(f'resample {num_threads=}: {t:f} (sec)')
+
+    t = timeit.timeit(lambda: soxr.resample(sig_s, P, Q, quality=QUALITY, num_threads=num_threads), number=REPEAT)
+    print(f'split ch {num_threads=}: {t:f} (sec)')
+
+    t = timeit.timeit(lambda: soxr_stream(num_threads), number=REPEAT)
+    print(f'stream   {num_threads=}: {t:f} (sec)')
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+"""
+Python-SoXR
+https://github.com/dofuuz/python-soxr
+
+SPDX-FileCopyrightText: (c) 2021 Myungchul Keum
+SPDX-License-Identifier: LGPL-2.1-or-later
+
+Throughput of libsoxr runtime specs at each quality.
+libsoxr threading (num_threads=0) requires build with OpenMP:
+    pip install . -C cmake.define.WITH_OPENMP=ON
+"""
+
+import os
+import timeit
+
+import numpy as np
+
+import soxr
+
+LEN = 48000 * 10
+CHANNELS = 8
+REPEAT = 5
+P = 48000
+Q = 44100
+
+SPECS = {
+    'default': soxr.RuntimeSpec(),
+    'omp threads': soxr.RuntimeSpec(num_threads=0),
+    'small DFT': soxr.RuntimeSpec(log2_min_dft_size=8, log2_large_dft_size=14),
+    'large DFT': soxr.RuntimeSpec(log2_min_dft_size=12, log2_large_dft_size=20),
+}
+
+
+print(f'{soxr.__version__ = }')
+print(f'{soxr.__with_openmp__ = }')
+print(f'{os.cpu_count() = }')
+
+sig = np.random.default_rng(0).uniform(-1, 1, (LEN, CHANNELS)).astype(np.float32)
+print(f'{sig.shape = }')
+
+for quality in ['QQ', 'LQ', 'MQ', 'HQ', 'VHQ']:
+    for name, spec in SPECS.items():
+        t = timeit.timeit(lambda: soxr.resample(sig, P, Q, quality=quality, runtime_spec=spec), number=REPEAT)
+        print(f'{quality:>3} {name:>12}: {LEN * CHANNELS * REPEAT / t / 1e6:8.1f} (Msamples/sec)')
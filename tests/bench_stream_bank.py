@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""
+Python-SoXR
+https://github.com/dofuuz/python-soxr
+
+SPDX-FileCopyrightText: (c) 2021 Myungchul Keum
+SPDX-License-Identifier: LGPL-2.1-or-later
+
+Speed benchmark of many concurrent streams with short chunks. (e.g. VoIP calls)
+"""
+
+import os
+import timeit
+
+import numpy as np
+
+import soxr
+
+NUM_STREAMS = 2000
+FRAMES = 50     # 1 sec of 20 ms frames
+P = 8000
+Q = 16000
+
+QUALITY = 'HQ'
+CHUNK_SIZE = int(P * 0.02)
+
+
+print(f'{soxr.__version__ = }')
+print(f'{os.cpu_count() = }')
+print(f'{NUM_STREAMS = }, {CHUNK_SIZE = }')
+
+sig = np.random.randn(NUM_STREAMS, CHUNK_SIZE * FRAMES, 1).astype(np.float32)
+
+
+def per_stream():
+    streams = [soxr.ResampleStream(P, Q, 1, quality=QUALITY) for _ in range(NUM_STREAMS)]
+    for f in range(FRAMES):
+        chunk = sig[:, f*CHUNK_SIZE:(f+1)*CHUNK_SIZE]
+        for rs, x in zip(streams, chunk):
+            rs.resample_chunk(x)
+
+
+def bank(num_threads):
+    rs_bank = soxr.ResampleStreamBank(NUM_STREAMS, P, Q, 1, quality=QUALITY, num_threads=num_threads)
+    for f in range(FRAMES):
+        chunk = np.ascontiguousarray(sig[:, f*CHUNK_SIZE:(f+1)*CHUNK_SIZE])
+        rs_bank.resample_chunks(chunk)
+
+
+t = timeit.timeit(per_stream, number=1)
+print(f'ResampleStream per stream: {t:f} (sec)')
+
+for num_threads in [1, 2, 4, 8]:
+    t = timeit.timeit(lambda: bank(num_threads), number=1)
+    print(f'ResampleStreamBank {num_threads=}: {t:f} (sec)')
@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+"""
+Python-SoXR
+https://github.com/dofuuz/python-soxr
+
+SPDX-FileCopyrightText: (c) 2021 Myungchul Keum
+SPDX-License-Identifier: LGPL-2.1-or-later
+
+Benchmark suite with JSON results and regression check against a baseline.
+
+Cases cover dtype x quality x layout x channels x length of `resample()` (including int8, uint8,
+float16 and packed int24), and chunk size of `ResampleStream`, plus thread scaling and peak memory.
+
+Usage:
+    python bench_suite.py -o base.json                  # save results
+    python bench_suite.py -o new.json -b base.json      # compare with baseline
+    python bench_suite.py --quick -k resample/float32   # subset of cases
+
+Exits with 1 if any case regressed over the threshold.
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import textwrap
+import timeit
+
+import numpy as np
+
+import soxr
+
+DTYPES = ['float32', 'float64', 'int16', 'int32']
+PACKED_DTYPES = ['int8', 'uint8', 'float16', 'int24']  # resample() only
+QUALITIES = ['QQ', 'LQ', 'MQ', 'HQ', 'VHQ']
+LAYOUTS = ['interleaved', 'split']
+CHANNELS = [1, 2, 8]
+LENGTHS = [480, 48000, 480000]
+CHUNK_SIZES = [480, 4800]
+THREADS = [1, 2, 4, 0]
+
+P = 48000
+Q = 44100
+
+
+def make_signal(dtype, length, channels, layout):
+    # Filled block by block, not to raise peak memory over the signal itself
+    # 'int24' is packed 24-bit little endian, uint8 array of [frame, channel, 3]
+    rng = np.random.default_rng(0)
+    if dtype == 'int24':
+        x = np.empty((length, channels, 3), dtype=np.uint8)
+        for idx in range(0, length, 4096):
+            block = x[idx:idx+4096]
+            v = (rng.uniform(-0.5, 0.5, block.shape[:2]) * (2**23 - 1)).astype('<i4')
+            block[:] = v[..., np.newaxis].view(np.uint8)[..., :3]
+        return x
+
+    x = np.empty((length, channels), dtype=dtype, order='F' if layout == 'split' else 'C')
+    kind = np.dtype(dtype).kind
+    scale = np.iinfo(dtype).max if kind == 'i' else 127 if kind == 'u' else 1
+    offset = 128 if kind == 'u' else 0  # uint8 is offset binary
+    for idx in range(0, length, 4096):
+        block = x[idx:idx+4096]
+        block[:] = rng.uniform(-0.5, 0.5, block.shape) * scale + offset
+    return x
+
+
+def resample_cases(quick):
+    dtypes = DTYPES[:1] if quick else DTYPES + PACKED_DTYPES
+    qualities = ['HQ'] if quick else QUALITIES
+    lengths = LENGTHS[1:2] if quick else LENGTHS
+    for dtype in dtypes:
+        in_dtype = 'int24' if dtype == 'int24' else None
+        for quality in qualities:
+            for layout in LAYOUTS[:1] if dtype == 'int24' else LAYOUTS:
+                for channels in CHANNELS:
+                    for length in lengths:
+                        name = f'resample/{dtype}/{quality}/{layout}/ch{channels}/len{length}'
+                        x = make_signal(dtype, length, channels, layout)
+                        yield name, length * channels, (lambda x=x, q=quality, d=in_dtype:
+                                                        soxr.resample(x, P, Q, quality=q, in_dtype=d))
+
+
+def stream_cases(quick):
+    dtypes = DTYPES[:1] if quick else DTYPES
+    qualities = ['HQ'] if quick else QUALITIES
+    length = LENGTHS[1]
+    for dtype in dtypes:
+        for quality in qualities:
+            for layout in LAYOUTS:
+                for channels in CHANNELS:
+                    for chunk_size in CHUNK_SIZES:
+                        name = f'stream/{dtype}/{quality}/{layout}/ch{channels}/chunk{chunk_size}'
+                        x = make_signal(dtype, length, channels, layout)
+                        rs = soxr.ResampleStream(P, Q, channels, dtype, quality,
+                                                 layout='planar' if layout == 'split' else 'interleaved')
+
+                        def run(x=x, rs=rs, chunk_size=chunk_size):
+                            rs.clear()
+                            for idx in range(0, len(x), chunk_size):
+                                rs.resample_chunk(x[idx:idx+chunk_size], last=len(x) <= idx+chunk_size)
+
+                        yield name, x.size, run
+
+
+def thread_cases(quick):
+    length = LENGTHS[-1] * (1 if quick else 4)
+    for channels in [1, 8]:
+        x = make_signal('float32', length, channels, 'interleaved')
+        for num_threads in THREADS:
+            name = f'threads/float32/HQ/ch{channels}/len{length}/t{num_threads}'
+            yield name, x.size, (lambda x=x, n=num_threads: soxr.resample(x, P, Q, num_threads=n))
+
+
+def measure_time(fn, repeat, min_time):
+    fn()  # warm up (resampler pool, page faults)
+    number = 1
+    while True:
+        t = timeit.timeit(fn, number=number)
+        if min_time <= t or 1000 <= number:
+            break
+        number *= 2
+    return min([t] + timeit.repeat(fn, number=number, repeat=repeat - 1)) / number
+
+
+MEM_CASES = {
+    # name: (dtype, length, channels, layout)
+    'memory/resample/float32/ch2/len4800000': ('float32', 4800000, 2, 'interleaved'),
+    'memory/resample/float32/split/ch2/len4800000': ('float32', 4800000, 2, 'split'),
+    'memory/resample/int16/ch8/len480000': ('int16', 480000, 8, 'interleaved'),
+}
+
+MEM_SCRIPT = textwrap.dedent('''
+    import resource, sys
+    import numpy as np
+    import soxr
+    from bench_suite import make_signal
+    x = make_signal(sys.argv[1], int(sys.argv[2]), int(sys.argv[3]), sys.argv[4])
+    soxr.resample(x[:1000], 48000, 44100)
+    base = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    y = soxr.resample(x, 48000, 44100)
+    print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - base)
+''')
+
+
+def measure_peak_memory(dtype, length, channels, layout):
+    # Peak RSS increase of resample() in a fresh process, in KiB. (Linux)
+    out = subprocess.run(
+        [sys.executable, '-c', MEM_SCRIPT, dtype, str(length), str(channels), layout],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True, text=True, check=True)
+    return int(out.stdout.strip())
+
+
+def run_suite(args):
+    results = {}
+
+    def selected(name):
+        return not args.k or any(k in name for k in args.k)
+
+    for cases in (resample_cases, stream_cases, thread_cases):
+        for name, num_samples, fn in cases(args.quick):
+            if not selected(name):
+                continue
+            t = measure_time(fn, args.repeat, args.min_time)
+            results[name] = {'time': t, 'msamples_per_sec': num_samples / t / 1e6}
+            print(f'{name:<56} {t * 1e3:10.3f} ms {num_samples / t / 1e6:8.1f} Msamples/s', flush=True)
+
+    if sys.platform.startswith('linux'):
+        for name, case in MEM_CASES.items():
+            if not selected(name):
+                continue
+            peak = measure_peak_memory(*case)
+            results[name] = {'peak_kib': peak}
+            print(f'{name:<56} {peak:10d} KiB', flush=True)
+
+    return results
+
+
+def compare(results, baseline, threshold, mem_threshold):
+    # Returns list of regression messages
+    regressions = []
+    for name, base in baseline.items():
+        if name not in results:
+            continue
+        cur = results[name]
+        if 'time' in base:
+            ratio = cur['time'] / base['time']
+            if 1 + threshold < ratio:
+                regressions.append(f'{name}: time {base["time"] * 1e3:.3f} -> {cur["time"] * 1e3:.3f} ms '
+                                   f'(+{(ratio - 1) * 100:.1f}%)')
+        if 'peak_kib' in base:
+            limit = base['peak_kib'] * (1 + mem_threshold) + 1024
+            if limit < cur['peak_kib']:
+                regressions.append(f'{name}: peak memory {base["peak_kib"]} -> {cur["peak_kib"]} KiB')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Python-SoXR benchmark suite')
+    parser.add_argument('-o', '--output', help='JSON file to write results')
+    parser.add_argument('-b', '--baseline', help='JSON file of baseline results to compare with')
+    parser.add_argument('-t', '--threshold', type=float, default=0.10,
+                        help='Allowed time increase ratio over baseline (default: 0.10)')
+    parser.add_argument('--mem-threshold', type=float, default=0.10,
+                        help='Allowed peak memory increase ratio over baseline (default: 0.10)')
+    parser.add_argument('-k', action='append',
+                        help='Run only cases containing this substring. Can be repeated.')
+    parser.add_argument('--quick', action='store_true', help='Run reduced set of cases')
+    parser.add_argument('--repeat', type=int, default=5, help='Timing repeats, best is taken (default: 5)')
+    parser.add_argument('--min-time', type=float, default=0.05,
+                        help='Minimum seconds of a timing run (default: 0.05)')
+    args = parser.parse_args()
+
+    meta = {
+        'soxr': soxr.__version__,
+        'libsoxr': soxr.__libsoxr_version__,
+        'numpy': np.__version__,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+    }
+    print(meta)
+
+    results = run_suite(args)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'meta': meta, 'results': results}, f, indent=1)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline['results'], args.threshold, args.mem_threshold)
+        print(f'\n{len(regressions)} regression(s) over baseline ({baseline["meta"].get("soxr")})')
+        for msg in regressions:
+            print('  ' + msg)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -6,6 +6,9 @@ Created on Wed Apr 13 00:33:32 2022
 """
 
 import asyncio
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
 from time import time
 
 import numpy as np
@@ -53,5 +56,62 @@ async def main():
     await asyncio.gather(th_resample(), th_resample(), th_resample(), th_resample(), th_resample())
     print(time() - t)
 
+    # library owned executor
+    t = time()
+    await asyncio.gather(*[soxr.aresample(data, fs, 24000) for _ in range(5)])
+    print(time() - t)
+
+    # native thread pool
+    t = time()
+    soxr.resample_batch([data] * 5, fs, 24000)
+    print(time() - t)
+
+
+def stream_chunks(chunk_size=4800):
+    rs = soxr.ResampleStream(fs, 24000, 2, dtype=data.dtype)
+    for idx in range(0, len(data), chunk_size):
+        rs.resample_chunk(data[idx:idx+chunk_size], last=len(data) <= idx+chunk_size)
+
+
+def scaling():
+    # free-threaded Python (3.13t+) runs these in parallel without the GIL
+    gil = sys._is_gil_enabled() if hasattr(sys, '_is_gil_enabled') else True
+    print(f'\nthread scaling (GIL enabled: {gil}, cpu_count: {os.cpu_count()})')
+
+    counts = [1]
+    while counts[-1] * 2 <= (os.cpu_count() or 1):
+        counts.append(counts[-1] * 2)
+
+    for name, fn in [('resample()', resample), ('ResampleStream', stream_chunks)]:
+        base = None
+        for n in counts:
+            with ThreadPoolExecutor(n) as ex:
+                t = time()
+                list(ex.map(lambda _: fn(), range(n)))
+                t = time() - t
+            rate = n * data.size / t / 1e6
+            base = base or rate
+            print(f'{name:<16} threads: {n:3d} {rate:8.1f} Msamples/s  speedup: {rate / base:5.2f}x')
+
+
+def processes():
+    # many short signals, where Python-side work around each call counts
+    xs = [data[i:i+fs] for i in range(0, len(data), fs)]
+    n = os.cpu_count() or 1
+    print(f'\n{len(xs)} signals of 1s, {n} workers')
+
+    with ThreadPoolExecutor(n) as ex:
+        t = time()
+        list(ex.map(lambda x: soxr.resample(x, fs, 24000), xs))
+        print(f'threads          {time() - t:.3f} s')
+
+    soxr.resample_many(xs[:n], fs, 24000, processes=n)  # start workers
+    t = time()
+    soxr.resample_many(xs, fs, 24000, processes=n)
+    print(f'resample_many()  {time() - t:.3f} s')
+
 
-asyncio.run(main())
+if __name__ == '__main__':
+    asyncio.run(main())
+    scaling()
+    processes()
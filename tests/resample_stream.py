@@ -9,23 +9,13 @@ in_file = sf.SoundFile('very_long.flac', 'r')
 source_rate = in_file.samplerate
 channels = in_file.channels
 
-# Config ResampleStream
-resampler = soxr.ResampleStream(source_rate, TARGET_RATE, channels, dtype='float32')
+# Chunks of audio. Decoded while previous chunk is resampled on background thread.
+chunks = in_file.blocks(CHUNK_SIZE, dtype='float32', always_2d=True)
 
 # Open output audio file
 with sf.SoundFile('output.flac', 'w', TARGET_RATE, channels) as out_file:
-    while True:
-        # Read chunk of audio
-        x = in_file.read(CHUNK_SIZE, dtype='float32')
-        is_last = (in_file.tell() == in_file.frames)
-
-        # Resample the chunk
-        y = resampler.resample_chunk(x, last=is_last)
-
+    for y in soxr.resample_iter(chunks, source_rate, TARGET_RATE, background=True):
         # Write to output file
         out_file.write(y)
 
-        if is_last:
-            break
-
 in_file.close()
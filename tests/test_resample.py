@@ -9,8 +9,16 @@ High quality, one-dimensional sample-rate conversion library for Python.
 Python-SoXR is a Python wrapper of libsoxr.
 """
 
+import asyncio
+import pickle
+import subprocess
+import sys
+import textwrap
+import threading
+import time
 from concurrent.futures import ThreadPoolExecutor
 from functools import partial
+from pathlib import Path
 
 import numpy as np
 import pytest
@@ -35,13 +43,16 @@ def test_dtype(dtype):
     assert x.dtype == y.dtype
 
 
-@pytest.mark.parametrize('dtype', [np.complex64, np.complex128, np.int8, np.int64])
+@pytest.mark.parametrize('dtype', [np.complex64, np.complex128, np.uint16, np.int64])
 def test_bad_dtype(dtype):
     # test invalid dtype
     x = np.zeros(100, dtype=dtype)
     with pytest.raises((TypeError, ValueError)):
         soxr.resample(x, 100, 200)
 
+    with pytest.raises(TypeError, match='int8, uint8, float16, int24'):
+        soxr.ResampleStream(100, 200, 1, dtype)
+
 
 @pytest.mark.parametrize('in_rate, out_rate', [(44100, 32000), (32000, 44100)])
 @pytest.mark.parametrize('dtype', [np.float32, np.float64])
@@ -84,10 +95,10 @@ def test_channel_match(channels):
     assert np.all(y_oneshot == y_split)
 
 
-def stream_resample(x, in_rate, out_rate, chunk_size, dtype):
+def stream_resample(x, in_rate, out_rate, chunk_size, dtype, **kwargs):
     channels = x.shape[1]
 
-    rs_stream = soxr.ResampleStream(in_rate, out_rate, channels, dtype=dtype)
+    rs_stream = soxr.ResampleStream(in_rate, out_rate, channels, dtype=dtype, **kwargs)
 
     y_list = [np.ndarray([0, channels], dtype=dtype)]
     for idx in range(0, len(x), chunk_size):
@@ -209,3 +220,1286 @@ def test_mt_dither(num_task):
         assert np.all(results[-2] == results[-1])
     except AssertionError:
         pytest.xfail("Random dithering seed used. May produce slightly different result when using int I/O.")
+
+
+@pytest.mark.parametrize('dtype', [np.float32, np.float64, np.int32, np.int16])
+@pytest.mark.parametrize('order', ['C', 'F'])
+def test_pool_match(dtype, order):
+    # test pooled resampler produces same output with fresh one
+    x = np.asarray((np.random.randn(4001, 2) * 5000).astype(dtype), order=order)
+
+    y_fresh = soxr.resample(x, 44100, 32000, use_pool=False)
+    y_pool1 = soxr.resample(x, 44100, 32000)
+    y_pool2 = soxr.resample(x, 44100, 32000)
+
+    assert np.all(y_fresh == y_pool1)
+    assert np.all(y_fresh == y_pool2)
+
+
+def test_pool_stats():
+    # test pool hit/miss counter and capacity
+    x = np.random.randn(1000, 3).astype(np.float32)
+
+    soxr.clear_pool()
+    soxr.resample(x, 44100, 16000)
+    soxr.resample(x, 44100, 16000)
+    soxr.resample(x, 44100, 16000, use_pool=False)
+    stats = soxr.pool_stats()
+    assert stats['hits'] == 1
+    assert stats['misses'] == 1
+    assert stats['size'] == 1
+
+    try:
+        soxr.set_pool_capacity(0)
+        soxr.resample(x, 44100, 16000)
+        assert soxr.pool_stats()['size'] == 0
+    finally:
+        soxr.set_pool_capacity(16)
+
+
+@pytest.mark.parametrize('num_threads', [0, 1, 3])
+@pytest.mark.parametrize('dtype', [np.float32, np.float64, np.int32])
+def test_batch_match(num_threads, dtype):
+    # test resample_batch() with mixed length and channels
+    xs = [np.random.randn(length, channels).astype(dtype)
+          for length, channels in [(0, 2), (1, 1), (4410, 3), (44101, 2), (100, 5)]]
+    xs.append(np.random.randn(2000).astype(dtype))
+
+    ys = soxr.resample_batch(xs, 44100, 32000, num_threads=num_threads)
+
+    assert len(ys) == len(xs)
+    for x, y in zip(xs, ys):
+        assert np.all(soxr.resample(x, 44100, 32000) == y)
+
+
+def test_batch_error():
+    # test per-item error report of resample_batch()
+    xs = [np.zeros(100, dtype=np.float32), np.zeros(100, dtype=np.int8), np.zeros((2, 2, 2)), [0.] * 100]
+
+    with pytest.raises(TypeError):
+        soxr.resample_batch(xs, 100, 200)
+
+    ys = soxr.resample_batch(xs, 100, 200, return_exceptions=True)
+
+    assert ys[0].shape == (200,)
+    assert isinstance(ys[1], TypeError)
+    assert isinstance(ys[2], ValueError)
+    assert ys[3].dtype == np.float32
+
+
+@pytest.mark.skipif(not sys.platform.startswith('linux'), reason='reads /proc/self/status')
+def test_worker_threads_persist():
+    # test worker threads are reused across calls, not created per call
+    def num_threads():
+        with open('/proc/self/status') as f:
+            return next(int(line.split()[1]) for line in f if line.startswith('Threads:'))
+
+    x = np.random.randn(960, 8).astype(np.float32)
+    rs = soxr.ResampleStream(48000, 16000, 8, num_threads=4)
+    rs.resample_chunk(x)
+    count = num_threads()
+
+    for _ in range(100):
+        rs.resample_chunk(x)
+        soxr.resample_batch([x] * 4, 48000, 16000, num_threads=4)
+    assert num_threads() == count
+
+
+@pytest.mark.parametrize('num_threads', [2, 3, 0])
+@pytest.mark.parametrize('channels', [1, 2, 5, 24])
+@pytest.mark.parametrize('dtype', [np.float32, np.int32, np.int16])
+def test_ch_thread_match(num_threads, channels, dtype):
+    # test channel-parallel resample()
+    x = (np.random.randn(66151, channels) * 5000).astype(dtype)
+
+    y_single = soxr.resample(x, 44100, 32000, dither=False)
+    y_divide = soxr.resample(x, 44100, 32000, num_threads=num_threads, dither=False)
+    y_split = soxr.resample(np.asfortranarray(x), 44100, 32000, num_threads=num_threads, dither=False)
+
+    assert np.all(y_single == y_divide)
+    assert np.all(y_single == y_split)
+
+    if dtype == np.int16:
+        # dither noise of int16 depends on channel grouping
+        y_single = soxr.resample(x, 44100, 32000)
+        y_divide = soxr.resample(x, 44100, 32000, num_threads=num_threads)
+        assert np.max(np.abs(y_single.astype(np.int32) - y_divide), initial=0) <= 2
+
+
+@pytest.mark.parametrize('num_threads', [2, 4])
+@pytest.mark.parametrize('chunk_size', [17, 4410])
+@pytest.mark.parametrize('channels', [3, 8])
+def test_stream_ch_thread(num_threads, chunk_size, channels):
+    # test channel-parallel resample_chunk()
+    x = np.random.randn(44100, channels).astype(np.float32)
+
+    y_oneshot = soxr._resample_oneshot(x, 44100, 32000)
+    y_stream = stream_resample(x, 44100, 32000, chunk_size, np.float32, num_threads=num_threads)
+
+    assert np.all(y_oneshot == y_stream)
+
+
+@pytest.mark.parametrize('in_rate, out_rate', [(44100, 32000), (32000, 44100)])
+@pytest.mark.parametrize('shape', [(0,), (1, 1), (31999,), (31999, 3)])
+@pytest.mark.parametrize('order', ['C', 'F'])
+@pytest.mark.parametrize('num_threads', [1, 2])
+def test_resample_out(in_rate, out_rate, shape, order, num_threads):
+    # test resample() with preallocated output
+    x = np.asarray(np.random.randn(*shape).astype(np.float32), order=order)
+    out_shape = (soxr.max_out_frames(shape[0], in_rate, out_rate) + 7,) + shape[1:]
+    out = np.zeros(out_shape, dtype=np.float32, order=order)
+
+    y = soxr.resample(x, in_rate, out_rate, num_threads=num_threads)
+    y_out = soxr.resample(x, in_rate, out_rate, num_threads=num_threads, out=out)
+
+    assert y_out.base is out
+    assert np.all(y == y_out)
+
+
+def test_resample_bad_out():
+    # test invalid output array
+    x = np.random.randn(1000, 2).astype(np.float32)
+    out_len = soxr.max_out_frames(1000, 44100, 32000)
+
+    with pytest.raises(ValueError):
+        soxr.resample(x, 44100, 32000, out=np.zeros((out_len - 1, 2), dtype=np.float32))
+    with pytest.raises(ValueError):
+        soxr.resample(x, 44100, 32000, out=np.zeros((out_len, 2), dtype=np.float32, order='F'))
+    with pytest.raises(ValueError):
+        soxr.resample(x, 44100, 32000, out=np.zeros((out_len, 3), dtype=np.float32))
+    with pytest.raises(TypeError):
+        soxr.resample(x, 44100, 32000, out=np.zeros((out_len, 2), dtype=np.int8))
+    with pytest.raises(TypeError):
+        soxr.resample(x, 44100, 32000, out=np.zeros((out_len, 2), dtype=np.float64), out_dtype=np.float32)
+
+
+@pytest.mark.parametrize('chunk_size', [17, 4410])
+@pytest.mark.parametrize('num_threads', [1, 2])
+@pytest.mark.parametrize('channels', [1, 3])
+def test_stream_into(chunk_size, num_threads, channels):
+    # test resample_chunk_into() writing to a ring buffer
+    x = np.random.randn(44100, channels).astype(np.float32)
+
+    rs = soxr.ResampleStream(44100, 32000, channels, num_threads=num_threads)
+    out = np.zeros((40000, channels), dtype=np.float32)
+    out_pos = 0
+    for idx in range(0, len(x), chunk_size):
+        chunk = x[idx:idx+chunk_size]
+        assert rs.max_out_frames(len(chunk)) <= len(out) - out_pos
+        out_pos += rs.resample_chunk_into(chunk, out[out_pos:], last=len(x) <= idx+chunk_size)
+
+    y_oneshot = soxr._resample_oneshot(x, 44100, 32000)
+    assert np.all(y_oneshot == out[:out_pos])
+
+
+def test_stream_bad_into():
+    # test invalid output array for resample_chunk_into()
+    rs = soxr.ResampleStream(44100, 32000, 2)
+    x = np.zeros((1000, 2), dtype=np.float32)
+
+    with pytest.raises(ValueError):
+        rs.resample_chunk_into(x, np.zeros((rs.max_out_frames(1000) - 1, 2), dtype=np.float32))
+    with pytest.raises(ValueError):
+        rs.resample_chunk_into(x, np.zeros((2000, 2), dtype=np.float32, order='F'))
+    with pytest.raises(TypeError):
+        rs.resample_chunk_into(x, np.zeros((2000, 2), dtype=np.float64))
+
+
+@pytest.mark.parametrize('chunk_size', [17, 4410])
+@pytest.mark.parametrize('num_threads', [1, 2])
+def test_stream_zero_copy(chunk_size, num_threads):
+    # test zero-copy outputs stay valid while referenced
+    x = np.random.randn(44100, 2).astype(np.float32)
+
+    y_oneshot = soxr._resample_oneshot(x, 44100, 32000)
+    y_stream = stream_resample(x, 44100, 32000, chunk_size, np.float32,
+                               num_threads=num_threads, zero_copy=True)
+
+    assert np.all(y_oneshot == y_stream)
+
+
+def test_stream_zero_copy_reuse():
+    # test zero-copy output is read-only and buffer is reused after release
+    rs = soxr.ResampleStream(44100, 32000, 1, zero_copy=True)
+    x = np.random.randn(4410).astype(np.float32)
+
+    y1 = rs.resample_chunk(x)
+    y1_copy = y1.copy()
+    y2 = rs.resample_chunk(x)
+    assert not y1.flags.writeable
+    assert not np.shares_memory(y1, y2)
+    assert np.all(y1 == y1_copy)
+
+    ptr = y2.__array_interface__['data'][0]
+    del y1, y2
+    y3 = rs.resample_chunk(x)
+    assert y3.__array_interface__['data'][0] == ptr
+
+
+@pytest.mark.parametrize('chunk_size', [17, 4410])
+@pytest.mark.parametrize('num_threads', [1, 2])
+@pytest.mark.parametrize('zero_copy', [False, True])
+@pytest.mark.parametrize('dtype', [np.float32, np.int32])
+def test_stream_planar(chunk_size, num_threads, zero_copy, dtype):
+    # test planar layout gives same result with interleaved
+    x = (np.random.randn(44100, 3) * 1000).astype(dtype)
+
+    y_inter = stream_resample(x, 44100, 32000, chunk_size, dtype)
+
+    x_f = np.asfortranarray(x)
+    y_planar = stream_resample(x_f, 44100, 32000, chunk_size, dtype,
+                               num_threads=num_threads, zero_copy=zero_copy, layout='planar')
+    assert np.all(y_inter == y_planar)
+
+    # list of channels
+    rs = soxr.ResampleStream(44100, 32000, 3, dtype=dtype,
+                             num_threads=num_threads, zero_copy=zero_copy, layout='planar')
+    y_list = []
+    for idx in range(0, len(x), chunk_size):
+        chunk = [x_f[idx:idx+chunk_size, ch] for ch in range(3)]
+        y_chunk = rs.resample_chunk(chunk, last=len(x) <= idx+chunk_size)
+        assert y_chunk.strides[0] == y_chunk.itemsize
+        y_list.append(y_chunk)
+    assert np.all(y_inter == np.concatenate(y_list))
+
+
+@pytest.mark.parametrize('num_threads', [1, 2])
+def test_stream_planar_into(num_threads):
+    # test resample_chunk_into() with planar layout
+    x = np.random.randn(44100, 2).astype(np.float32)
+    rs = soxr.ResampleStream(44100, 32000, 2, num_threads=num_threads, layout='planar')
+
+    out = np.zeros((rs.max_out_frames(len(x)), 2), dtype=np.float32, order='F')
+    n = rs.resample_chunk_into([x[:, 0].copy(), x[:, 1].copy()], out, last=True)
+
+    y_oneshot = soxr._resample_oneshot(x, 44100, 32000)
+    assert np.all(y_oneshot == out[:n])
+
+    with pytest.raises(ValueError):
+        rs.resample_chunk_into(x, np.zeros((out.shape[0], 2), dtype=np.float32))
+
+
+@pytest.mark.parametrize('in_dtype, out_dtype', [(np.int16, np.float32), (np.float32, np.int16),
+                                                 (np.int32, np.float64), (np.float64, np.int32)])
+@pytest.mark.parametrize('layout', ['interleaved', 'planar'])
+def test_mixed_dtype(in_dtype, out_dtype, layout):
+    # test conversion while resampling is same with resampling in float64 then converting
+    x = np.random.uniform(-0.5, 0.5, (44100, 2))
+    if np.issubdtype(in_dtype, np.integer):
+        x = (x * np.iinfo(in_dtype).max).astype(in_dtype)
+        x_f = x / -np.iinfo(in_dtype).min
+    else:
+        x = x.astype(in_dtype)
+        x_f = x.astype(np.float64)
+
+    y_ref = soxr.resample(x_f, 44100, 32000)
+    if np.issubdtype(out_dtype, np.integer):
+        y_ref = y_ref * -np.iinfo(out_dtype).min
+        atol = 2
+    else:
+        atol = 1e-6
+
+    x_in = np.asfortranarray(x) if layout == 'planar' else x
+    y = soxr.resample(x_in, 44100, 32000, out_dtype=out_dtype, dither=False)
+    assert y.dtype == out_dtype
+    assert np.allclose(y, y_ref, rtol=0, atol=atol)
+
+    order = 'F' if layout == 'planar' else 'C'
+    out = np.zeros((soxr.max_out_frames(len(x), 44100, 32000), 2), dtype=out_dtype, order=order)
+    y_out = soxr.resample(x_in, 44100, 32000, out=out, dither=False)
+    assert np.all(y_out == y)
+
+    rs = soxr.ResampleStream(44100, 32000, 2, in_dtype=in_dtype, out_dtype=out_dtype,
+                             dither=False, layout=layout)
+    y_stream = np.concatenate([rs.resample_chunk(x_in[i:i+4410], last=len(x) <= i+4410)
+                               for i in range(0, len(x), 4410)])
+    assert y_stream.dtype == out_dtype
+    assert np.allclose(y_stream, y_ref, rtol=0, atol=atol)
+
+
+def test_mixed_dtype_clips():
+    # test clipping is counted for int output
+    x = np.random.uniform(-2, 2, (4410, 2)).astype(np.float32)
+    rs = soxr.ResampleStream(44100, 32000, 2, dtype=np.float32, out_dtype=np.int16)
+    y = rs.resample_chunk(x, last=True)
+    assert y.dtype == np.int16
+    assert rs.num_clips() > 0
+
+    with pytest.raises(TypeError):
+        rs.resample_chunk_into(x, np.zeros((4410, 2), dtype=np.float32))
+    with pytest.raises(TypeError):
+        soxr.resample(x, 44100, 32000, out=np.zeros((4410, 2), dtype=np.float32), out_dtype=np.int16)
+
+
+def decode_packed(x, fmt):
+    # reference decoder of packed formats to float32
+    if fmt == 'int24':
+        x = x.astype(np.int32)
+        v = x[..., 0] | (x[..., 1] << 8) | (x[..., 2] << 16)
+        return (np.where(v & 0x800000, v - 0x1000000, v) / 8388608).astype(np.float32)
+    elif x.dtype == np.uint8:
+        return ((x.astype(np.float32) - 128) / 128)
+    elif x.dtype == np.int8:
+        return x.astype(np.float32) / 128
+    return x.astype(np.float32)
+
+
+@pytest.mark.parametrize('fmt', [np.int8, np.uint8, np.float16, 'int24'])
+@pytest.mark.parametrize('channels', [1, 3])
+@pytest.mark.parametrize('num_threads', [1, 2])
+def test_packed_format(fmt, channels, num_threads):
+    # test packed sample formats matches resampling decoded float32
+    x_f = np.random.uniform(-0.5, 0.5, (44100, channels)).astype(np.float32)
+    if channels == 1:
+        x_f = x_f[:, 0]
+
+    y_ref = soxr.resample(x_f, 44100, 32000)
+
+    # encode
+    x = soxr.resample(x_f, 44100, 44100, out_dtype=fmt)
+    assert np.allclose(decode_packed(x, fmt), x_f, rtol=0, atol=1/128)
+
+    # decode
+    kwargs = {'in_dtype': 'int24'} if fmt == 'int24' else {}
+    y = soxr.resample(x, 44100, 32000, out_dtype=np.float32, num_threads=num_threads, **kwargs)
+    assert np.all(y == soxr.resample(decode_packed(x, fmt), 44100, 32000))
+
+    # same format output
+    y = soxr.resample(x, 44100, 32000, num_threads=num_threads, **kwargs)
+    assert y.shape == y_ref.shape + ((3,) if fmt == 'int24' else ())
+    assert np.allclose(decode_packed(y, fmt), y_ref, rtol=0, atol=1/32)
+
+
+def test_packed_int24_bytes():
+    # test raw bytes input of int24
+    x = np.random.randint(-2**23, 2**23, 4410, dtype=np.int32)
+    x_bytes = x.astype('<i4').view(np.uint8).reshape(-1, 4)[:, :3].tobytes()
+
+    y = soxr.resample(x_bytes, 44100, 32000, in_dtype='int24', out_dtype=np.float32)
+    assert np.all(y == soxr.resample((x / 8388608).astype(np.float32), 44100, 32000))
+
+
+def test_resample_memmap(tmp_path):
+    # test np.memmap I/O of resample()
+    x = np.lib.format.open_memmap(tmp_path / 'x.npy', mode='w+', dtype=np.int16, shape=(44100, 2))
+    x[:] = np.random.randint(-10000, 10000, x.shape)
+    out_len = soxr.max_out_frames(len(x), 44100, 32000)
+    out = np.lib.format.open_memmap(tmp_path / 'y.npy', mode='w+', dtype=np.float32, shape=(out_len, 2))
+
+    y = soxr.resample(x, 44100, 32000, out=out)
+    assert np.shares_memory(y, out)
+    assert np.all(y == soxr.resample(np.array(x), 44100, 32000, out_dtype=np.float32))
+
+
+@pytest.mark.parametrize('src_type', ['path', 'array'])
+@pytest.mark.parametrize('shape', [(0,), (31999,), (166151, 3)])
+@pytest.mark.parametrize('dtype, out_dtype', [(np.float32, None), (np.int16, np.float32)])
+def test_resample_to_file(tmp_path, src_type, shape, dtype, out_dtype):
+    # test resample_to_file() matches resample()
+    x = (np.random.randn(*shape) * 1000).astype(dtype)
+    np.save(tmp_path / 'x.npy', x)
+    src = tmp_path / 'x.npy' if src_type == 'path' else np.load(tmp_path / 'x.npy', mmap_mode='r')
+
+    n = soxr.resample_to_file(src, tmp_path / 'y.npy', 44100, 32000, max_memory=2**16, out_dtype=out_dtype)
+    y = np.load(tmp_path / 'y.npy')
+
+    y_ref = soxr.resample(x, 44100, 32000, out_dtype=out_dtype, dither=False)
+    assert n == len(y) == len(y_ref)
+    assert y.dtype == y_ref.dtype
+    assert np.allclose(y, y_ref, rtol=0, atol=1e-5)
+
+
+def test_resample_to_file_keeps_dst(tmp_path):
+    # test dst is left intact on failure
+    dst = tmp_path / 'y.npy'
+    np.save(dst, np.ones(100, np.float32))
+
+    np.save(tmp_path / 'x.npy', np.zeros(100, '>i2'))
+    with pytest.raises(TypeError):
+        soxr.resample_to_file(tmp_path / 'x.npy', dst, 44100, 32000)
+
+    with open(tmp_path / 'x.npy', 'r+b') as f:  # truncated input
+        np.save(f, np.zeros(100000, np.float32))
+        f.truncate(f.tell() - 1000)
+    with pytest.raises(ValueError):
+        soxr.resample_to_file(tmp_path / 'x.npy', dst, 44100, 32000, max_memory=2**16)
+
+    assert np.all(np.load(dst) == 1)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['x.npy', 'y.npy']
+
+
+@pytest.mark.skipif(not sys.platform.startswith('linux'), reason='ru_maxrss is measured in KiB on Linux')
+def test_resample_to_file_memory(tmp_path):
+    # test peak memory stays under budget for input bigger than the budget
+    src = tmp_path / 'x.npy'
+    shape = (8_000_000, 2)  # 64 MB
+    with open(src, 'wb') as f:
+        np.lib.format.write_array_header_1_0(
+            f, {'descr': '<f4', 'fortran_order': False, 'shape': shape})
+        for _ in range(shape[0] // 500_000):
+            np.random.randn(500_000, 2).astype(np.float32).tofile(f)
+
+    script = textwrap.dedent(f"""
+        import resource
+        import soxr
+        before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        n = soxr.resample_to_file({str(src)!r}, {str(tmp_path / 'y.npy')!r}, 48000, 44100,
+                                  max_memory=8 * 2**20)
+        after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        print(n, (after - before) * 1024)
+    """)
+    n, rss_growth = map(int, subprocess.check_output([sys.executable, '-c', script]).split())
+
+    assert n == round(shape[0] * 44100 / 48000)
+    assert rss_growth < 16 * 2**20
+
+    y = np.load(tmp_path / 'y.npy', mmap_mode='r')
+    assert y.shape == (n, 2)
+
+
+@pytest.mark.parametrize('background', [False, True])
+@pytest.mark.parametrize('out_chunk', [None, 1000])
+@pytest.mark.parametrize('channels', [1, 2])
+def test_resample_iter(background, out_chunk, channels):
+    # test resample_iter() matches resample()
+    x = np.random.randn(44100, channels).astype(np.float32)
+    if channels == 1:
+        x = x[:, 0]
+    chunks = (x[idx:idx+1234] for idx in range(0, len(x), 1234))
+
+    ys = list(soxr.resample_iter(chunks, 44100, 32000, out_chunk=out_chunk, background=background))
+    if out_chunk:
+        assert all(len(y) == out_chunk for y in ys[:-1])
+        assert 0 < len(ys[-1]) <= out_chunk
+    else:
+        assert len(ys) == len(range(0, len(x), 1234))
+
+    y = np.concatenate(ys)
+    assert y.ndim == x.ndim
+    assert np.all(y == soxr.resample(x, 44100, 32000))
+
+
+@pytest.mark.parametrize('background', [False, True])
+def test_resample_iter_edge(background):
+    # test empty input, early close and error in chunks
+    assert list(soxr.resample_iter([], 44100, 32000, background=background)) == []
+
+    chunks = (np.zeros(1000, dtype=np.float32) for _ in range(100))
+    it = soxr.resample_iter(chunks, 44100, 32000, background=background)
+    next(it)
+    it.close()
+
+    chunks = [np.zeros(1000, dtype=np.float32), np.zeros(1000, dtype=np.float64)]
+    with pytest.raises(TypeError):
+        list(soxr.resample_iter(chunks, 44100, 32000, background=background))
+
+
+def test_aresample():
+    # test aresample() matches resample() and runs concurrently
+    xs = [np.random.randn(44100, 2).astype(np.float32) for _ in range(4)]
+
+    async def main():
+        return await asyncio.gather(*(soxr.aresample(x, 44100, 32000) for x in xs))
+
+    for x, y in zip(xs, asyncio.run(main())):
+        assert np.all(y == soxr.resample(x, 44100, 32000))
+
+
+def test_async_stream():
+    # test chunk order is preserved with concurrent calls
+    x = np.random.randn(44100, 2).astype(np.float32)
+    chunks = [x[idx:idx+1000] for idx in range(0, len(x), 1000)]
+
+    async def main():
+        rs = soxr.AsyncResampleStream(44100, 32000, 2)
+        return await asyncio.gather(*(rs.resample_chunk(c, last=i == len(chunks)-1)
+                                      for i, c in enumerate(chunks)))
+
+    y = np.concatenate(asyncio.run(main()))
+    assert np.all(y == soxr.resample(x, 44100, 32000))
+
+
+def test_async_stream_backpressure():
+    # test feed() waits for slow consumer
+    x = np.random.randn(44100, 2).astype(np.float32)
+    chunks = [x[idx:idx+1000] for idx in range(0, len(x), 1000)]
+    max_pending = 2
+
+    async def main():
+        rs = soxr.AsyncResampleStream(44100, 32000, 2, max_pending=max_pending)
+        count = {'fed': 0, 'read': 0, 'max': 0}
+
+        async def producer():
+            for i, c in enumerate(chunks):
+                await rs.feed(c, last=i == len(chunks)-1)
+                count['fed'] += 1
+                count['max'] = max(count['max'], count['fed'] - count['read'])
+
+        async def consumer():
+            ys = []
+            async for y in rs.outputs():
+                ys.append(y)
+                count['read'] += 1
+                await asyncio.sleep(0.001)
+            return ys
+
+        _, ys = await asyncio.gather(producer(), consumer())
+        return ys, count['max']
+
+    ys, max_seen = asyncio.run(main())
+    assert max_seen <= max_pending
+    assert np.all(np.concatenate(ys) == soxr.resample(x, 44100, 32000))
+
+
+@pytest.mark.parametrize('num_threads', [1, 2])
+@pytest.mark.parametrize('channels', [1, 2])
+def test_stream_bank(num_threads, channels):
+    # test each stream of bank matches ResampleStream
+    num_streams = 5
+    chunk_size = 160
+    xs = [np.random.randn(8000, channels).astype(np.float32) for _ in range(num_streams)]
+    if channels == 1:
+        xs = [x[:, 0] for x in xs]
+
+    bank = soxr.ResampleStreamBank(num_streams, 8000, 16000, channels, num_threads=num_threads)
+    assert len(bank) == num_streams
+
+    ys = [[] for _ in range(num_streams)]
+    for idx in range(0, 8000, chunk_size):
+        chunks = [x[idx:idx+chunk_size] for x in xs]
+        for y_list, y in zip(ys, bank.resample_chunks(chunks, last=8000 <= idx+chunk_size)):
+            y_list.append(y)
+
+    for x, y_list in zip(xs, ys):
+        y = np.concatenate(y_list)
+        assert np.all(y == stream_resample(x.reshape(len(x), -1), 8000, 16000, chunk_size, np.float32).reshape(y.shape))
+
+
+def test_stream_bank_stacked():
+    # test stacked input and per-stream last flags
+    x = np.random.randn(3, 800, 2).astype(np.float32)
+    bank = soxr.ResampleStreamBank(3, 8000, 16000, 2)
+
+    ys = bank.resample_chunks(x, last=[True, False, False])
+    refs = [soxr.ResampleStream(8000, 16000, 2) for _ in range(3)]
+    for i in range(3):
+        assert np.all(ys[i] == refs[i].resample_chunk(x[i], last=i == 0))
+
+    # input after last input of stream 0. Other streams are processed regardless.
+    with pytest.raises(RuntimeError) as exc_info:
+        bank.resample_chunks(x)
+    ys = exc_info.value.results
+    assert ys[0] is exc_info.value
+    for i in (1, 2):
+        assert np.all(ys[i] == refs[i].resample_chunk(x[i]))
+
+    ys = bank.resample_chunks(x, return_exceptions=True)
+    assert isinstance(ys[0], RuntimeError)
+    for i in (1, 2):
+        assert np.all(ys[i] == refs[i].resample_chunk(x[i]))
+
+    bank.clear(0)
+    bank.resample_chunks(x)
+
+    # stacked input is passed as is, not as views of each stream
+    bank._process = None
+    bank.resample_chunks(x)
+    with pytest.raises(TypeError):
+        bank._process_stacked(list(x), [False] * 3)
+
+    with pytest.raises(ValueError):
+        bank.resample_chunks(x[:2])
+    with pytest.raises(TypeError):
+        bank.resample_chunks(x.astype(np.float64))
+    with pytest.raises(ValueError):
+        bank.resample_chunks([x[0], x[1], x[2, :, 0]])  # mixed 1-D and 2-D chunks
+    with pytest.raises(ValueError):
+        soxr.ResampleStreamBank(-1, 8000, 16000, 2)
+
+
+@pytest.mark.parametrize('probe', ['clear', 'resample_chunks'])
+def test_stream_bank_concurrent_use(probe):
+    # test bank in use by another thread raises, instead of racing on its streams
+    x = np.random.randn(2, 1000000, 2).astype(np.float32)
+    bank = soxr.ResampleStreamBank(2, 44100, 96000, 2, quality='VHQ')
+    probe_fn = {
+        'clear': lambda: bank.clear(1),
+        'resample_chunks': lambda: bank.resample_chunks(x[:, :100]),
+    }[probe]
+
+    started = threading.Event()
+    errors = []
+
+    def work():
+        started.set()
+        try:
+            bank.resample_chunks(x)
+        except Exception as e:
+            errors.append(e)
+
+    th = threading.Thread(target=work)
+    th.start()
+    raised = 0
+    try:
+        started.wait()
+        while th.is_alive() and not raised:
+            time.sleep(0.001)
+            try:
+                probe_fn()
+            except RuntimeError:
+                raised += 1
+    finally:
+        th.join()
+
+    assert not errors
+    assert raised == 1
+
+
+@pytest.mark.parametrize('in_rate, out_rate', [(44100, 48000), (48000, 16000), (8000, 48000)])
+@pytest.mark.parametrize('num_threads', [2, 4])
+@pytest.mark.parametrize('channels', [1, 2])
+@pytest.mark.parametrize('quality', ['VHQ', 'HQ', 'LQ'])
+@pytest.mark.parametrize('dtype, dither, atol', [
+    (np.float32, True, 1e-5),
+    (np.int32, True, 1e-5 * 2**31),
+    (np.int16, False, 1),   # rounding
+    (np.int16, True, 3),    # rounding and dither noise
+])
+def test_segment_thread_match(in_rate, out_rate, num_threads, channels, quality, dtype, dither, atol):
+    # test time-segment-parallel resample() of long signal with few channels
+    x = np.random.uniform(-1, 1, (in_rate * 20, channels))
+    if np.dtype(dtype).kind == 'i':
+        x *= np.iinfo(dtype).max * 0.9
+    x = x.astype(dtype)
+
+    y_single = soxr.resample(x, in_rate, out_rate, quality=quality, dither=dither)
+    y_divide = soxr.resample(x, in_rate, out_rate, quality=quality, num_threads=num_threads, dither=dither)
+    y_split = soxr.resample(np.asfortranarray(x), in_rate, out_rate, quality=quality,
+                            num_threads=num_threads, dither=dither)
+
+    assert y_divide.shape == y_single.shape
+    assert y_split.shape == y_single.shape
+    assert np.allclose(y_single, y_divide, rtol=0, atol=atol)
+    assert np.allclose(y_single, y_split, rtol=0, atol=atol)
+
+
+@pytest.mark.parametrize('channels', [1, 2])
+@pytest.mark.parametrize('in_chunk', [100, 1001])
+def test_puller_input_fn(channels, in_chunk):
+    # test read(n) with input function matches one-shot resample()
+    x = np.random.randn(30000, channels).astype(np.float32)
+    if channels == 1:
+        x = x[:, 0]
+    pos = 0
+
+    def input_fn(n):
+        nonlocal pos
+        chunk = x[pos:pos+in_chunk]
+        pos += len(chunk)
+        return chunk if len(chunk) else None
+
+    puller = soxr.ResamplePuller(44100, 48000, channels, input_fn=input_fn)
+    ys = []
+    while not puller.ended:
+        ys.append(puller.read(512))
+
+    assert all(len(y) == 512 for y in ys[:-1])
+    assert len(ys[-1]) < 512
+    assert np.all(np.concatenate(ys) == soxr.resample(x, 44100, 48000))
+
+
+def test_puller_write():
+    # test read(n) from pushed input
+    x = np.random.randn(30000, 2).astype(np.float32)
+    puller = soxr.ResamplePuller(44100, 48000, 2)
+
+    ys = []
+    for idx in range(0, len(x), 1000):
+        puller.write(x[idx:idx+1000], last=len(x) <= idx+1000)
+        while 512 <= puller.available():
+            ys.append(puller.read(512))
+    assert not puller.ended
+
+    out = np.zeros((puller.available() + 10, 2), dtype=np.float32)
+    n = puller.read_into(out)
+    assert n == len(out) - 10
+    assert puller.ended
+    ys.append(out[:n])
+    assert np.all(np.concatenate(ys) == soxr.resample(x, 44100, 48000))
+
+    with pytest.raises(RuntimeError):
+        puller.write(x)  # input after last input
+    puller.clear()
+    puller.write(x[:1000])
+
+
+def test_puller_bad_input():
+    # test errors from input function
+    def raise_fn(n):
+        raise KeyError('input')
+
+    with pytest.raises(KeyError):
+        soxr.ResamplePuller(44100, 48000, 2, input_fn=raise_fn).read(100)
+    with pytest.raises(TypeError):
+        soxr.ResamplePuller(44100, 48000, 2, input_fn=lambda n: np.zeros((n, 2))).read(100)
+    with pytest.raises(ValueError):
+        soxr.ResamplePuller(44100, 48000, 2, input_fn=lambda n: np.zeros((n, 3), np.float32)).read(100)
+    with pytest.raises(RuntimeError):
+        soxr.ResamplePuller(44100, 48000, 2, input_fn=lambda n: None).write(np.zeros((10, 2), np.float32))
+
+
+def test_puller_concurrent_use():
+    # test call on a puller in use by another thread raises, instead of racing
+    x = np.random.randn(30000, 2).astype(np.float32)
+    errors = {}
+
+    def other_thread(name, fn):
+        try:
+            fn()
+        except Exception as e:
+            errors[name] = e
+
+    def input_fn(n):
+        if not errors:
+            # read() of main thread is in progress
+            for name, fn in [('read', lambda: puller.read(10)), ('clear', puller.clear),
+                             ('available', puller.available), ('delay', puller.delay)]:
+                th = threading.Thread(target=other_thread, args=(name, fn))
+                th.start()
+                th.join()
+            other_thread('nested', lambda: puller.read(10))
+        return x[:n]
+
+    puller = soxr.ResamplePuller(44100, 48000, 2, input_fn=input_fn)
+    y = puller.read(1000)
+
+    assert set(errors) == {'read', 'clear', 'available', 'delay', 'nested'}
+    for name, e in errors.items():
+        assert isinstance(e, RuntimeError)
+        assert 'input function' in str(e) if name == 'nested' else 'another thread' in str(e)
+    assert len(y) == 1000
+    puller.clear()
+    puller.read(10)
+
+
+@pytest.mark.parametrize('channels', [1, 2])
+def test_ring(channels):
+    # test push()/pull_into() output matches resample(), and underrun counter
+    x = np.random.randn(30000, channels).astype(np.float32)
+    if channels == 1:
+        x = x[:, 0]
+    ring = soxr.ResampleRing(44100, 48000, channels, max_chunk=441)
+    out = np.zeros((480,) + x.shape[1:], dtype=np.float32)
+
+    ys = []
+    for idx in range(0, len(x), 441):
+        ring.push(x[idx:idx+441], last=len(x) <= idx+441)
+        n = ring.pull_into(out)
+        assert np.all(out[n:] == 0)
+        ys.append(out[:n].copy())
+    while not ring.ended:
+        ys.append(out[:ring.pull_into(out)].copy())
+
+    assert ring.overruns() == 0
+    assert 0 < ring.underruns()  # initial output delay
+    assert np.all(np.concatenate(ys) == soxr.resample(x, 44100, 48000))
+
+
+def test_ring_thread():
+    # test producer and consumer on separate threads
+    x = np.random.randn(48000, 2).astype(np.float32)
+    ring = soxr.ResampleRing(48000, 44100, 2, max_chunk=480, capacity=8192)
+
+    def producer():
+        for idx in range(0, len(x), 480):
+            while ring.capacity - ring.available() < 1024:
+                time.sleep(0.0001)
+            ring.push(x[idx:idx+480], last=len(x) <= idx+480)
+
+    th = threading.Thread(target=producer)
+    th.start()
+    ys = []
+    out = np.zeros((256, 2), dtype=np.float32)
+    while not ring.ended:
+        ys.append(out[:ring.pull_into(out)].copy())
+    th.join()
+
+    assert ring.overruns() == 0
+    assert np.all(np.concatenate(ys) == soxr.resample(x, 48000, 44100))
+
+
+def test_ring_overrun():
+    # test overrun counter and invalid inputs
+    ring = soxr.ResampleRing(44100, 44100, 2, max_chunk=1000, capacity=1500)
+    x = np.zeros((1000, 2), dtype=np.float32)
+    for _ in range(5):
+        ring.push(x)
+    assert ring.available() == 1500
+    assert 0 < ring.overruns()
+
+    with pytest.raises(ValueError):
+        ring.push(np.zeros((1001, 2), dtype=np.float32))
+    with pytest.raises(TypeError):
+        ring.push(x.astype(np.float64))
+    with pytest.raises(TypeError):
+        ring.pull_into(np.zeros((100, 2), dtype=np.float64))
+    with pytest.raises(ValueError):
+        ring.pull_into(np.zeros((100, 3), dtype=np.float32))
+
+    ring.clear()
+    assert ring.available() == 0 and ring.overruns() == 0
+
+
+@pytest.mark.parametrize('spec', [
+    soxr.RuntimeSpec(num_threads=0),
+    soxr.RuntimeSpec(log2_min_dft_size=8, log2_large_dft_size=12),
+    soxr.RuntimeSpec(coef_size_kbytes=100),
+])
+@pytest.mark.parametrize('in_rate, out_rate', [(44100, 32000), (44100, 48000.5)])
+def test_runtime_spec(spec, in_rate, out_rate):
+    # test runtime spec of resample() and ResampleStream
+    x = np.random.randn(30000, 3).astype(np.float32)
+    y = soxr.resample(x, in_rate, out_rate)
+
+    y_spec = soxr.resample(x, in_rate, out_rate, runtime_spec=spec)
+    assert y_spec.shape == y.shape
+    assert np.allclose(y, y_spec, atol=1e-4)
+
+    rs = soxr.ResampleStream(in_rate, out_rate, 3, runtime_spec=spec)
+    assert np.all(rs.resample_chunk(x, last=True) == y_spec)
+
+
+def test_bad_runtime_spec():
+    # test out of range runtime spec and non-RuntimeSpec argument
+    with pytest.raises(ValueError):
+        soxr.RuntimeSpec(log2_min_dft_size=7)
+    with pytest.raises(ValueError):
+        soxr.RuntimeSpec(coef_size_kbytes=1000)
+    with pytest.raises(TypeError):
+        soxr.resample(np.zeros(100), 44100, 32000, runtime_spec=(1, 10, 17, 400))
+
+
+def test_resample_stats():
+    # test global counters of resample()
+    x = np.random.randn(1000, 2).astype(np.float32)
+
+    soxr.reset_resample_stats()
+    y1 = soxr.resample(x, 44100, 16000)
+    y2 = soxr.resample(np.asfortranarray(x), 44100, 16000)
+    stats = soxr.resample_stats()
+    assert stats['calls'] == 2
+    assert stats['frames_in'] == 2000
+    assert stats['frames_out'] == len(y1) + len(y2)
+    assert 0 < stats['native_seconds']
+
+
+@pytest.mark.parametrize('num_threads', [1, 2])
+def test_stream_stats(num_threads):
+    # test per-stream counters
+    x = np.random.randn(10000, 3).astype(np.float32)
+    rs = soxr.ResampleStream(44100, 32000, 3, num_threads=num_threads)
+
+    frames_out = 0
+    for idx in range(0, len(x), 1000):
+        frames_out += len(rs.resample_chunk(x[idx:idx+1000], last=len(x) <= idx+1000))
+
+    stats = rs.stats()
+    assert stats['calls'] == 10
+    assert stats['frames_in'] == len(x)
+    assert stats['frames_out'] == frames_out
+    assert 1 <= stats['buffer_allocs']
+    assert 0 < stats['buffer_peak_bytes']
+    assert 1 <= stats['flush_iterations']
+
+
+def test_stats_hook():
+    # test metric export hook
+    x = np.random.randn(1000).astype(np.float32)
+    events = []
+
+    try:
+        soxr.set_stats_hook(lambda *args: events.append(args))
+        y = soxr.resample(x, 44100, 16000)
+        rs = soxr.ResampleStream(44100, 16000, 1)
+        y_chunk = rs.resample_chunk(x, last=True)
+    finally:
+        soxr.set_stats_hook(None)
+    soxr.resample(x, 44100, 16000)
+
+    assert [e[:3] for e in events] == [('resample', 1000, len(y)), ('stream', 1000, len(y_chunk))]
+    assert all(0 <= e[3] for e in events)
+
+    with pytest.raises(TypeError):
+        soxr.set_stats_hook(1)
+
+
+@pytest.mark.parametrize('num_threads', [1, 3])
+@pytest.mark.parametrize('layout', ['interleaved', 'planar'])
+def test_stream_buffer_policy(layout, num_threads):
+    # test output match and buffer size with memory policies
+    x = np.random.randn(200000, 3).astype(np.float32)
+    if layout == 'planar':
+        x = np.asfortranarray(x)
+    rs_ref = soxr.ResampleStream(44100, 32000, 3, layout=layout, num_threads=num_threads)
+    rs = soxr.ResampleStream(44100, 32000, 3, layout=layout, num_threads=num_threads,
+                             max_buffer_bytes=65536, shrink_after=2)
+
+    y_ref, y = [], []
+    idx = 0
+    for chunk_size in [1000, 150000, 1000, 1000, 1000, 46000]:
+        x_chunk = x[idx:idx+chunk_size]
+        idx += chunk_size
+        y_ref.append(rs_ref.resample_chunk(x_chunk, last=len(x) <= idx))
+        y.append(rs.resample_chunk(x_chunk, last=len(x) <= idx))
+        assert rs.memory_usage()['buffer_bytes'] <= 65536
+
+    assert np.all(np.concatenate(y_ref) == np.concatenate(y))
+    assert rs.memory_usage()['total_bytes'] < rs_ref.memory_usage()['total_bytes']
+
+    rs_ref.trim()
+    assert rs_ref.memory_usage()['total_bytes'] == 0
+
+
+def test_stream_shared_buffer():
+    # test streams sharing output buffer
+    x = np.random.randn(5000, 2).astype(np.float32)
+    rs_ref = soxr.ResampleStream(44100, 32000, 2)
+    streams = [soxr.ResampleStream(44100, 32000, 2, shared_buffer=True) for _ in range(3)]
+
+    y_ref = rs_ref.resample_chunk(x)
+    for rs in streams:
+        assert np.all(rs.resample_chunk(x) == y_ref)
+        assert rs.memory_usage()['buffer_bytes'] == 0
+        assert 0 < rs.memory_usage()['shared_bytes']
+
+    with pytest.raises(ValueError):
+        soxr.ResampleStream(44100, 32000, 2, zero_copy=True, shared_buffer=True)
+
+
+@pytest.mark.parametrize('num_threads', [1, 2, 4])
+@pytest.mark.parametrize('order', ['C', 'F'])
+@pytest.mark.parametrize('diff', [-100, -1, 0, 1, 100])
+def test_exact_length(diff, order, num_threads):
+    # test output cut or zero padded to `length`
+    x = np.asarray(np.random.randn(96000, 2).astype(np.float32), order=order)
+    y_ref = soxr.resample(x, 48000, 44100, num_threads=num_threads)
+    length = len(y_ref) + diff
+    n = min(length, len(y_ref))
+
+    y = soxr.resample(x, 48000, 44100, num_threads=num_threads, length=length)
+    assert y.shape == (length, 2)
+    assert np.all(y[:n] == y_ref[:n])
+    assert not np.any(y[n:])
+
+    out = np.full((length, 2), 1, dtype=np.float32, order=order)
+    y_out = soxr.resample(x, 48000, 44100, num_threads=num_threads, length=length, out=out)
+    assert y_out.shape == (length, 2)
+    assert np.all(y_out[:n] == y_ref[:n])
+    assert not np.any(y_out[n:])
+
+
+def test_batch_out():
+    # test resample_batch() into preallocated batch
+    xs = [np.random.randn(length, 2).astype(np.float32) for length in [1000, 4410, 0]]
+    xs.append(np.zeros(100))
+    out = np.full((4, 2000, 2), 1, dtype=np.float32)
+
+    ys = soxr.resample_batch(xs, 44100, 32000, out=out, return_exceptions=True)
+
+    for x, y, y_out in zip(xs[:3], ys, out):
+        y_ref = soxr.resample(x, 44100, 32000)
+        n = min(len(y_ref), len(y_out))
+        assert y.base is out
+        assert np.all(y_out[:n] == y_ref[:n])
+        assert not np.any(y_out[n:])
+    assert isinstance(ys[3], ValueError)
+
+    ys = soxr.resample_batch(xs[:3], 44100, 32000, length=1000)
+    assert [y.shape for y in ys] == [(1000, 2)] * 3
+
+
+@pytest.mark.parametrize('order', ['C', 'F'])
+@pytest.mark.parametrize('axis', [0, 1, -1])
+def test_axis(axis, order):
+    # test N-D input along `axis`
+    x = np.asarray(np.random.randn(3, 4, 5000).astype(np.float32), order=order)
+    x = np.moveaxis(x, -1, axis)
+
+    y = soxr.resample(x, 44100, 32000, axis=axis)
+
+    x_frames = np.moveaxis(x, axis, 0).reshape(len(x) if axis == 0 else x.shape[axis], -1)
+    y_ref = soxr.resample(np.ascontiguousarray(x_frames), 44100, 32000)
+    assert y.shape[axis] == len(y_ref)
+    assert np.all(np.moveaxis(y, axis, 0).reshape(len(y_ref), -1) == y_ref)
+
+    out = np.zeros_like(x, shape=y.shape)
+    y_out = soxr.resample(x, 44100, 32000, axis=axis, out=out, length=1000)
+    assert np.shares_memory(y_out, out)
+    assert np.all(np.moveaxis(y_out, axis, 0) == np.moveaxis(y, axis, 0)[:1000])
+
+    with pytest.raises(ValueError):
+        soxr.resample(x, 44100, 32000, axis=3)
+
+
+class DLPackArray:
+    # Array of other library with DLPack (e.g. PyTorch tensor), wrapping NumPy array
+    def __init__(self, a):
+        self.a = a
+
+    def __len__(self):
+        return len(self.a)
+
+    def __dlpack__(self, **kwargs):
+        return self.a.__dlpack__(**kwargs)
+
+    def __dlpack_device__(self):
+        return self.a.__dlpack_device__()
+
+    def __array_namespace__(self):
+        return DLPackArray
+
+    @staticmethod
+    def from_dlpack(x):
+        return DLPackArray(np.from_dlpack(x))
+
+
+@pytest.mark.parametrize('dtype', [np.float32, np.float64, np.int16])
+def test_dlpack_io(dtype):
+    # test zero-copy input of DLPack and buffer protocol, and output in its library
+    x = (np.random.randn(2000, 2) * 1000).astype(dtype)
+    y_ref = soxr.resample(x, 44100, 32000)
+
+    y = soxr.resample(DLPackArray(x), 44100, 32000)
+    assert isinstance(y, DLPackArray)
+    assert np.all(y.a == y_ref)
+
+    y = soxr.resample(memoryview(x), 44100, 32000)
+    assert np.all(y == y_ref)
+
+    out = DLPackArray(np.zeros_like(x))
+    y = soxr.resample(x, 44100, 32000, out=out)
+    assert isinstance(y, DLPackArray) and np.shares_memory(y.a, out.a)
+    assert np.all(y.a == y_ref)
+
+    rs = soxr.ResampleStream(44100, 32000, 2, dtype=dtype, zero_copy=True)
+    y = rs.resample_chunk(DLPackArray(x), last=True)
+    assert isinstance(y, DLPackArray)
+    assert np.all(y.a == y_ref)
+
+    ys = soxr.resample_batch([DLPackArray(x), x], 44100, 32000)
+    assert isinstance(ys[0], DLPackArray) and isinstance(ys[1], np.ndarray)
+    assert np.all(ys[0].a == y_ref)
+
+
+def test_stream_concurrent_use():
+    # test call on a stream in use by another thread raises, instead of racing
+    x = np.random.randn(2000000, 2).astype(np.float32)
+    rs = soxr.ResampleStream(44100, 96000, 2, quality='VHQ')
+
+    started = threading.Event()
+    errors = []
+
+    def work():
+        started.set()
+        try:
+            rs.resample_chunk(x)
+        except Exception as e:
+            errors.append(e)
+
+    th = threading.Thread(target=work)
+    th.start()
+    raised = 0
+    try:
+        started.wait()
+        while th.is_alive() and not raised:
+            time.sleep(0.001)
+            try:
+                rs.clear()
+            except RuntimeError:
+                raised += 1
+    finally:
+        th.join()
+
+    assert not errors
+    assert raised == 1
+
+    rs.clear()
+    assert rs.resample_chunk(x[:1000]).shape[1] == 2
+
+
+def test_async_stream_accessors():
+    # test sync accessors don't raise while a fed chunk is processed
+    x = np.random.randn(2000000, 2).astype(np.float32)
+
+    async def main():
+        rs = soxr.AsyncResampleStream(44100, 96000, 2, quality='VHQ')
+        await rs.feed(x)
+        reading = asyncio.ensure_future(rs.read())
+        while not reading.done():
+            assert rs.delay() >= 0
+            assert rs.num_clips() == 0
+            assert rs.max_out_frames(1000) > 0
+            await asyncio.sleep(0.001)
+        await reading
+        return rs.delay(), rs._stream.delay()
+
+    delay, delay_ref = asyncio.run(main())
+    assert delay == delay_ref > 0
+
+
+@pytest.mark.parametrize('probe', ['push', 'clear'])
+def test_ring_concurrent_use(probe):
+    # test second producer raises, while consumer runs alongside
+    x = np.random.randn(1000000, 2).astype(np.float32)
+    ring = soxr.ResampleRing(44100, 96000, 2, max_chunk=len(x), quality='VHQ')
+    probe_fn = {
+        'push': lambda: ring.push(x[:100]),
+        'clear': ring.clear,
+    }[probe]
+
+    started = threading.Event()
+    errors = []
+
+    def work():
+        started.set()
+        try:
+            ring.push(x)
+        except Exception as e:
+            errors.append(e)
+
+    th = threading.Thread(target=work)
+    th.start()
+    raised = 0
+    out = np.zeros((256, 2), dtype=np.float32)
+    try:
+        started.wait()
+        while th.is_alive() and not raised:
+            time.sleep(0.001)
+            ring.pull_into(out)
+            try:
+                probe_fn()
+            except RuntimeError:
+                raised += 1
+    finally:
+        th.join()
+
+    assert not errors
+    assert raised == 1
+
+
+@pytest.mark.parametrize('in_rate, out_rate', [(44100, 48000), (48000, 44100), (96000, 8000), (8000, 96000)])
+@pytest.mark.parametrize('quality', ['LQ', 'HQ', 'VHQ'])
+@pytest.mark.parametrize('layout', ['interleaved', 'planar'])
+@pytest.mark.parametrize('resume_at', [0, 3000, 100000])
+def test_stream_state(in_rate, out_rate, quality, layout, resume_at):
+    # test stream resumed from pickled checkpoint matches uninterrupted stream
+    x = np.random.randn(150000, 2).astype(np.float32)
+    if layout == 'planar':
+        x = np.asfortranarray(x)
+    chunk = 4800
+
+    ref = soxr.ResampleStream(in_rate, out_rate, 2, quality=quality, layout=layout)
+    y_ref = np.concatenate([ref.resample_chunk(x[i:i+chunk], last=len(x) <= i+chunk)
+                            for i in range(0, len(x), chunk)])
+
+    rs = soxr.ResampleStream(in_rate, out_rate, 2, quality=quality, layout=layout, checkpoint=True)
+    ys = [rs.resample_chunk(x[i:min(i+chunk, resume_at)]) for i in range(0, resume_at, chunk)]
+
+    # resume in new stream
+    rs = pickle.loads(pickle.dumps(rs))
+    for i in range(resume_at, len(x), chunk):
+        if i % (2 * chunk):
+            ys.append(rs.resample_chunk(x[i:i+chunk], last=len(x) <= i+chunk))
+        else:
+            out = np.empty((rs.max_out_frames(chunk), 2), np.float32, order='F' if layout == 'planar' else 'C')
+            ys.append(out[:rs.resample_chunk_into(x[i:i+chunk], out, last=len(x) <= i+chunk)])
+    y = np.concatenate(ys)
+
+    assert y.shape == y_ref.shape
+    assert np.allclose(y, y_ref, rtol=0, atol=1e-5)
+
+
+def test_stream_state_config():
+    # test state of fresh stream, config round trip and invalid states
+    x = np.random.randn(10000).astype(np.float32)
+    rs = soxr.ResampleStream(44100, 16000, 1, quality='VHQ', runtime_spec=soxr.RuntimeSpec(log2_min_dft_size=11))
+    rs2 = soxr.ResampleStream.from_state(rs.get_state())
+    assert np.array_equal(rs.resample_chunk(x, last=True), rs2.resample_chunk(x, last=True))
+
+    # mid-stream state needs checkpoint=True
+    with pytest.raises(RuntimeError):
+        rs.clear()
+        rs.resample_chunk(x)
+        rs.get_state()
+
+    with pytest.raises(ValueError):
+        soxr.ResampleStream(44100, 16000, 1, vr=True, checkpoint=True)
+
+    rs.clear()
+    state = rs.get_state()
+    state['version'] = 0
+    with pytest.raises(ValueError):
+        soxr.ResampleStream.from_state(state)
+
+
+def test_stream_state_concurrent_use():
+    # test checkpoint bookkeeping is owned through whole call, not only while in native code
+    x = np.random.randn(1000, 2).astype(np.float32)
+    rs = soxr.ResampleStream(44100, 16000, 2, checkpoint=True)
+    errors = []
+
+    def call(fn, *args):
+        try:
+            fn(*args)
+        except Exception as e:
+            errors.append(e)
+
+    out = np.empty((rs.max_out_frames(len(x)), 2), np.float32)
+    with rs._owner:  # Python side of a call of main thread, native stream is free
+        for fn, args in [(rs.resample_chunk, (x,)), (rs.resample_chunk_into, (x, out)),
+                         (rs.clear, ()), (rs.get_state, ())]:
+            th = threading.Thread(target=call, args=(fn, *args))
+            th.start()
+            th.join()
+
+    assert len(errors) == 4
+    assert all(isinstance(e, RuntimeError) for e in errors)
+    assert rs.get_state()['in_frames'] == 0
+    rs.resample_chunk(x)
+    assert rs.get_state()['in_frames'] == len(x)
+
+
+def test_resample_many(tmp_path):
+    # test resample_many() of arrays and .npy paths matches resample()
+    xs = [np.random.randn(48000, 2).astype(np.float32), np.random.randn(1000), np.zeros((0, 3), np.float32),
+          (np.random.randn(3000, 2) * 1000).astype(np.int16)]
+    np.save(tmp_path / 'x.npy', xs[0])
+
+    ys = soxr.resample_many(xs + [tmp_path / 'x.npy'], 48000, 44100, processes=2)
+    for x, y in zip(xs + [xs[0]], ys):
+        assert np.array_equal(y, soxr.resample(x, 48000, 44100))
+
+    ys = soxr.resample_many(xs[:2], 48000, 44100, processes=2, out_dtype='float64')
+    assert all(y.dtype == np.float64 for y in ys)
+    assert soxr.resample_many([], 48000, 44100) == []
+
+    with pytest.raises(TypeError):
+        soxr.resample_many([np.zeros(100, np.int8)], 48000, 44100)
+
+
+@pytest.mark.skipif(not sys.platform.startswith('linux'), reason='reads /proc/self/maps')
+def test_resample_many_release():
+    # test shared memory is unmapped from workers after call, and from this process with outputs
+    maps = Path('/proc/self/maps')
+
+    def shm_maps(text):
+        return [line for line in text.splitlines() if '/psm_' in line]
+
+    ys = soxr.resample_many([np.random.randn(480000, 2)] * 2, 48000, 44100, processes=2)
+    assert shm_maps(maps.read_text())
+
+    for text in soxr._get_process_executor(2).map(Path.read_text, [maps] * 8):
+        assert not shm_maps(text)
+
+    del ys
+    assert not shm_maps(maps.read_text())